@@ -2,8 +2,21 @@ import sqlite3
 import os
 DB_NAME = "database.db"
 
-def create_db():
-    con = sqlite3.connect(DB_NAME)
+# Date (YYYY-MM-DD) of a project's next automatic status change, NULL when
+# none is pending (finished) or the dates are malformed:
+#   planned → active (or finished) on start_date
+#   active  → finished the day after end_date
+# Kept as a generated column so it can never drift from status/dates.
+NEXT_TRANSITION_SQL = """
+    CASE
+        WHEN date(start_date) IS NOT start_date OR date(end_date) IS NOT end_date THEN NULL
+        WHEN status = 'planned' THEN start_date
+        WHEN status = 'active' THEN date(end_date, '+1 day')
+    END
+"""
+
+def create_db(db_name=DB_NAME):
+    con = sqlite3.connect(db_name)
     cur = con.cursor()
     cur.execute("PRAGMA foreign_keys = ON;")
 
@@ -64,15 +77,21 @@ def create_db():
         charge_affectee INTEGER DEFAULT 0 CHECK(charge_affectee >= 0 AND charge_affectee <= 100),
         competence_moyenne REAL DEFAULT 50 CHECK(competence_moyenne >= 0 AND competence_moyenne <= 100),
         score INTEGER DEFAULT 50 CHECK(score >= 0 AND score <= 100),
+        open_task_hours REAL NOT NULL DEFAULT 0,
         FOREIGN KEY (ressource_id) REFERENCES users(id) ON DELETE CASCADE,
         FOREIGN KEY (chef_id) REFERENCES users(id) ON DELETE CASCADE
     )
     """)
 
+    # Databases created before task-derived resource charge
+    columns = {row[1] for row in cur.execute("PRAGMA table_info(ressource_profiles)")}
+    if "open_task_hours" not in columns:
+        cur.execute("ALTER TABLE ressource_profiles ADD COLUMN open_task_hours REAL NOT NULL DEFAULT 0")
+
     # =====================================================
     # PROJECTS (estimated_hours)
     # =====================================================
-    cur.execute("""
+    cur.execute(f"""
     CREATE TABLE IF NOT EXISTS projects (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL,
@@ -87,11 +106,20 @@ def create_db():
         company_id INTEGER NOT NULL,
         chef_id INTEGER NOT NULL,
         created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        next_transition_date TEXT GENERATED ALWAYS AS ({NEXT_TRANSITION_SQL}) VIRTUAL,
         FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE,
         FOREIGN KEY (chef_id) REFERENCES users(id) ON DELETE CASCADE
     )
     """)
 
+    # Databases created before next_transition_date existed
+    columns = {row[1] for row in cur.execute("PRAGMA table_xinfo(projects)")}
+    if "next_transition_date" not in columns:
+        cur.execute(f"""
+        ALTER TABLE projects ADD COLUMN next_transition_date TEXT
+            GENERATED ALWAYS AS ({NEXT_TRANSITION_SQL}) VIRTUAL
+        """)
+
     # =====================================================
     # TASKS 
     # =====================================================
@@ -173,10 +201,318 @@ def create_db():
         entity_id INTEGER NOT NULL,
         details TEXT,
         created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        company_id INTEGER,
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
     )
     """)
 
+    # Databases created before activity was recorded (see activity.py)
+    columns = {row[1] for row in cur.execute("PRAGMA table_info(activity_log)")}
+    if "company_id" not in columns:
+        cur.execute("ALTER TABLE activity_log ADD COLUMN company_id INTEGER")
+
+    # One row per UTC day of activity_log: the id range written that day,
+    # so retention deletes primary-key ranges instead of scanning by date
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS activity_partitions (
+        day TEXT PRIMARY KEY,
+        first_id INTEGER NOT NULL,
+        last_id INTEGER NOT NULL
+    )
+    """)
+
+    # =====================================================
+    # CHEF CHARGE STATS (maintained aggregate, see charge.py)
+    # =====================================================
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chef_charge_stats (
+        chef_id INTEGER PRIMARY KEY,
+        weekly_capacity REAL NOT NULL DEFAULT 0,
+        resource_count INTEGER NOT NULL DEFAULT 0,
+        total_hours REAL NOT NULL DEFAULT 0,
+        project_count INTEGER NOT NULL DEFAULT 0,
+        peak_load REAL NOT NULL DEFAULT 0,
+        load_version INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (chef_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """)
+
+    # Databases created before the interval-tree capacity model
+    columns = {row[1] for row in cur.execute("PRAGMA table_info(chef_charge_stats)")}
+    if "peak_load" not in columns:
+        cur.execute("ALTER TABLE chef_charge_stats ADD COLUMN peak_load REAL NOT NULL DEFAULT 0")
+    if "load_version" not in columns:
+        cur.execute("ALTER TABLE chef_charge_stats ADD COLUMN load_version INTEGER NOT NULL DEFAULT 0")
+
+    # =====================================================
+    # SCHEDULER LEADER LEASE + RUN METRICS (see leader.py)
+    # =====================================================
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS scheduler_lease (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        acquired_at REAL NOT NULL,
+        renewed_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS scheduler_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        started_at REAL NOT NULL,
+        duration_ms REAL NOT NULL,
+        projects_changed INTEGER DEFAULT 0,
+        chefs_changed INTEGER DEFAULT 0,
+        status TEXT NOT NULL CHECK(status IN ('ok','error')),
+        error TEXT
+    )
+    """)
+
+    # =====================================================
+    # CHANGE EVENTS (journal behind GET /events, see change_feed.py)
+    # =====================================================
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS change_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        company_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        entity_id INTEGER,
+        user_id INTEGER,
+        created_at REAL NOT NULL
+    )
+    """)
+
+    # =====================================================
+    # CACHE GENERATIONS (response cache keys, see response_cache.py)
+    # =====================================================
+    # A company's generation is the id of its last journaled change,
+    # kept here because change_events is pruned
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS cache_generations (
+        company_id INTEGER PRIMARY KEY,
+        generation INTEGER NOT NULL
+    )
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_cache_generation
+    AFTER INSERT ON change_events
+    WHEN NEW.kind != 'notification'
+    BEGIN
+        INSERT INTO cache_generations (company_id, generation)
+        VALUES (NEW.company_id, NEW.id)
+        ON CONFLICT(company_id) DO UPDATE SET generation = excluded.generation;
+    END
+    """)
+
+    # =====================================================
+    # TOKEN REVOCATIONS (see token_cache.Revocations)
+    # =====================================================
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS token_revocations (
+        user_id INTEGER PRIMARY KEY,
+        revoked_at REAL NOT NULL,
+        expires_at INTEGER NOT NULL
+    )
+    """)
+
+    # =====================================================
+    # BULK IMPORT JOBS (POST /ressource/bulk runs in the background)
+    # =====================================================
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        company_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        status TEXT NOT NULL CHECK(status IN ('queued','running','done','failed')),
+        rows INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        finished_at REAL,
+        result TEXT
+    )
+    """)
+
+    # =====================================================
+    # COMPANY STATS (materialized /statistics, kept by triggers)
+    # =====================================================
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS company_stats (
+        company_id INTEGER PRIMARY KEY,
+        chefs INTEGER NOT NULL DEFAULT 0,
+        resources INTEGER NOT NULL DEFAULT 0,
+        planned INTEGER NOT NULL DEFAULT 0,
+        active INTEGER NOT NULL DEFAULT 0,
+        finished INTEGER NOT NULL DEFAULT 0,
+        chef_profiles INTEGER NOT NULL DEFAULT 0,
+        charge_sum REAL NOT NULL DEFAULT 0,
+        FOREIGN KEY (company_id) REFERENCES companies(id) ON DELETE CASCADE
+    )
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_company_insert
+    AFTER INSERT ON companies
+    BEGIN
+        INSERT OR IGNORE INTO company_stats (company_id) VALUES (NEW.id);
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_user_insert
+    AFTER INSERT ON users
+    BEGIN
+        UPDATE company_stats
+        SET chefs = chefs + (NEW.role = 'CHEF'),
+            resources = resources + (NEW.role = 'RESSOURCE')
+        WHERE company_id = NEW.company_id;
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_user_delete
+    AFTER DELETE ON users
+    BEGIN
+        UPDATE company_stats
+        SET chefs = chefs - (OLD.role = 'CHEF'),
+            resources = resources - (OLD.role = 'RESSOURCE')
+        WHERE company_id = OLD.company_id;
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_project_insert
+    AFTER INSERT ON projects
+    BEGIN
+        UPDATE company_stats
+        SET planned = planned + (NEW.status = 'planned'),
+            active = active + (NEW.status = 'active'),
+            finished = finished + (NEW.status = 'finished')
+        WHERE company_id = NEW.company_id;
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_project_delete
+    AFTER DELETE ON projects
+    BEGIN
+        UPDATE company_stats
+        SET planned = planned - (OLD.status = 'planned'),
+            active = active - (OLD.status = 'active'),
+            finished = finished - (OLD.status = 'finished')
+        WHERE company_id = OLD.company_id;
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_project_status
+    AFTER UPDATE OF status ON projects
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE company_stats
+        SET planned = planned - (OLD.status = 'planned') + (NEW.status = 'planned'),
+            active = active - (OLD.status = 'active') + (NEW.status = 'active'),
+            finished = finished - (OLD.status = 'finished') + (NEW.status = 'finished')
+        WHERE company_id = NEW.company_id;
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_chef_profile_insert
+    AFTER INSERT ON chef_profiles
+    BEGIN
+        UPDATE company_stats
+        SET chef_profiles = chef_profiles + 1,
+            charge_sum = charge_sum + COALESCE(NEW.charge_affectee, 0)
+        WHERE company_id = (SELECT company_id FROM users WHERE id = NEW.chef_id);
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_chef_profile_delete
+    AFTER DELETE ON chef_profiles
+    BEGIN
+        UPDATE company_stats
+        SET chef_profiles = chef_profiles - 1,
+            charge_sum = charge_sum - COALESCE(OLD.charge_affectee, 0)
+        WHERE company_id = (SELECT company_id FROM users WHERE id = OLD.chef_id);
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_chef_charge
+    AFTER UPDATE OF charge_affectee ON chef_profiles
+    WHEN OLD.charge_affectee IS NOT NEW.charge_affectee
+    BEGIN
+        UPDATE company_stats
+        SET charge_sum = charge_sum - COALESCE(OLD.charge_affectee, 0)
+                                    + COALESCE(NEW.charge_affectee, 0)
+        WHERE company_id = (SELECT company_id FROM users WHERE id = NEW.chef_id);
+    END
+    """)
+
+    # =====================================================
+    # RESSOURCE CHARGE FROM TASKS (kept by triggers, see tasks.py)
+    # =====================================================
+    # open_task_hours = estimated hours of the resource's tasks not done;
+    # charge_affectee = open_task_hours vs weekly availability, capped at 100
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_task_hours_insert
+    AFTER INSERT ON tasks
+    WHEN NEW.ressource_id IS NOT NULL AND NEW.status != 'done'
+    BEGIN
+        UPDATE ressource_profiles
+        SET open_task_hours = open_task_hours + NEW.estimated_hours
+        WHERE ressource_id = NEW.ressource_id;
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_task_hours_delete
+    AFTER DELETE ON tasks
+    WHEN OLD.ressource_id IS NOT NULL AND OLD.status != 'done'
+    BEGIN
+        UPDATE ressource_profiles
+        SET open_task_hours = MAX(open_task_hours - OLD.estimated_hours, 0)
+        WHERE ressource_id = OLD.ressource_id;
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_task_hours_update
+    AFTER UPDATE OF ressource_id, status, estimated_hours ON tasks
+    WHEN OLD.ressource_id IS NOT NEW.ressource_id
+      OR (OLD.status = 'done') IS NOT (NEW.status = 'done')
+      OR OLD.estimated_hours IS NOT NEW.estimated_hours
+    BEGIN
+        UPDATE ressource_profiles
+        SET open_task_hours = MAX(open_task_hours - OLD.estimated_hours, 0)
+        WHERE ressource_id = OLD.ressource_id AND OLD.status != 'done';
+        UPDATE ressource_profiles
+        SET open_task_hours = open_task_hours + NEW.estimated_hours
+        WHERE ressource_id = NEW.ressource_id AND NEW.status != 'done';
+    END
+    """)
+
+    # Same formula as tasks.RESSOURCE_CHARGE_SQL (profile edits use that one)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_ressource_task_charge
+    AFTER UPDATE OF open_task_hours, disponibilite_hebdo ON ressource_profiles
+    WHEN NEW.open_task_hours IS NOT OLD.open_task_hours
+      OR (NEW.disponibilite_hebdo IS NOT OLD.disponibilite_hebdo AND NEW.open_task_hours > 0)
+    BEGIN
+        UPDATE ressource_profiles
+        SET charge_affectee = CASE
+            WHEN NEW.disponibilite_hebdo > 0
+            THEN MIN(CAST(ROUND(NEW.open_task_hours * 100.0 / NEW.disponibilite_hebdo) AS INTEGER), 100)
+            ELSE 100 * (NEW.open_task_hours > 0)
+        END
+        WHERE id = NEW.id;
+    END
+    """)
+
     # =====================================================
     # INDEXES 
     # =====================================================
@@ -186,12 +522,56 @@ def create_db():
     cur.execute("CREATE INDEX IF NOT EXISTS idx_projects_chef ON projects(chef_id)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_projects_status ON projects(status)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_projects_company ON projects(company_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_projects_chef_status ON projects(chef_id, status)")
+    # Due status transitions (jobs.py): only pending ones are indexed
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_projects_next_transition ON projects(next_transition_date)
+    WHERE next_transition_date IS NOT NULL
+    """)
+    # Keyset pagination of GET /projects: (scope, status rank, start_date DESC, id DESC)
+    # The CASE must stay identical to STATUS_RANK_SQL in main.py
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_projects_company_order ON projects(
+        company_id,
+        (CASE status WHEN 'active' THEN 1 WHEN 'planned' THEN 2 WHEN 'finished' THEN 3 END),
+        start_date DESC,
+        id DESC
+    )
+    """)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_projects_chef_order ON projects(
+        chef_id,
+        (CASE status WHEN 'active' THEN 1 WHEN 'planned' THEN 2 WHEN 'finished' THEN 3 END),
+        start_date DESC,
+        id DESC
+    )
+    """)
     cur.execute("CREATE INDEX IF NOT EXISTS idx_ressource_chef ON ressource_profiles(chef_id)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_project ON tasks(project_id)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_ressource ON tasks(ressource_id)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications(user_id)")
+    # Kanban board columns: (project, status, priority rank, id)
+    # The CASE must stay identical to PRIORITY_RANK_SQL in tasks.py
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_tasks_board ON tasks(
+        project_id,
+        status,
+        (CASE priority WHEN 'urgent' THEN 1 WHEN 'high' THEN 2 WHEN 'medium' THEN 3 WHEN 'low' THEN 4 END),
+        id
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_ressource_status ON tasks(ressource_id, status)")
+    # Serves unread badge counts and newest-first notification pages; its
+    # user_id prefix replaces the former idx_notifications_user
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_notifications_user_read
+    ON notifications(user_id, is_read, created_at)
+    """)
+    cur.execute("DROP INDEX IF EXISTS idx_notifications_user")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_activity_user ON activity_log(user_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_activity_entity ON activity_log(entity_type, entity_id, created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_activity_company ON activity_log(company_id, created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_change_events_company ON change_events(company_id, id)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_comments_task ON task_comments(task_id)")
 
     con.commit()
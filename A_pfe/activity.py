@@ -0,0 +1,200 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import cursors
+from batch_writer import BatchWriter
+
+ENTITY_TYPES = ("task", "project", "user", "comment")
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", 365))
+# Rows deleted per scheduler tick at most, so pruning a large backlog never
+# holds the write lock for long; the rest goes on the next ticks
+PRUNE_BATCH = int(os.getenv("ACTIVITY_PRUNE_BATCH", 10000))
+
+ACTIVITY_COLUMNS = ["id", "user_id", "action", "entity_type", "entity_id", "details", "created_at"]
+
+# Page cursor: (created_at, id)
+ACTIVITY_CURSOR = (str, int)
+
+def utc_timestamp():
+    """Same format as SQLite's CURRENT_TIMESTAMP"""
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+# =========================
+# WRITER
+# =========================
+class ActivityLog:
+    """
+    Append-only audit trail of the mutating routes
+
+    record() stamps the entry and queues it; the batch writer inserts
+    queued entries off the request thread, one transaction per flush, and
+    keeps activity_partitions (UTC day -> id range) up to date for
+    retention. Routes record after their commit, so rolled back changes
+    never show up. Entries are never dropped: when the queue is full the
+    caller writes them itself (lossless writer).
+    """
+
+    def __init__(self, pool, interval=None, max_batch=None):
+        self.writer = BatchWriter(
+            "activity", pool, self._write,
+            max_batch=max_batch or int(os.getenv("ACTIVITY_BATCH_SIZE", 1000)),
+            interval=interval if interval is not None else float(os.getenv("ACTIVITY_FLUSH_INTERVAL", 1)),
+            lossless=True,
+        )
+
+    def record(self, user, action, entity_type, entity_id, details=None):
+        """
+        Queue one entry
+
+        Args:
+            user: token data of the caller (id, company_id)
+            action: create, update, delete, assign, move, import, ...
+            entity_type: one of ENTITY_TYPES
+            entity_id: id of the changed row
+            details: optional JSON-serializable dict
+        """
+        return self.record_many(user, [(action, entity_type, entity_id, details)])
+
+    def record_many(self, user, entries):
+        """Queue entries of one caller, written in the same batch"""
+        now = utc_timestamp()
+        rows = []
+        for action, entity_type, entity_id, details in entries:
+            if entity_type not in ENTITY_TYPES:
+                raise ValueError(f"Unknown entity type: {entity_type}")
+            rows.append((user["id"], user["company_id"], action, entity_type, entity_id,
+                         json.dumps(details) if details is not None else None, now))
+        return self.writer.submit_many(rows)
+
+    def _write(self, cur, rows):
+        cur.executemany("""
+            INSERT INTO activity_log
+            (user_id, company_id, action, entity_type, entity_id, details, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+        # One executemany inside a write transaction gets consecutive
+        # AUTOINCREMENT ids ending at last_insert_rowid()
+        cur.execute("SELECT last_insert_rowid()")
+        first_id = cur.fetchone()[0] - len(rows) + 1
+        ranges = {}
+        for offset, row in enumerate(rows):
+            day, row_id = row[6][:10], first_id + offset
+            low, high = ranges.get(day, (row_id, row_id))
+            ranges[day] = (min(low, row_id), max(high, row_id))
+
+        cur.executemany("""
+            INSERT INTO activity_partitions (day, first_id, last_id)
+            VALUES (?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                first_id = MIN(first_id, excluded.first_id),
+                last_id = MAX(last_id, excluded.last_id)
+        """, [(day, low, high) for day, (low, high) in ranges.items()])
+
+    def flush(self, timeout=5):
+        return self.writer.flush(timeout)
+
+    def stats(self):
+        return self.writer.stats()
+
+# =========================
+# RETENTION
+# =========================
+def prune(cur, days=RETENTION_DAYS, limit=PRUNE_BATCH, today=None):
+    """
+    Delete at most `limit` entries from days older than the retention
+    window, oldest day first
+
+    Each expired day is a primary-key range from activity_partitions; a
+    day is dropped from the catalog once its range is empty. The
+    created_at guard keeps late rows of a newer day that landed inside
+    the range.
+
+    Returns:
+        int: rows deleted
+    """
+    cutoff = ((today or datetime.utcnow().date()) - timedelta(days=days)).isoformat()
+    cur.execute("""
+        SELECT day, first_id, last_id FROM activity_partitions
+        WHERE day < ? ORDER BY day
+    """, (cutoff,))
+    deleted = 0
+    for day, first_id, last_id in cur.fetchall():
+        budget = limit - deleted
+        if budget <= 0:
+            break
+        cur.execute("""
+            DELETE FROM activity_log WHERE id IN (
+                SELECT id FROM activity_log
+                WHERE id BETWEEN ? AND ? AND created_at < ?
+                ORDER BY id LIMIT ?
+            )
+        """, (first_id, last_id, cutoff, budget))
+        deleted += cur.rowcount
+        if cur.rowcount < budget:
+            cur.execute("DELETE FROM activity_partitions WHERE day=?", (day,))
+    return deleted
+
+def rebuild_partitions(cur):
+    """Catalog rows written before activity_partitions existed (once)"""
+    cur.execute("SELECT 1 FROM activity_partitions LIMIT 1")
+    if cur.fetchone():
+        return
+    cur.execute("""
+        INSERT INTO activity_partitions (day, first_id, last_id)
+        SELECT date(created_at), MIN(id), MAX(id)
+        FROM activity_log
+        WHERE date(created_at) IS NOT NULL
+        GROUP BY date(created_at)
+        ON CONFLICT(day) DO UPDATE SET
+            first_id = MIN(first_id, excluded.first_id),
+            last_id = MAX(last_id, excluded.last_id)
+    """)
+
+# =========================
+# QUERIES
+# =========================
+def page(cur, company_id, limit, after=None, entity_type=None, entity_id=None, user_id=None):
+    """
+    Newest-first page of a company's activity
+
+    With entity_type + entity_id this is the history of one row
+    (idx_activity_entity), otherwise the company feed
+    (idx_activity_company), optionally narrowed to one user.
+
+    Returns:
+        tuple: (list of entry dicts, next_cursor or None)
+    """
+    sql = f"SELECT {', '.join(ACTIVITY_COLUMNS)} FROM activity_log WHERE company_id=?"
+    args = [company_id]
+    if entity_type is not None:
+        sql += " AND entity_type=?"
+        args.append(entity_type)
+        if entity_id is not None:
+            sql += " AND entity_id=?"
+            args.append(entity_id)
+    if user_id is not None:
+        sql += " AND user_id=?"
+        args.append(user_id)
+    if after:
+        created_at, activity_id = after
+        sql += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+        args += [created_at, created_at, activity_id]
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    args.append(limit + 1)
+
+    cur.execute(sql, args)
+    rows = [dict(r) for r in cur.fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = cursors.encode(rows[-1]["created_at"], rows[-1]["id"])
+    for row in rows:
+        row["details"] = json.loads(row["details"]) if row["details"] else None
+    return rows, next_cursor
@@ -0,0 +1,165 @@
+import os
+import queue
+import threading
+import time
+
+class BatchWriter:
+    """
+    Background writer that turns many small inserts into few transactions
+
+    Producers call submit()/submit_many() and return immediately; a daemon
+    thread collects items for up to `interval` seconds (or `max_batch`
+    items) and hands them to `write(cur, items)` inside one transaction on
+    a pooled connection.
+
+    - The queue is bounded: when it is full new items are dropped and
+      counted rather than blocking a request thread. A `lossless` writer
+      (audit trail) instead waits up to `full_wait` seconds for room, then
+      writes the items on the caller's thread.
+    - A batch that fails is retried item by item, so one bad item only
+      loses itself (counted as "lost").
+    - The thread starts on first use in each process, so a writer created
+      before a fork (gunicorn preload) works in every worker.
+    - flush() waits until everything submitted so far is written.
+    """
+
+    def __init__(self, name, pool, write, max_batch=500, interval=0.5, max_queue=10000,
+                 lossless=False, full_wait=0.1):
+        self.name = name
+        self.pool = pool
+        self.write = write
+        self.max_batch = max_batch
+        self.interval = interval
+        self.max_queue = max_queue
+        self.lossless = lossless
+        self.full_wait = full_wait
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stats = {"submitted": 0, "written": 0, "batches": 0,
+                       "dropped": 0, "errors": 0, "retried": 0, "lost": 0,
+                       "sync_writes": 0}
+
+    # =========================
+    # PRODUCER SIDE
+    # =========================
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(self.max_queue)
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-writer",
+                                            daemon=True)
+            self._thread.start()
+
+    def submit(self, item):
+        """Queue one item; returns False when it was dropped"""
+        return self.submit_many([item])
+
+    def submit_many(self, items):
+        """Queue items that must be written in the same batch"""
+        items = list(items)
+        if not items:
+            return True
+        self._ensure_started()
+        try:
+            if self.lossless:
+                self._queue.put(items, timeout=self.full_wait)
+            else:
+                self._queue.put_nowait(items)
+        except queue.Full:
+            if not self.lossless:
+                with self._lock:
+                    self._stats["dropped"] += len(items)
+                print(f"⚠️ {self.name} queue full, dropped {len(items)} item(s)")
+                return False
+            # Still full: write them now rather than lose them
+            with self._lock:
+                self._stats["submitted"] += len(items)
+                self._stats["sync_writes"] += len(items)
+            self._write_batch(items)
+            return True
+        with self._lock:
+            self._stats["submitted"] += len(items)
+        return True
+
+    def flush(self, timeout=5):
+        """Block until every item submitted before this call is written"""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    # =========================
+    # WRITER THREAD
+    # =========================
+    def _run(self):
+        q = self._queue
+        while True:
+            batch, waiters = [], []
+            first = q.get()
+            deadline = time.monotonic() + self.interval
+            entry = first
+            while True:
+                if isinstance(entry, threading.Event):
+                    waiters.append(entry)
+                    break
+                batch.extend(entry)
+                if len(batch) >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write_batch(self, batch):
+        if self._try_write(batch) or len(batch) == 1:
+            return
+        # Keep every item that can be written
+        with self._lock:
+            self._stats["retried"] += len(batch)
+        for item in batch:
+            self._try_write([item])
+
+    def _try_write(self, items):
+        """One transaction; returns False (items not written) on error"""
+        con = self.pool.acquire()
+        try:
+            self.write(con.cursor(), items)
+            con.commit()
+            with self._lock:
+                self._stats["written"] += len(items)
+                self._stats["batches"] += 1
+            return True
+        except Exception as e:
+            con.rollback()
+            with self._lock:
+                self._stats["errors"] += 1
+                if len(items) == 1:
+                    self._stats["lost"] += 1
+            if len(items) == 1:
+                print(f"❌ {self.name} writer error (item lost): {e}")
+            else:
+                print(f"❌ {self.name} writer error ({len(items)} items, retrying one by one): {e}")
+            return False
+        finally:
+            con.close()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        data["queued"] = self._queue.qsize() if self._queue is not None else 0
+        return data
@@ -0,0 +1,104 @@
+"""
+Benchmark: onboarding a team, one POST /ressource per person vs /ressource/bulk
+
+Runs the real app (Flask test client) on a temporary database. The
+per-row path is timed on --legacy-rows rows and extrapolated; the bulk
+path imports --rows rows from one CSV upload. bcrypt dominates both, so
+the cost factor is a parameter (the app default is 12).
+
+Needs the scoring models (model_score.pkl, kmeans_cluster.pkl,
+scaler_cluster.pkl) in MODEL_DIR or the A_pfe folder.
+
+Usage:
+    python benchmarks/bench_bulk_import.py --rows 10000 --legacy-rows 200 --rounds 12
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+def csv_upload(rows, chef_id, offset):
+    lines = ["first_name,last_name,email,password,experience,cost_hour,"
+             "disponibilite_hebdo,charge_affectee,competence_moyenne,chef_id"]
+    for i in range(offset, offset + rows):
+        lines.append(f"bulk{i},user,bulk{i}@bench,password{i},{i % 21},{10 + i % 50},"
+                     f"{20 + i % 20},{i % 100},{i % 100},{chef_id}")
+    return ("\n".join(lines) + "\n").encode()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--legacy-rows", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_bulk_import_")
+    os.environ.update(
+        DB_NAME=os.path.join(work, "bulk.db"),
+        folder=os.path.join(work, "images"),
+        SECRET=os.getenv("SECRET", "bench-secret-" + "x" * 32),
+        BCRYPT_ROUNDS=str(args.rounds),
+        MAX_BULK_ROWS=str(max(args.rows, 10000)),
+        MODEL_DIR=os.getenv("MODEL_DIR", APP_DIR),
+        MODEL_WARMUP="sync",
+        RUN_SCHEDULER="0",
+    )
+    try:
+        import main as app_main
+
+        client = app_main.app.test_client()
+        client.post("/register", data={"company_name": "bench", "first_name": "rh",
+                                       "last_name": "bench", "email": "rh@bench",
+                                       "password": "bench-password"})
+        token = client.post("/login", data={"email": "rh@bench",
+                                            "password": "bench-password"}).json["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        client.post("/chef", data={"first_name": "chef", "last_name": "bench",
+                                   "email": "chef@bench", "password": "bench-password"},
+                    headers=headers)
+        con = app_main.db_pool.acquire()
+        chef_id = con.execute("SELECT id FROM users WHERE email='chef@bench'").fetchone()["id"]
+        con.close()
+
+        t0 = time.perf_counter()
+        for i in range(args.legacy_rows):
+            r = client.post("/ressource", data={
+                "first_name": f"res{i}", "last_name": "user", "email": f"res{i}@bench",
+                "password": f"password{i}", "experience": i % 21, "chef_id": chef_id,
+            }, headers=headers)
+            assert r.status_code == 201, r.json
+        legacy = (time.perf_counter() - t0) / args.legacy_rows
+
+        data = csv_upload(args.rows, chef_id, 0)
+        t0 = time.perf_counter()
+        r = client.post("/ressource/bulk", data={"file": (io.BytesIO(data), "team.csv")},
+                        headers=headers, content_type="multipart/form-data")
+        assert r.status_code == 202, r.json
+        accepted = time.perf_counter() - t0
+        # The import runs in the background: poll until it finishes
+        while True:
+            job = client.get(r.json["status_url"], headers=headers).json
+            if job["status"] in ("done", "failed"):
+                break
+            time.sleep(0.1)
+        bulk = time.perf_counter() - t0
+        assert job["status"] == "done" and job["created"] == args.rows, job
+
+        print(f"bcrypt cost {args.rounds}, {os.cpu_count()} CPUs")
+        print(f"per-row /ressource : {legacy * 1000:8.2f} ms/row "
+              f"-> {legacy * args.rows:8.2f}s for {args.rows} rows (extrapolated)")
+        print(f"/ressource/bulk    : {bulk / args.rows * 1000:8.2f} ms/row "
+              f"-> {bulk:8.2f}s for {args.rows} rows "
+              f"(request answered in {accepted:.2f}s)")
+        print(f"speed-up           : {legacy * args.rows / bulk:8.1f}x")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark: update_projects_and_charge, legacy per-row loop vs event-driven SQL
+
+Seeds a temporary SQLite database, then runs both implementations on
+identical copies of it and checks they leave the same project statuses
+and chef charges (days_remaining is derived at read time now).
+
+Usage:
+    python benchmarks/bench_scheduler.py --projects 100000 --chefs 200
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import charge
+import jobs
+from seed import seed
+
+def connect(db_path):
+    con = sqlite3.connect(db_path)
+    con.row_factory = sqlite3.Row
+    return con, con.cursor()
+
+# =========================
+# IMPLEMENTATIONS
+# =========================
+def legacy_loop(cur, today_date):
+    """The original update_projects_and_charge body (one UPDATE per row)"""
+    cur.execute("SELECT * FROM projects")
+    for proj in cur.fetchall():
+        status = proj["status"]
+        try:
+            start_date = datetime.strptime(proj["start_date"], "%Y-%m-%d").date()
+            end_date = datetime.strptime(proj["end_date"], "%Y-%m-%d").date()
+        except Exception:
+            continue
+
+        new_status = status
+        if status == "planned":
+            if today_date < start_date:
+                new_status = "planned"
+            elif start_date <= today_date <= end_date:
+                new_status = "active"
+            else:
+                new_status = "finished"
+        elif status == "active":
+            if today_date > end_date:
+                new_status = "finished"
+
+        if new_status == "planned":
+            days_remaining = max((start_date - today_date).days, 0)
+        elif new_status == "active":
+            days_remaining = max((end_date - today_date).days, 0)
+        else:
+            days_remaining = 0
+
+        cur.execute("UPDATE projects SET status=?, days_remaining=? WHERE id=?",
+                    (new_status, days_remaining, proj["id"]))
+
+    cur.execute("SELECT id FROM users WHERE role='CHEF'")
+    for chef in cur.fetchall():
+        new_charge = charge.recompute_charge(cur, chef["id"])
+        cur.execute("UPDATE chef_profiles SET charge_affectee=? WHERE chef_id=?",
+                    (new_charge, chef["id"]))
+
+def event_driven(cur, today_date):
+    return jobs.run_status_and_charge_update(cur, today_date)
+
+def timed(db_path, fn, today):
+    con, cur = connect(db_path)
+    t0 = time.perf_counter()
+    result = fn(cur, today)
+    con.commit()
+    elapsed = time.perf_counter() - t0
+    con.close()
+    return elapsed, result
+
+def snapshot(db_path):
+    con, cur = connect(db_path)
+    projects = cur.execute("SELECT id, status FROM projects ORDER BY id").fetchall()
+    charges = cur.execute("SELECT chef_id, charge_affectee FROM chef_profiles ORDER BY chef_id").fetchall()
+    con.close()
+    return ([tuple(r) for r in projects],
+            {r["chef_id"]: r["charge_affectee"] for r in charges})
+
+# =========================
+# MAIN
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--projects", type=int, default=100000)
+    parser.add_argument("--chefs", type=int, default=200)
+    parser.add_argument("--resources-per-chef", type=int, default=5)
+    args = parser.parse_args()
+
+    today = datetime.now().date()
+    work = tempfile.mkdtemp(prefix="bench_scheduler_")
+    try:
+        base = os.path.join(work, "base.db")
+        t0 = time.perf_counter()
+        seed(base, chefs=args.chefs, resources_per_chef=args.resources_per_chef,
+             projects=args.projects, today=today)
+        print(f"Seeded {args.projects} projects / {args.chefs} chefs in {time.perf_counter() - t0:.2f}s")
+
+        legacy_db = os.path.join(work, "legacy.db")
+        set_db = os.path.join(work, "set.db")
+        shutil.copy(base, legacy_db)
+        shutil.copy(base, set_db)
+
+        legacy_time, _ = timed(legacy_db, legacy_loop, today)
+        set_time, changed = timed(set_db, event_driven, today)
+        # Second tick: no transition due
+        idle_time, idle_changed = timed(set_db, event_driven, today)
+
+        print(f"legacy loop        : {legacy_time:8.3f}s")
+        print(f"event-driven (1st) : {set_time:8.3f}s  changed={changed}")
+        print(f"event-driven (idle): {idle_time:8.3f}s  changed={idle_changed}")
+        print(f"speed-up           : {legacy_time / set_time:8.1f}x")
+
+        legacy_projects, legacy_charges = snapshot(legacy_db)
+        set_projects, set_charges = snapshot(set_db)
+        print("projects identical :", legacy_projects == set_projects)
+        # SQL ROUND and Python round() may disagree on the last decimal
+        print("charges identical  :", legacy_charges.keys() == set_charges.keys() and all(
+            abs(legacy_charges[k] - set_charges[k]) <= 0.011 for k in legacy_charges))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: /statistics queries at ~10k users per company
+
+Compares the legacy four-query implementation, the materialized
+company_stats lookup and the ?fresh=1 one-pass CTE, and checks that all
+three return the same statistics.
+
+Usage:
+    python benchmarks/bench_statistics.py --companies 3 --chefs 500 --resources-per-chef 19
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import company_stats
+from seed import seed
+
+def legacy(cur, company_id):
+    """The original get_statistics body (four queries)"""
+    cur.execute("SELECT COUNT(*) as count FROM users WHERE role='CHEF' AND company_id=?",
+                (company_id,))
+    chefs_count = cur.fetchone()["count"]
+    cur.execute("SELECT COUNT(*) as count FROM users WHERE role='RESSOURCE' AND company_id=?",
+                (company_id,))
+    resources_count = cur.fetchone()["count"]
+    cur.execute("SELECT status, COUNT(*) as count FROM projects WHERE company_id=? GROUP BY status",
+                (company_id,))
+    projects_stats = {row["status"]: row["count"] for row in cur.fetchall()}
+    cur.execute("""
+        SELECT AVG(charge_affectee) as avg_charge
+        FROM chef_profiles cp
+        JOIN users u ON u.id = cp.chef_id
+        WHERE u.company_id=?
+    """, (company_id,))
+    avg_charge = cur.fetchone()["avg_charge"] or 0
+    return {"chefs": chefs_count, "resources": resources_count,
+            "projects": projects_stats, "average_charge": round(avg_charge, 2)}
+
+def materialized(cur, company_id):
+    return company_stats.to_response(company_stats.get(cur, company_id))
+
+def fresh(cur, company_id):
+    return company_stats.to_response(company_stats.compute(cur, company_id))
+
+def measure(cur, fn, company_ids, iterations):
+    samples = []
+    for i in range(iterations):
+        company_id = company_ids[i % len(company_ids)]
+        t0 = time.perf_counter()
+        fn(cur, company_id)
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "mean": statistics.mean(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[int(len(samples) * 0.95) - 1],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--companies", type=int, default=3)
+    parser.add_argument("--chefs", type=int, default=500)
+    parser.add_argument("--resources-per-chef", type=int, default=19)
+    parser.add_argument("--projects", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_statistics_")
+    try:
+        db_path = os.path.join(work, "stats.db")
+        created = seed(db_path, companies=args.companies, chefs=args.chefs,
+                       resources_per_chef=args.resources_per_chef, projects=args.projects)
+        company_ids = created["companies"]
+        users = 1 + args.chefs * (1 + args.resources_per_chef)
+        print(f"{args.companies} companies x {users} users, {args.projects} projects each")
+
+        con = sqlite3.connect(db_path)
+        con.row_factory = sqlite3.Row
+        cur = con.cursor()
+
+        for company_id in company_ids:
+            expected = legacy(cur, company_id)
+            assert materialized(cur, company_id) == expected, "materialized mismatch"
+            assert fresh(cur, company_id) == expected, "fresh mismatch"
+
+        print(f"{'implementation':<16}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, fn in (("legacy 4 queries", legacy), ("materialized", materialized),
+                         ("fresh CTE", fresh)):
+            r = measure(cur, fn, company_ids, args.iterations)
+            print(f"{name:<16}{r['mean']:>10.3f}{r['p50']:>10.3f}{r['p95']:>10.3f}")
+        con.close()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
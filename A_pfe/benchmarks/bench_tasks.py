@@ -0,0 +1,118 @@
+"""
+Benchmark: kanban board queries and task moves on a 50k-task board
+
+Seeds one company, then fills a single project board with --tasks tasks
+assigned to the chef's resources. Measures the board's first page (all
+columns + counts) with and without idx_tasks_board, paging through a
+whole column, and task moves (whose triggers keep each resource's
+open_task_hours / charge_affectee up to date). Finally checks the
+incrementally maintained hours against a full rebuild.
+
+Usage:
+    python benchmarks/bench_tasks.py --tasks 50000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cursors
+import tasks
+from seed import seed
+
+def connect(db_path):
+    con = sqlite3.connect(db_path)
+    con.row_factory = sqlite3.Row
+    return con, con.cursor()
+
+def fill_board(cur, project_id, ressource_ids, count, rnd):
+    cur.executemany("""
+        INSERT INTO tasks (project_id, ressource_id, title, priority, status, estimated_hours)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(project_id, rnd.choice(ressource_ids), f"task {i}",
+           rnd.choice(tasks.TASK_PRIORITIES), rnd.choice(tasks.TASK_STATUSES),
+           rnd.randint(1, 16)) for i in range(count)])
+
+def load_board(cur, project_id, limit):
+    counts = tasks.column_counts(cur, project_id)
+    return {status: tasks.column_page(cur, project_id, status, limit)
+            for status in tasks.TASK_STATUSES}, counts
+
+def measure(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=50000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--moves", type=int, default=5000)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    work = tempfile.mkdtemp(prefix="bench_tasks_")
+    try:
+        db_path = os.path.join(work, "tasks.db")
+        seed(db_path, companies=1, chefs=2, resources_per_chef=25, projects=10)
+        con, cur = connect(db_path)
+        project = cur.execute("SELECT id, chef_id FROM projects ORDER BY id LIMIT 1").fetchone()
+        ressource_ids = [r["ressource_id"] for r in cur.execute(
+            "SELECT ressource_id FROM ressource_profiles WHERE chef_id=?", (project["chef_id"],))]
+
+        t0 = time.perf_counter()
+        fill_board(cur, project["id"], ressource_ids, args.tasks, rnd)
+        con.commit()
+        print(f"{args.tasks} tasks on one board, {len(ressource_ids)} assignees "
+              f"(inserted in {time.perf_counter() - t0:.2f}s)")
+
+        print(f"{'operation':<34}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        board = measure(lambda: load_board(cur, project["id"], args.limit), args.iterations)
+        print(f"{'board page (indexed)':<34}{board[0]:>10.3f}{board[1]:>10.3f}{board[2]:>10.3f}")
+
+        def walk_column():
+            page, cursor = tasks.column_page(cur, project["id"], "todo", 500)
+            while cursor:
+                page, cursor = tasks.column_page(cur, project["id"], "todo", 500,
+                                                 cursors.decode(cursor, tasks.TASK_CURSOR))
+        walk = measure(walk_column, max(args.iterations // 20, 3))
+        print(f"{'whole todo column, 500/page':<34}{walk[0]:>10.3f}{walk[1]:>10.3f}{walk[2]:>10.3f}")
+
+        task_ids = [r["id"] for r in cur.execute("SELECT id FROM tasks")]
+        t0 = time.perf_counter()
+        for _ in range(args.moves):
+            cur.execute("UPDATE tasks SET status=? WHERE id=?",
+                        (rnd.choice(tasks.TASK_STATUSES), rnd.choice(task_ids)))
+            con.commit()
+        elapsed = time.perf_counter() - t0
+        print(f"{'task move + commit':<34}{elapsed / args.moves * 1000:>10.3f}"
+              f"{'':>10}{'':>10}  ({args.moves / elapsed:.0f} moves/s)")
+
+        drift = tasks.rebuild_task_hours(cur)
+        con.rollback()
+        print("incremental hours match rebuild:", drift == 0)
+
+        cur.execute("DROP INDEX idx_tasks_board")
+        unindexed = measure(lambda: load_board(cur, project["id"], args.limit),
+                            max(args.iterations // 10, 3))
+        print(f"{'board page (no idx_tasks_board)':<34}{unindexed[0]:>10.3f}"
+              f"{unindexed[1]:>10.3f}{unindexed[2]:>10.3f}")
+        con.rollback()
+        con.close()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
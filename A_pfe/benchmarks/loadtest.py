@@ -0,0 +1,577 @@
+"""
+Load test: concurrent clients against run_production.py
+
+Seeds a database at a preset scale (seed.py), starts run_production.py on
+it, then drives a weighted mix of /login, /projects, /dashboard/resources,
+/statistics and /project/create from --concurrency keep-alive clients,
+while the scheduler job (jobs.run_status_and_charge_update) ticks against
+the same database. Reports p50/p95/p99 latency and throughput per
+operation and saves them as JSON; --compare flags regressions against an
+earlier result (exit code 1).
+
+--scenario images drives /images instead: full fetches of small (memory
+cache) and large (send_file) profile images, and repeat fetches that
+revalidate with If-None-Match (304). The images are seeded next to the
+database, in the folder the started server serves (see images_folder()).
+
+Usage:
+    python benchmarks/loadtest.py --scale 1k --concurrency 16 --duration 30
+    python benchmarks/loadtest.py --scale 100k --server gunicorn --workers 4 --rounds 12 \
+        --compare benchmarks/results/loadtest-100k-gunicorn-20260101-120000.json
+    python benchmarks/loadtest.py --scale 10 --scenario images --concurrency 32
+    python benchmarks/loadtest.py --scale 1k --seed-only /tmp/bench.db
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --db /tmp/bench.db
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+import jobs
+from seed import SEED_PASSWORD, seed, seed_images
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Total projects across all companies; users grow with the scale
+SCALES = {
+    "10": dict(companies=1, chefs=2, resources_per_chef=3, projects=10),
+    "1k": dict(companies=2, chefs=25, resources_per_chef=8, projects=1000),
+    "100k": dict(companies=10, chefs=200, resources_per_chef=10, projects=100000),
+}
+
+# Relative weights of the request mix, per scenario
+MIXES = {
+    "api": {
+        "projects": 35,
+        "statistics": 20,
+        "login": 15,
+        "dashboard": 15,
+        "create_project": 15,
+    },
+    "images": {
+        "image_small": 30,
+        "image_large": 10,
+        "image_304": 60,
+    },
+}
+
+# A refused project (team over capacity) is a normal answer, not an error,
+# and so is a login turned away by the password hasher's queue limit
+EXPECTED = {
+    "login": {200, 429},
+    "projects": {200},
+    "dashboard": {200},
+    "statistics": {200},
+    "create_project": {201, 400},
+    "image_small": {200},
+    "image_large": {200},
+    "image_304": {304},
+}
+
+# Operations that need no token
+PUBLIC = {"image_small", "image_large", "image_304"}
+
+# =========================
+# HTTP CLIENT
+# =========================
+class Client:
+    """One keep-alive connection; reconnects once when the server drops it"""
+
+    def __init__(self, host, port, timeout=60):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.conn = None
+        self.token = None
+
+    def request(self, method, path, form=None, headers=None):
+        body = urlencode(form) if form is not None else None
+        headers = dict(headers or {})
+        if body is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                resp = self.conn.getresponse()
+                data = resp.read()
+                if resp.getheader("Connection", "").lower() == "close":
+                    self.close()
+                return resp.status, data
+            except (http.client.HTTPException, ConnectionError, socket.timeout, OSError):
+                self.close()
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+# =========================
+# WORKLOAD
+# =========================
+def login(client, email):
+    status, data = client.request("POST", "/login", {"email": email, "password": SEED_PASSWORD})
+    if status == 200:
+        client.token = json.loads(data)["token"]
+    return status
+
+def build_operations(rh_emails, chefs, images):
+    """
+    name -> fn(client, company_index, rnd) -> status
+
+    Each client acts as the RH of one company; create_project picks one
+    of that company's chefs. image_304 is a browser revalidating an image
+    it already has (its ETag is the content hash in the name).
+    """
+    def op_login(client, c, rnd):
+        return login(client, rh_emails[c])
+
+    def op_projects(client, c, rnd):
+        return client.request("GET", "/projects?limit=50")[0]
+
+    def op_dashboard(client, c, rnd):
+        return client.request("GET", "/dashboard/resources")[0]
+
+    def op_statistics(client, c, rnd):
+        return client.request("GET", "/statistics")[0]
+
+    def op_create_project(client, c, rnd):
+        start = date.today() + timedelta(days=rnd.randint(-30, 60))
+        end = start + timedelta(days=rnd.randint(5, 120))
+        return client.request("POST", "/project/create", {
+            "name": f"load-{rnd.getrandbits(48):x}",
+            "description": "load test",
+            "difficulty": rnd.choice(["easy", "medium", "hard"]),
+            "estimated_hours": rnd.randint(8, 400),
+            "chef_id": rnd.choice(chefs[c]),
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+        })[0]
+
+    def op_image_small(client, c, rnd):
+        return client.request("GET", "/images/" + rnd.choice(images["small"]))[0]
+
+    def op_image_large(client, c, rnd):
+        return client.request("GET", "/images/" + rnd.choice(images["large"]))[0]
+
+    def op_image_304(client, c, rnd):
+        filename = rnd.choice(images["small"] + images["large"])
+        etag = '"%s"' % filename.rsplit(".", 1)[0]
+        return client.request("GET", "/images/" + filename, headers={"If-None-Match": etag})[0]
+
+    return {
+        "login": op_login,
+        "projects": op_projects,
+        "dashboard": op_dashboard,
+        "statistics": op_statistics,
+        "create_project": op_create_project,
+        "image_small": op_image_small,
+        "image_large": op_image_large,
+        "image_304": op_image_304,
+    }
+
+def client_loop(index, host, port, operations, mix, companies, deadline, samples, seed_value):
+    """Run the weighted mix until the deadline, appending (op, seconds, status)"""
+    rnd = random.Random(seed_value + index)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    company = index % companies
+    client = Client(host, port)
+    try:
+        # Every later request needs the token: back off while the
+        # password hasher turns logins away (429)
+        while (set(mix) - PUBLIC and operations["login"](client, company, rnd) == 429
+               and time.monotonic() < deadline):
+            time.sleep(rnd.uniform(0.1, 0.5))
+        while time.monotonic() < deadline:
+            name = rnd.choices(names, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                status = operations[name](client, company, rnd)
+            except Exception as e:
+                status = f"error: {type(e).__name__}"
+            samples.append((name, time.perf_counter() - t0, status))
+    finally:
+        client.close()
+
+def scheduler_loop(db_path, every, deadline, samples):
+    """Tick the status/charge job on its own connection, like the leader does"""
+    while time.monotonic() < deadline:
+        con = sqlite3.connect(db_path, timeout=30)
+        con.row_factory = sqlite3.Row
+        t0 = time.perf_counter()
+        try:
+            jobs.run_status_and_charge_update(con.cursor(), date.today())
+            con.commit()
+            status = 200
+        except Exception as e:
+            con.rollback()
+            status = f"error: {type(e).__name__}"
+        finally:
+            con.close()
+        samples.append(("scheduler", time.perf_counter() - t0, status))
+        time.sleep(max(0.0, min(every, deadline - time.monotonic())))
+
+# =========================
+# SERVER
+# =========================
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def images_folder(db_path):
+    """Folder of the profile images that go with a database"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "images")
+
+def read_images(db_path):
+    """Seeded images next to the database, split like seed_images() returns them"""
+    import images
+    folder = images_folder(db_path)
+    found = {"small": [], "large": []}
+    for filename in sorted(os.listdir(folder)) if os.path.isdir(folder) else ():
+        if images.CONTENT_ADDRESSED.match(filename):
+            size = os.path.getsize(os.path.join(folder, filename))
+            found["small" if size <= images.SMALL_FILE_LIMIT else "large"].append(filename)
+    return found
+
+def server_stats(host, port):
+    """/health of the server (one worker's under gunicorn), None when unreadable"""
+    try:
+        conn = http.client.HTTPConnection(host, port, timeout=10)
+        conn.request("GET", "/health")
+        data = json.loads(conn.getresponse().read())
+        conn.close()
+        return data
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+
+def start_server(db_path, args, log_path):
+    """run_production.py on a free port, with the in-process scheduler off"""
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "DB_NAME": db_path,
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "SERVER": args.server,
+        "THREADS": str(args.threads),
+        "WEB_CONCURRENCY": str(args.workers),
+        "SECRET": env.get("SECRET") or "loadtest-secret-" + "x" * 32,
+        # Same cost as the seeded hash, so logins are not rehashed
+        "BCRYPT_ROUNDS": str(args.rounds),
+        "RUN_SCHEDULER": "0",
+        "MODEL_DIR": args.model_dir,
+        "folder": images_folder(db_path),
+    })
+    log = open(log_path, "w")
+    proc = subprocess.Popen([sys.executable, "run_production.py"], cwd=APP_DIR, env=env,
+                            stdout=log, stderr=subprocess.STDOUT)
+    return proc, log, port
+
+def wait_healthy(host, port, proc=None, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=5)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+            conn.close()
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("Server did not become healthy")
+
+def stop_server(proc, log):
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    log.close()
+
+def read_accounts(db_path):
+    """RH emails and chef ids per company of an already seeded database"""
+    con = sqlite3.connect(db_path)
+    rh_emails, chefs = [], []
+    companies = [r[0] for r in con.execute("SELECT id FROM companies ORDER BY id")]
+    for company_id in companies:
+        rh = con.execute("SELECT email FROM users WHERE company_id=? AND role='RH' ORDER BY id LIMIT 1",
+                         (company_id,)).fetchone()
+        chef_ids = [r[0] for r in con.execute(
+            "SELECT id FROM users WHERE company_id=? AND role='CHEF' ORDER BY id", (company_id,))]
+        if rh and chef_ids:
+            rh_emails.append(rh[0])
+            chefs.append(chef_ids)
+    con.close()
+    return rh_emails, chefs
+
+# =========================
+# REPORT
+# =========================
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    low = int(k)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+
+def summarize(samples, elapsed):
+    """Per-operation and overall latency (ms) / throughput (req/s)"""
+    by_op = {}
+    for name, seconds, status in samples:
+        by_op.setdefault(name, []).append((seconds, status))
+
+    def stats(entries, expected):
+        latencies = sorted(s * 1000 for s, _ in entries)
+        statuses = {}
+        for _, status in entries:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(1 for _, status in entries if status not in expected)
+        return {
+            "count": len(entries),
+            "errors": errors,
+            "throughput": round(len(entries) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+            "statuses": statuses,
+        }
+
+    operations = {name: stats(entries, EXPECTED.get(name, {200}))
+                  for name, entries in sorted(by_op.items())}
+    http_entries = [e for name, entries in by_op.items() if name != "scheduler" for e in entries]
+    total = stats(http_entries, set().union(*EXPECTED.values()))
+    return operations, total
+
+def print_table(operations, total):
+    print(f"{'operation':<16}{'count':>8}{'errors':>8}{'req/s':>10}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in list(operations.items()) + [("TOTAL (http)", total)]:
+        print(f"{name:<16}{s['count']:>8}{s['errors']:>8}{s['throughput']:>10.1f}"
+              f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def compare(previous_path, result, tolerance):
+    """
+    Print p95 and throughput changes against an earlier run
+
+    Returns:
+        list: names of the operations that regressed beyond the tolerance
+    """
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\nCompared with {previous_path} (commit {previous['meta'].get('commit')}):")
+    print(f"{'operation':<16}{'p95 before':>12}{'p95 after':>12}{'change':>9}"
+          f"{'req/s before':>14}{'req/s after':>13}{'change':>9}")
+    regressions = []
+    rows = dict(result["operations"], **{"TOTAL (http)": result["total"]})
+    old_rows = dict(previous["operations"], **{"TOTAL (http)": previous["total"]})
+    for name, new in rows.items():
+        old = old_rows.get(name)
+        if not old or not old["count"] or not new["count"]:
+            continue
+        p95_change = (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0.0
+        rps_change = (new["throughput"] - old["throughput"]) / old["throughput"] if old["throughput"] else 0.0
+        regressed = p95_change > tolerance or rps_change < -tolerance or new["errors"] > old["errors"]
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<16}{old['p95_ms']:>12.1f}{new['p95_ms']:>12.1f}{p95_change:>+9.0%}"
+              f"{old['throughput']:>14.1f}{new['throughput']:>13.1f}{rps_change:>+9.0%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    if previous["meta"].get("scale") != result["meta"].get("scale"):
+        print("⚠️  Scales differ, the comparison is only indicative")
+    if previous["meta"].get("scenario", "api") != result["meta"].get("scenario"):
+        print("⚠️  Scenarios differ, the comparison is only indicative")
+    return regressions
+
+# =========================
+# MAIN
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--scenario", choices=sorted(MIXES), default="api",
+                        help="api: the JSON routes, images: /images (200 and 304)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of load not measured")
+    parser.add_argument("--server", choices=["gunicorn", "waitress"], default="waitress")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--scheduler-every", type=float, default=5,
+                        help="seconds between scheduler ticks, 0 disables them")
+    parser.add_argument("--model-dir", default=os.getenv("MODEL_DIR", APP_DIR))
+    parser.add_argument("--rounds", type=int, default=int(os.getenv("BCRYPT_ROUNDS", 12)),
+                        help="bcrypt cost of the seeded passwords and the server "
+                             "(default: the app's, BCRYPT_ROUNDS or 12)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seed-only", metavar="DB", help="only seed DB at --scale and exit")
+    parser.add_argument("--url", help="drive an already running server (needs --db)")
+    parser.add_argument("--db", help="database of the --url server")
+    parser.add_argument("--output", help="result file (default benchmarks/results/...)")
+    parser.add_argument("--compare", metavar="JSON", help="earlier result to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed p95 increase / throughput drop before flagging (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    per_company = dict(chefs=scale["chefs"], resources_per_chef=scale["resources_per_chef"],
+                       projects=max(scale["projects"] // scale["companies"], 1))
+
+    if args.seed_only:
+        t0 = time.perf_counter()
+        created = seed(args.seed_only, companies=scale["companies"], random_seed=args.seed,
+                       rounds=args.rounds, **per_company)
+        seed_images(images_folder(args.seed_only), random_seed=args.seed)
+        print(f"Seeded {args.seed_only} ({args.scale}) in {time.perf_counter() - t0:.1f}s")
+        print(f"RH logins: {', '.join(created['rh_emails'])} / {SEED_PASSWORD}")
+        return
+
+    if args.url and not args.db:
+        parser.error("--url needs --db (accounts and the scheduler job read it)")
+
+    work = tempfile.mkdtemp(prefix="loadtest_")
+    proc = log = None
+    try:
+        if args.url:
+            db_path = args.db
+            parts = urlsplit(args.url)
+            host, port = parts.hostname, parts.port or 80
+            server = "external"
+        else:
+            db_path = os.path.join(work, "load.db")
+            t0 = time.perf_counter()
+            seed(db_path, companies=scale["companies"], random_seed=args.seed,
+                 rounds=args.rounds, **per_company)
+            seed_images(images_folder(db_path), random_seed=args.seed)
+            print(f"Seeded {args.scale} scale in {time.perf_counter() - t0:.1f}s")
+            log_path = os.path.join(work, "server.log")
+            proc, log, port = start_server(db_path, args, log_path)
+            host, server = "127.0.0.1", args.server
+            print(f"Starting {server} on port {port} (log: {log_path})")
+
+        wait_healthy(host, port, proc)
+        rh_emails, chefs = read_accounts(db_path)
+        if not rh_emails:
+            raise RuntimeError("No company with an RH and chefs in the database")
+        images = read_images(db_path)
+        if args.scenario == "images" and not (images["small"] and images["large"]):
+            raise RuntimeError(f"No small and large images in {images_folder(db_path)}")
+        operations = build_operations(rh_emails, chefs, images)
+        mix = MIXES[args.scenario]
+
+        def run(seconds, scheduler):
+            samples = []
+            deadline = time.monotonic() + seconds
+            threads = [threading.Thread(target=client_loop, daemon=True,
+                                        args=(i, host, port, operations, mix, len(rh_emails),
+                                              deadline, samples, args.seed))
+                       for i in range(args.concurrency)]
+            if scheduler and args.scheduler_every > 0:
+                threads.append(threading.Thread(target=scheduler_loop, daemon=True,
+                                                args=(db_path, args.scheduler_every, deadline, samples)))
+            t0 = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            return samples, time.perf_counter() - t0
+
+        if args.warmup > 0:
+            run(args.warmup, scheduler=False)
+        samples, elapsed = run(args.duration, scheduler=True)
+        health = server_stats(host, port) or {}
+
+        operations_stats, total = summarize(samples, elapsed)
+        result = {
+            "meta": {
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "scale": args.scale,
+                "scenario": args.scenario,
+                "seed": dict(scale, random_seed=args.seed),
+                "server": server,
+                "workers": args.workers if server == "gunicorn" else 1,
+                "threads": args.threads,
+                "bcrypt_rounds": args.rounds,
+                "concurrency": args.concurrency,
+                "duration_s": round(elapsed, 2),
+                "scheduler_every_s": args.scheduler_every,
+                "mix": mix,
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+            },
+            "operations": operations_stats,
+            "total": total,
+            "server": {name: health.get(name) for name in ("image_cache", "db_pool")},
+        }
+
+        print()
+        print_table(operations_stats, total)
+        if args.scenario == "images":
+            print(f"\nServer image cache: {result['server']['image_cache']}")
+            print(f"Server db pool: {result['server']['db_pool']}")
+
+        output = args.output
+        if not output:
+            os.makedirs(RESULTS_DIR, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            output = os.path.join(RESULTS_DIR, f"loadtest-{args.scale}-{server}-{stamp}.json")
+        with open(output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults saved to {output}")
+
+        if args.compare:
+            regressions = compare(args.compare, result, args.tolerance)
+            if regressions:
+                print(f"❌ Regressions: {', '.join(regressions)}")
+                sys.exit(1)
+            print("✅ No regression beyond tolerance")
+    finally:
+        if proc is not None:
+            stop_server(proc, log)
+        if proc is not None and proc.returncode not in (0, -signal.SIGTERM):
+            print(f"⚠️  Server exited with code {proc.returncode}, see {log.name}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
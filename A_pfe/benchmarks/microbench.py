@@ -0,0 +1,369 @@
+"""
+Microbenchmarks: scoring, charge calculation, scheduler and dashboard internals
+
+Times the functions behind the hot routes directly, offline, on temporary
+and in-memory SQLite databases (no server, no HTTP):
+
+    score.single / score.batch       score.ressource_score vs ressource_scores
+    calculate_chef_charge            O(1) read and verify=True recompute, by project count
+    update_projects_and_charge       the scheduler's set-based status/charge
+                                     update (jobs.run_status_and_charge_update),
+                                     first tick and idle tick, by table size
+    dashboard.group / dashboard.stream
+                                     DASHBOARD_RH_SQL rows -> nested dicts / streamed JSON
+    save_profile_img                 new and duplicate uploads (thumbnails run off the
+                                     request path and are not timed)
+
+Each benchmark runs --rounds rounds (calibrated to at least --min-time
+seconds each) and reports min/median/mean/stddev per call, in the manner
+of pytest-benchmark. Results are saved per commit as
+benchmarks/results/micro-<commit>.json, and a table compares the run
+with earlier results, so the effect of a change is measurable.
+
+Needs the scoring models in MODEL_DIR or the A_pfe folder.
+
+Usage:
+    python benchmarks/microbench.py                       # run all, compare with the previous result
+    python benchmarks/microbench.py --quick --only charge,dashboard
+    python benchmarks/microbench.py --table               # compare every saved micro-*.json
+    python benchmarks/microbench.py --table results/micro-abc1234.json results/micro-def5678.json
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+from seed import seed
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Sizes per group, (full, --quick)
+SCORE_BATCHES = ([10, 100, 1000], [100])
+CHARGE_PROJECTS = ([10, 100, 1000], [10, 100])
+SCHEDULER_PROJECTS = ([1000, 10000, 100000], [1000, 10000])
+DASHBOARD_TEAMS = ([(10, 10), (50, 20), (200, 50)], [(10, 10), (50, 20)])  # chefs x resources
+
+# =========================
+# TIMING
+# =========================
+def measure(fn, setup=None, rounds=5, number=None, min_time=0.05):
+    """
+    Time fn(state) per call
+
+    Args:
+        fn: callable(state), the code under test
+        setup: callable() -> state, run before every round and not timed
+               (use it to restore a database that fn mutates)
+        number: calls per round; None calibrates it so a round lasts
+                at least min_time (only when fn does not mutate state)
+
+    Returns:
+        dict: per-call seconds (min, max, mean, median, stddev), rounds, number
+    """
+    if number is None:
+        number = 1
+        state = setup() if setup else None
+        while True:
+            t0 = time.perf_counter()
+            for _ in range(number):
+                fn(state)
+            if time.perf_counter() - t0 >= min_time or number >= 1 << 20:
+                break
+            number *= 2
+
+    times = []
+    for _ in range(rounds):
+        state = setup() if setup else None
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn(state)
+        times.append((time.perf_counter() - t0) / number)
+
+    return {
+        "min": min(times),
+        "max": max(times),
+        "mean": statistics.fmean(times),
+        "median": statistics.median(times),
+        "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "rounds": rounds,
+        "number": number,
+    }
+
+def memory_copy(path):
+    """In-memory copy of a seeded database file"""
+    source = sqlite3.connect(path)
+    con = sqlite3.connect(":memory:")
+    source.backup(con)
+    source.close()
+    con.row_factory = sqlite3.Row
+    return con
+
+# =========================
+# BENCHMARKS
+# =========================
+def bench_score(app_main, sizes, args):
+    import score
+
+    resource = (5, 40.0, 35.0, 50.0, 70.0)
+    yield "score.single", measure(lambda _: score.ressource_score(*resource), rounds=args.rounds,
+                                  min_time=args.min_time)
+    for n in sizes:
+        matrix = [[i % 21, 20 + i % 20, 10 + i % 50, i % 100, i % 100] for i in range(n)]
+        yield f"score.batch[n={n}]", measure(lambda _: score.ressource_scores(matrix),
+                                             rounds=args.rounds, min_time=args.min_time)
+        # Same n resources scored one call at a time
+        yield f"score.single_loop[n={n}]", measure(
+            lambda _: [score.ressource_score(r[0], r[2], r[1], r[3], r[4]) for r in matrix],
+            rounds=args.rounds, number=1)
+
+def bench_charge(app_main, sizes, args):
+    for n in sizes:
+        path = os.path.join(args.work, f"charge_{n}.db")
+        created = seed(path, chefs=1, resources_per_chef=5, projects=n, today=args.today)
+        chef_id = created["chefs"][created["companies"][0]][0]
+        cur = memory_copy(path).cursor()
+
+        yield f"calculate_chef_charge[projects={n}]", measure(
+            lambda _: app_main.calculate_chef_charge(cur, chef_id, verify=False),
+            rounds=args.rounds, min_time=args.min_time)
+        yield f"calculate_chef_charge.verify[projects={n}]", measure(
+            lambda _: app_main.calculate_chef_charge(cur, chef_id, verify=True),
+            rounds=args.rounds, min_time=args.min_time)
+
+def bench_scheduler(app_main, sizes, args):
+    import jobs
+
+    for n in sizes:
+        path = os.path.join(args.work, f"scheduler_{n}.db")
+        seed(path, chefs=max(n // 50, 1), resources_per_chef=5, projects=n, today=args.today)
+
+        def first_tick():
+            return memory_copy(path)
+
+        def idle_tick():
+            con = memory_copy(path)
+            jobs.run_status_and_charge_update(con.cursor(), args.today)
+            con.commit()
+            return con
+
+        def tick(con):
+            jobs.run_status_and_charge_update(con.cursor(), args.today)
+            con.commit()
+
+        # Seeded statuses are stale, so the first tick has transitions to apply
+        yield f"update_projects_and_charge[projects={n}]", measure(
+            tick, setup=first_tick, rounds=args.rounds, number=1)
+        yield f"update_projects_and_charge.idle[projects={n}]", measure(
+            tick, setup=idle_tick, rounds=args.rounds, number=1)
+
+def bench_dashboard(app_main, sizes, args):
+    for chefs, resources in sizes:
+        path = os.path.join(args.work, f"dashboard_{chefs}x{resources}.db")
+        created = seed(path, chefs=chefs, resources_per_chef=resources, projects=10, today=args.today)
+        company_id = created["companies"][0]
+        cur = memory_copy(path).cursor()
+        rows = cur.execute(app_main.DASHBOARD_RH_SQL, (company_id,)).fetchall()
+        label = f"rows={len(rows)}"
+
+        yield f"dashboard.group[{label}]", measure(
+            lambda _: app_main.group_dashboard_rows(rows),
+            rounds=args.rounds, min_time=args.min_time)
+
+        def stream(_):
+            cur.execute(app_main.DASHBOARD_RH_SQL, (company_id,))
+            for _ in app_main.stream_dashboard_rows(cur):
+                pass
+
+        with app_main.app.app_context():
+            # Includes the query: the stream reads the cursor itself
+            yield f"dashboard.stream[{label}]", measure(
+                stream, rounds=args.rounds, min_time=args.min_time)
+
+def bench_images(app_main, sizes, args):
+    from PIL import Image
+    from werkzeug.datastructures import FileStorage
+
+    def png(side, shade):
+        buffer = io.BytesIO()
+        Image.new("RGB", (side, side), (shade % 256, (shade // 256) % 256, 128)).save(buffer, "PNG")
+        return buffer.getvalue()
+
+    for side in sizes:
+        duplicate = png(side, 0)
+        app_main.save_profile_img(FileStorage(io.BytesIO(duplicate), filename="me.png"))
+        yield f"save_profile_img.duplicate[{side}px]", measure(
+            lambda _: app_main.save_profile_img(FileStorage(io.BytesIO(duplicate), filename="me.png")),
+            rounds=args.rounds, min_time=args.min_time)
+
+        counter = iter(range(1, 1 << 30))
+
+        def new_upload():
+            # Encoded outside the timed call: every round stores a new file
+            return png(side, next(counter))
+
+        yield f"save_profile_img.new[{side}px]", measure(
+            lambda data: app_main.save_profile_img(FileStorage(io.BytesIO(data), filename="me.png")),
+            setup=new_upload, rounds=args.rounds, number=1)
+
+    # Let the queued thumbnails finish before the process moves on
+    app_main.image_store._executor.shutdown(wait=True)
+
+GROUPS = {
+    "score": (bench_score, SCORE_BATCHES),
+    "charge": (bench_charge, CHARGE_PROJECTS),
+    "scheduler": (bench_scheduler, SCHEDULER_PROJECTS),
+    "dashboard": (bench_dashboard, DASHBOARD_TEAMS),
+    "images": (bench_images, ([64, 512], [64])),
+}
+
+# =========================
+# RESULTS
+# =========================
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "."], cwd=APP_DIR,
+                               capture_output=True, text=True, timeout=30).stdout.strip()
+    except Exception:
+        return "unknown"
+    return f"{commit}-dirty" if commit and dirty else (commit or "unknown")
+
+def load_results(paths):
+    results = []
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        data["path"] = path
+        results.append(data)
+    return sorted(results, key=lambda r: r["meta"]["time"])
+
+def format_time(seconds):
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+def print_table(results):
+    """
+    Median per call of every benchmark, one column per result (oldest
+    first); the last column is the change of the newest vs the oldest
+    """
+    names = []
+    for result in results:
+        for name in result["benchmarks"]:
+            if name not in names:
+                names.append(name)
+    columns = [r["meta"]["commit"] for r in results]
+    width = max([len(n) for n in names] + [10]) + 2
+    header = f"{'benchmark (median/call)':<{width}}" + "".join(f"{c:>16}" for c in columns)
+    if len(results) > 1:
+        header += f"{'change':>10}"
+    print(header)
+    for name in names:
+        medians = [r["benchmarks"].get(name, {}).get("median") for r in results]
+        line = f"{name:<{width}}" + "".join(f"{format_time(m):>16}" for m in medians)
+        if len(results) > 1:
+            first, last = medians[0], medians[-1]
+            line += f"{(last - first) / first:>+10.0%}" if first and last else f"{'-':>10}"
+        print(line)
+
+# =========================
+# MAIN
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", help=f"comma-separated groups: {','.join(GROUPS)}")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="minimum seconds per round when calibrating")
+    parser.add_argument("--output", help="result file (default benchmarks/results/micro-<commit>.json)")
+    parser.add_argument("--baseline", help="result to compare with (default: newest other result)")
+    parser.add_argument("--table", nargs="*", metavar="JSON",
+                        help="only print the comparison of saved results (default: all of them)")
+    args = parser.parse_args()
+
+    if args.table is not None:
+        paths = args.table or glob.glob(os.path.join(RESULTS_DIR, "micro-*.json"))
+        if not paths:
+            parser.error(f"No results in {RESULTS_DIR}")
+        print_table(load_results(paths))
+        return
+
+    groups = args.only.split(",") if args.only else list(GROUPS)
+    unknown = [g for g in groups if g not in GROUPS]
+    if unknown:
+        parser.error(f"Unknown group(s): {', '.join(unknown)}")
+
+    args.work = tempfile.mkdtemp(prefix="microbench_")
+    args.today = date.today()
+    os.environ.update(
+        DB_NAME=os.path.join(args.work, "app.db"),
+        folder=os.path.join(args.work, "images"),
+        SECRET=os.getenv("SECRET", "bench-secret-" + "x" * 32),
+        MODEL_DIR=os.getenv("MODEL_DIR", APP_DIR),
+        MODEL_WARMUP="sync",
+        RUN_SCHEDULER="0",
+    )
+    try:
+        import main as app_main
+
+        benchmarks = {}
+        for group in groups:
+            fn, (full, quick) = GROUPS[group]
+            for name, stats in fn(app_main, quick if args.quick else full, args):
+                benchmarks[name] = stats
+                print(f"{name:<48} median {format_time(stats['median']):>10}  "
+                      f"min {format_time(stats['min']):>10}  "
+                      f"stddev {format_time(stats['stddev']):>10}  "
+                      f"({stats['rounds']}x{stats['number']})")
+    finally:
+        shutil.rmtree(args.work, ignore_errors=True)
+
+    commit = git_commit()
+    result = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "groups": groups,
+            "quick": args.quick,
+            "rounds": args.rounds,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "benchmarks": benchmarks,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"micro-{commit}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults saved to {output}\n")
+
+    baseline = args.baseline
+    if not baseline:
+        others = [p for p in glob.glob(os.path.join(RESULTS_DIR, "micro-*.json"))
+                  if os.path.abspath(p) != os.path.abspath(output)]
+        baseline = max(others, key=os.path.getmtime) if others else None
+    print_table(load_results([baseline, output]) if baseline else load_results([output]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Synthetic data for the benchmarks
+
+Fills a fresh SQLite database (created with BD.create_db) with companies,
+chefs, resources and projects, then rebuilds the maintained aggregates.
+Passwords are all the same bcrypt hash of SEED_PASSWORD (hashed once, at
+the cost given to seed()), so seeding stays fast while /login still works.
+seed_images() writes profile images the way uploads store them.
+"""
+import hashlib
+import io
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import BD
+import charge
+import company_stats
+
+SEED_PASSWORD = "bench-password"
+
+def _password_hash(rounds):
+    import bcrypt
+    return bcrypt.hashpw(SEED_PASSWORD.encode(), bcrypt.gensalt(rounds))
+
+def seed(db_path, companies=1, chefs=20, resources_per_chef=5, projects=1000,
+         today=None, random_seed=42, rounds=4):
+    """
+    Create and fill a benchmark database
+
+    Chefs, resources and projects are per company. Project statuses are
+    drawn at random (deliberately stale with respect to their dates) so
+    the scheduler has transitions to apply. `rounds` is the bcrypt cost of
+    the password hash; use the server's BCRYPT_ROUNDS when /login is
+    measured, otherwise logins are cheaper than in production (and get
+    rehashed).
+
+    Returns:
+        dict: ids created, {"companies": [...], "chefs": {company_id: [...]},
+              "rh_emails": [...]}
+    """
+    today = today or date.today()
+    BD.create_db(db_path)
+    con = sqlite3.connect(db_path)
+    con.row_factory = sqlite3.Row
+    cur = con.cursor()
+    rnd = random.Random(random_seed)
+    password = _password_hash(rounds)
+
+    created = {"companies": [], "chefs": {}, "rh_emails": []}
+
+    for c in range(companies):
+        cur.execute("INSERT INTO companies (name) VALUES (?)", (f"bench-{c}",))
+        company_id = cur.lastrowid
+        created["companies"].append(company_id)
+
+        rh_email = f"rh{c}@bench"
+        created["rh_emails"].append(rh_email)
+        users = [("rh", str(c), rh_email, password, "RH", company_id)]
+        users += [(f"chef{i}", str(c), f"chef{i}.{c}@bench", password, "CHEF", company_id)
+                  for i in range(chefs)]
+        users += [(f"res{i}", str(c), f"res{i}.{c}@bench", password, "RESSOURCE", company_id)
+                  for i in range(chefs * resources_per_chef)]
+        cur.executemany("""
+            INSERT INTO users (first_name, last_name, email, password, role, company_id)
+            VALUES (?,?,?,?,?,?)
+        """, users)
+
+        chef_ids = [r[0] for r in cur.execute(
+            "SELECT id FROM users WHERE role='CHEF' AND company_id=? ORDER BY id", (company_id,))]
+        res_ids = [r[0] for r in cur.execute(
+            "SELECT id FROM users WHERE role='RESSOURCE' AND company_id=? ORDER BY id", (company_id,))]
+        created["chefs"][company_id] = chef_ids
+
+        cur.executemany("""
+            INSERT INTO chef_profiles (chef_id, charge_affectee, score, disponibilite_hebdo)
+            VALUES (?, 0, 50, 40)
+        """, [(chef_id,) for chef_id in chef_ids])
+        cur.executemany("""
+            INSERT INTO ressource_profiles
+                (ressource_id, chef_id, niveau_experience, disponibilite_hebdo,
+                 cout_horaire, charge_affectee, competence_moyenne, score)
+            VALUES (?, ?, ?, 40, ?, ?, ?, ?)
+        """, [(res_id, chef_ids[i % len(chef_ids)], rnd.randint(0, 20), rnd.randint(5, 80),
+               rnd.randint(0, 100), rnd.randint(20, 100), rnd.randint(0, 100))
+              for i, res_id in enumerate(res_ids)] if chef_ids else [])
+
+        rows = []
+        for i in range(projects if chef_ids else 0):
+            start = today + timedelta(days=rnd.randint(-400, 200))
+            end = start + timedelta(days=rnd.randint(1, 300))
+            status = rnd.choice(["planned", "planned", "active", "finished"])
+            rows.append((f"p{i}", rnd.randint(10, 500), start.isoformat(), end.isoformat(),
+                         (end - start).days, status, company_id, rnd.choice(chef_ids)))
+        cur.executemany("""
+            INSERT INTO projects
+                (name, estimated_hours, start_date, end_date, duration_days, status,
+                 company_id, chef_id)
+            VALUES (?,?,?,?,?,?,?,?)
+        """, rows)
+
+    charge.rebuild_all(cur)
+    company_stats.rebuild_all(cur)
+    con.commit()
+    con.close()
+    return created
+
+def seed_images(folder, small=4, large=2, random_seed=42):
+    """
+    Write content-addressed PNGs (<sha256>.png, as ImageStore.save names them)
+
+    Random pixels do not compress, so the sizes hold: small images (96px,
+    ~28KB) fit images.SMALL_FILE_LIMIT and are served from memory, large
+    ones (512px, ~770KB) go through send_file.
+
+    Returns:
+        dict: {"small": [filename, ...], "large": [filename, ...]}
+    """
+    from PIL import Image
+
+    os.makedirs(folder, exist_ok=True)
+    rnd = random.Random(random_seed)
+    created = {"small": [], "large": []}
+    for kind, count, side in (("small", small, 96), ("large", large, 512)):
+        for _ in range(count):
+            img = Image.frombytes("RGB", (side, side), rnd.randbytes(side * side * 3))
+            buffer = io.BytesIO()
+            img.save(buffer, "PNG")
+            data = buffer.getvalue()
+            filename = f"{hashlib.sha256(data).hexdigest()}.png"
+            with open(os.path.join(folder, filename), "wb") as f:
+                f.write(data)
+            created[kind].append(filename)
+    return created
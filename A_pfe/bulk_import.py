@@ -0,0 +1,132 @@
+import codecs
+import csv
+import json
+import math
+import os
+
+MAX_BULK_ROWS = int(os.getenv("MAX_BULK_ROWS", 10000))
+
+# Input column -> (type, default, min, max); same names and defaults as the
+# /ressource form, bounds from the ressource_profiles CHECK constraints
+NUMERIC_FIELDS = {
+    "experience": (int, 5, 0, 20),
+    "cost_hour": (float, 5, 0, None),
+    "disponibilite_hebdo": (int, 40, 0, 168),
+    "competence_moyenne": (float, 50, 0, 100),
+}
+REQUIRED_FIELDS = ("first_name", "last_name", "email", "password")
+
+class BulkFormatError(Exception):
+    """The upload as a whole cannot be read (bad format, too many rows)"""
+
+def detect_format(filename, content_type, explicit=None):
+    """
+    Upload format from an explicit ?format=, the file extension or the
+    content type
+
+    Returns:
+        str: "csv" or "jsonl"
+    """
+    if explicit:
+        fmt = explicit.lower()
+    elif filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        fmt = "jsonl"
+    elif filename and filename.lower().endswith(".csv"):
+        fmt = "csv"
+    elif content_type and ("ndjson" in content_type or "jsonl" in content_type):
+        fmt = "jsonl"
+    else:
+        fmt = "csv"
+    if fmt not in ("csv", "jsonl"):
+        raise BulkFormatError("format must be csv or jsonl")
+    return fmt
+
+def _lines(stream):
+    """Decode a binary stream line by line (never reads it whole)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="strict")
+    pending = ""
+    for chunk in iter(lambda: stream.read(64 * 1024), b""):
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        yield from (line + "\n" for line in lines)
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+def iter_rows(stream, fmt):
+    """
+    Stream raw rows from a CSV or JSONL upload
+
+    Yields:
+        tuple: (row_number, dict or None, error or None); row numbers
+               start at 1 for the first data row
+    """
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(_lines(stream))
+            for number, row in enumerate(reader, start=1):
+                if None in row:
+                    yield number, None, "Too many columns"
+                else:
+                    yield number, row, None
+        else:
+            number = 0
+            for line in _lines(stream):
+                if not line.strip():
+                    continue
+                number += 1
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield number, None, "Invalid JSON"
+                    continue
+                if isinstance(row, dict):
+                    yield number, row, None
+                else:
+                    yield number, None, "Each line must be a JSON object"
+    except UnicodeDecodeError:
+        raise BulkFormatError("Upload must be UTF-8")
+    except csv.Error as e:
+        raise BulkFormatError(f"Invalid CSV: {e}")
+
+def parse_row(row):
+    """
+    Validate one raw row and convert its values
+
+    Returns:
+        tuple: (values dict, error message or None)
+    """
+    values = {}
+    for field in REQUIRED_FIELDS:
+        value = row.get(field)
+        if value is None or not str(value).strip():
+            return None, f"Missing {field}"
+        # Passwords are kept verbatim, names/emails are trimmed
+        values[field] = str(value) if field == "password" else str(value).strip()
+
+    for field, (cast, default, low, high) in NUMERIC_FIELDS.items():
+        value = row.get(field)
+        if value is None or value == "":
+            value = default
+        try:
+            number = float(value)
+            # nan/inf would only fail later, on the CHECK constraint of the
+            # whole batch
+            if not math.isfinite(number):
+                return None, f"Invalid {field}"
+            value = cast(number) if cast is int else cast(value)
+        except (TypeError, ValueError, OverflowError):
+            return None, f"Invalid {field}"
+        if value < low or (high is not None and value > high):
+            return None, f"{field} out of range"
+        values[field] = value
+
+    chef_id = row.get("chef_id")
+    if chef_id not in (None, ""):
+        try:
+            values["chef_id"] = int(chef_id)
+        except (TypeError, ValueError):
+            return None, "Invalid chef_id"
+    else:
+        values["chef_id"] = None
+    return values, None
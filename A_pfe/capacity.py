@@ -0,0 +1,252 @@
+import random
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+DATE_FORMAT = "%Y-%m-%d"
+
+# Days are date ordinals (date.toordinal()); 2^20 days covers every date
+# up to the year 2870, so a tree is at most 20 levels deep.
+DAY_BITS = 20
+DAY_LIMIT = 1 << DAY_BITS
+
+def day_range(start_date, end_date):
+    """
+    Inclusive (first_day, last_day) ordinals of a project, or None when the
+    dates are malformed or reversed
+    """
+    try:
+        first = datetime.strptime(start_date, DATE_FORMAT).toordinal()
+        last = datetime.strptime(end_date, DATE_FORMAT).toordinal()
+    except (TypeError, ValueError):
+        return None
+    if last < first or last >= DAY_LIMIT:
+        return None
+    return first, last
+
+def weekly_rate(hours, first, last):
+    """Hours per week of a project whose hours are spread evenly over its days"""
+    return hours * 7.0 / (last - first + 1)
+
+def peak_load(intervals):
+    """
+    Highest weekly load over a set of (first_day, last_day, rate) intervals
+
+    Plain sweep line, O(n log n); used for bulk rebuilds and to verify the
+    tree.
+    """
+    events = []
+    for first, last, rate in intervals:
+        events.append((first, rate))
+        events.append((last + 1, -rate))
+    events.sort()
+
+    peak = load = 0.0
+    for i, (day, delta) in enumerate(events):
+        load += delta
+        # Only compare once every event of the same day is applied
+        if i + 1 == len(events) or events[i + 1][0] != day:
+            peak = max(peak, load)
+    return round(peak, 4)
+
+# =========================
+# SEGMENT TREE
+# =========================
+class LoadTree:
+    """
+    Sparse segment tree of weekly load per day
+
+    Supports adding a rate over a day range and reading the maximum over a
+    day range, both in O(log DAY_LIMIT). Nodes are created on demand, so
+    memory is O(projects × log DAY_LIMIT).
+
+    Range additions are not pushed down: each node stores the amount added
+    to its whole range (`_add`) and the max of its subtree including it
+    (`_max`).
+    """
+
+    def __init__(self):
+        # Node 0 is the shared "empty" child
+        self._max = [0.0, 0.0]
+        self._add = [0.0, 0.0]
+        self._left = [0, 0]
+        self._right = [0, 0]
+        self.intervals = {}  # project_id -> (first, last, rate)
+
+    def _new_node(self):
+        self._max.append(0.0)
+        self._add.append(0.0)
+        self._left.append(0)
+        self._right.append(0)
+        return len(self._max) - 1
+
+    def _update(self, node, lo, hi, first, last, rate):
+        if first <= lo and hi <= last:
+            self._add[node] += rate
+            self._max[node] += rate
+            return
+        mid = (lo + hi) // 2
+        if first <= mid:
+            if not self._left[node]:
+                self._left[node] = self._new_node()
+            self._update(self._left[node], lo, mid, first, last, rate)
+        if last > mid:
+            if not self._right[node]:
+                self._right[node] = self._new_node()
+            self._update(self._right[node], mid + 1, hi, first, last, rate)
+        self._max[node] = self._add[node] + max(self._max[self._left[node]],
+                                                self._max[self._right[node]])
+
+    def _query(self, node, lo, hi, first, last):
+        if not node:
+            return 0.0
+        if first <= lo and hi <= last:
+            return self._max[node]
+        mid = (lo + hi) // 2
+        best = None
+        if first <= mid:
+            best = self._query(self._left[node], lo, mid, first, last)
+        if last > mid:
+            right = self._query(self._right[node], mid + 1, hi, first, last)
+            best = right if best is None else max(best, right)
+        return self._add[node] + best
+
+    def add(self, project_id, hours, start_date, end_date):
+        """Add a project's load (no-op if already present or dates invalid)"""
+        days = day_range(start_date, end_date)
+        if project_id in self.intervals or days is None:
+            return
+        first, last = days
+        rate = weekly_rate(hours, first, last)
+        self.intervals[project_id] = (first, last, rate)
+        self._update(1, 0, DAY_LIMIT - 1, first, last, rate)
+
+    def remove(self, project_id):
+        """Remove a project's load (no-op if absent)"""
+        interval = self.intervals.pop(project_id, None)
+        if interval:
+            first, last, rate = interval
+            self._update(1, 0, DAY_LIMIT - 1, first, last, -rate)
+
+    def peak(self):
+        """Highest weekly load over the whole timeline"""
+        return round(max(self._max[1], 0.0), 4)
+
+    def peak_in(self, first, last):
+        """Highest weekly load between two day ordinals (inclusive)"""
+        return round(max(self._query(1, 0, DAY_LIMIT - 1, first, last), 0.0), 4)
+
+    def peak_with(self, hours, start_date, end_date, without=None):
+        """
+        Peak weekly load if a project were added (and `without` removed)
+
+        The tree is left unchanged.
+
+        Returns:
+            tuple: (peak over the whole timeline, load already booked in the
+                    project's window, project's weekly rate), or None when
+                    the dates are invalid
+        """
+        days = day_range(start_date, end_date)
+        if days is None:
+            return None
+        first, last = days
+        rate = weekly_rate(hours, first, last)
+
+        removed = self.intervals.pop(without, None) if without is not None else None
+        if removed:
+            self._update(1, 0, DAY_LIMIT - 1, removed[0], removed[1], -removed[2])
+        try:
+            booked = self.peak_in(first, last)
+            peak = max(self.peak(), round(booked + rate, 4))
+        finally:
+            if removed:
+                self._update(1, 0, DAY_LIMIT - 1, removed[0], removed[1], removed[2])
+                self.intervals[without] = removed
+        return peak, booked, rate
+
+# =========================
+# PER-CHEF CACHE
+# =========================
+class LoadIndex:
+    """
+    In-process LRU of per-chef LoadTrees
+
+    Every change to a chef's counted projects writes a new random
+    `load_version` in chef_charge_stats (same transaction). A cached tree
+    is used only while its version matches the row, so trees stay correct
+    across processes and rolled back transactions; otherwise it is rebuilt
+    from the chef's projects.
+
+    Each chef has its own lock, held while its tree is read or changed
+    (SQL included), so a slow rebuild only delays that chef. `lock` only
+    guards the dictionaries and is never held during SQL.
+    """
+
+    def __init__(self, max_chefs=1000):
+        self.max_chefs = max_chefs
+        self._trees = OrderedDict()  # chef_id -> (version, LoadTree)
+        self._chef_locks = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.rebuilds = 0
+
+    @staticmethod
+    def new_version():
+        return random.getrandbits(62)
+
+    def chef_lock(self, chef_id):
+        """Lock to hold while using the chef's tree"""
+        with self.lock:
+            lock = self._chef_locks.get(chef_id)
+            if lock is None:
+                lock = self._chef_locks[chef_id] = threading.Lock()
+            return lock
+
+    def load(self, cur, chef_id, version):
+        """
+        Tree matching the chef's current projects
+
+        Must be called with chef_lock(chef_id) held; the caller owns the
+        tree until it releases that lock.
+        """
+        with self.lock:
+            cached = self._trees.get(chef_id)
+            if cached and cached[0] == version:
+                self._trees.move_to_end(chef_id)
+                self.hits += 1
+                return cached[1]
+
+        cur.execute("""
+            SELECT id, estimated_hours, start_date, end_date
+            FROM projects
+            WHERE chef_id=? AND status IN ('planned','active')
+        """, (chef_id,))
+        tree = LoadTree()
+        for p in cur.fetchall():
+            tree.add(p["id"], p["estimated_hours"], p["start_date"], p["end_date"])
+        self.store(chef_id, version, tree, rebuilt=True)
+        return tree
+
+    def store(self, chef_id, version, tree, rebuilt=False):
+        with self.lock:
+            if rebuilt:
+                self.rebuilds += 1
+            self._trees[chef_id] = (version, tree)
+            self._trees.move_to_end(chef_id)
+            while len(self._trees) > self.max_chefs:
+                self._trees.popitem(last=False)
+
+    def forget(self, chef_ids=None):
+        """Drop cached trees (all of them when chef_ids is None)"""
+        with self.lock:
+            if chef_ids is None:
+                self._trees.clear()
+            else:
+                for chef_id in chef_ids:
+                    self._trees.pop(chef_id, None)
+
+    def stats(self):
+        with self.lock:
+            return {"chefs": len(self._trees), "hits": self.hits,
+                    "rebuilds": self.rebuilds}
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+
+# Change notifications pushed to clients through GET /events. Mutation
+# routes and the scheduler append (company_id, kind, entity_id) rows to
+# change_events inside their own transaction, so an event exists exactly
+# when its change is committed, whichever worker made it. Clients only
+# learn *what* changed and refetch it through the normal (permission
+# checked) endpoints.
+EVENT_KINDS = ("project", "charge", "chef", "ressource", "task", "user", "notification")
+
+POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", 0.5))
+MAX_WAIT = float(os.getenv("EVENTS_MAX_WAIT", 25))
+# Long-polls parked at the same time (each holds a server thread); extra
+# clients get an immediate answer and a Retry-After
+MAX_WAITERS = int(os.getenv("EVENTS_MAX_WAITERS", 2))
+RETENTION = int(os.getenv("EVENTS_RETENTION", 3600))
+MAX_EVENTS_PER_POLL = 200
+
+# =========================
+# JOURNAL
+# =========================
+def publish(cur, company_id, kind, entity_id=None, user_id=None):
+    """Record one change in the caller's transaction"""
+    publish_many(cur, [(company_id, kind, entity_id, user_id)])
+
+def publish_many(cur, events):
+    """
+    Record changes in the caller's transaction
+
+    Args:
+        events (iterable): (company_id, kind, entity_id, user_id) tuples;
+                           user_id restricts the event to one user
+    """
+    now = time.time()
+    rows = []
+    for company_id, kind, entity_id, user_id in dict.fromkeys(events):
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind: {kind}")
+        rows.append((company_id, kind, entity_id, user_id, now))
+    cur.executemany("""
+        INSERT INTO change_events (company_id, kind, entity_id, user_id, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+
+def publish_for_users(cur, kind, user_ids):
+    """Record a per-user event, looking up each user's company"""
+    now = time.time()
+    cur.executemany("""
+        INSERT INTO change_events (company_id, kind, user_id, created_at)
+        SELECT company_id, ?, id, ? FROM users WHERE id=?
+    """, [(kind, now, user_id) for user_id in sorted(set(user_ids))])
+
+def head(cur):
+    """
+    Bounds of the journal
+
+    Returns:
+        tuple: (last event id ever written, oldest id still stored or None)
+    """
+    cur.execute("SELECT seq FROM sqlite_sequence WHERE name='change_events'")
+    row = cur.fetchone()
+    cur.execute("SELECT MIN(id) FROM change_events")
+    return (row[0] if row else 0), cur.fetchone()[0]
+
+def fetch(cur, company_id, user_id, since, limit=MAX_EVENTS_PER_POLL):
+    """
+    Changes of a company after event `since`, as seen by `user_id`
+
+    Event ids are AUTOINCREMENT and writers are serialized, so ids are
+    committed in order and a gap below the oldest stored id can only come
+    from pruning: the client missed events and must refetch everything.
+
+    Returns:
+        dict: events, cursor for the next call, reset flag
+    """
+    last_id, oldest = head(cur)
+    if since > last_id or since < (oldest if oldest is not None else last_id + 1) - 1:
+        return {"events": [], "cursor": last_id, "reset": True}
+
+    cur.execute("""
+        SELECT id, kind, entity_id, created_at
+        FROM change_events
+        WHERE company_id=? AND id > ? AND id <= ?
+          AND (user_id IS NULL OR user_id=?)
+        ORDER BY id
+        LIMIT ?
+    """, (company_id, since, last_id, user_id, limit))
+    rows = [dict(r) for r in cur.fetchall()]
+    cursor = rows[-1]["id"] if len(rows) == limit else last_id
+    return {"events": rows, "cursor": cursor, "reset": False}
+
+def prune(cur, now=None):
+    """Drop events older than RETENTION seconds; returns rows deleted"""
+    cutoff = (now if now is not None else time.time()) - RETENTION
+    cur.execute("DELETE FROM change_events WHERE created_at < ?", (cutoff,))
+    return cur.rowcount
+
+# =========================
+# IN-PROCESS BROKER
+# =========================
+class ChangeBroker:
+    """
+    Wakes long-polling requests of this process when their company has
+    new events
+
+    While at least one request waits, a daemon thread tails change_events
+    every POLL_INTERVAL seconds (one range scan of the primary key) and
+    records the newest event id per company, catching up on whatever was
+    written while nobody waited (the journal is bounded by RETENTION).
+    Waiting requests hold no database connection.
+    """
+
+    def __init__(self, pool, interval=POLL_INTERVAL, max_waiters=MAX_WAITERS):
+        self.pool = pool
+        self.interval = interval
+        self.max_waiters = max_waiters
+        self._cond = threading.Condition()
+        self._latest = {}
+        self._last_id = 0
+        self._waiters = 0
+        self._pid = None
+        self._thread = None
+        self._stats = {"polls": 0, "wakeups": 0, "rejected": 0}
+
+    def _ensure_started(self):
+        # Called with self._cond held
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._latest = {}
+        self._last_id = 0
+        self._thread = threading.Thread(target=self._run, name="change-broker", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._waiters == 0:
+                    self._cond.wait()
+            time.sleep(self.interval)
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"❌ Change broker error: {e}")
+
+    def _poll(self):
+        con = self.pool.acquire()
+        try:
+            cur = con.cursor()
+            cur.execute("""
+                SELECT company_id, MAX(id) AS last_id
+                FROM change_events
+                WHERE id > ?
+                GROUP BY company_id
+            """, (self._last_id,))
+            rows = cur.fetchall()
+        finally:
+            con.close()
+
+        with self._cond:
+            self._stats["polls"] += 1
+            for row in rows:
+                self._latest[row["company_id"]] = row["last_id"]
+                self._last_id = max(self._last_id, row["last_id"])
+            if rows:
+                self._stats["wakeups"] += 1
+                self._cond.notify_all()
+
+    def enter(self):
+        """Take a waiting slot; False when all are busy"""
+        with self._cond:
+            if self._waiters >= self.max_waiters:
+                self._stats["rejected"] += 1
+                return False
+            self._ensure_started()
+            self._waiters += 1
+            self._cond.notify_all()
+            return True
+
+    def leave(self):
+        with self._cond:
+            self._waiters -= 1
+
+    def wait(self, company_id, since, timeout):
+        """
+        Block (inside enter/leave) until the company has an event newer
+        than `since` or `timeout` seconds pass
+
+        Returns:
+            bool: True if there may be new events
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._latest.get(company_id, 0) > since, timeout)
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data.update(waiting=self._waiters, max_waiters=self.max_waiters)
+            return data
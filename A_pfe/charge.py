@@ -0,0 +1,288 @@
+import json
+from capacity import LoadIndex, day_range, weekly_rate, peak_load
+
+# Only these project statuses count towards a chef's charge
+COUNTED_STATUSES = ("planned", "active")
+
+# =========================
+# CHARGE FORMULA
+# =========================
+# Each counted project spreads its estimated hours evenly over its days;
+# a chef's load on a day is the sum of the weekly rates of the projects
+# running that day (see capacity.py).
+def compute_charge(weekly_capacity, peak_load):
+    """
+    Charge percentage from a chef's aggregate
+
+    Charge = peak weekly load over the chef's timeline / weekly team
+    capacity, capped at 100%.
+
+    Returns:
+        float: Charge percentage (0-100)
+    """
+    if not weekly_capacity or not peak_load:
+        return 0
+    return round(min(peak_load * 100.0 / weekly_capacity, 100), 2)
+
+# Same formula in SQL, over a chef_charge_stats row aliased as `s`
+CHARGE_SQL = """
+    CASE
+        WHEN s.weekly_capacity > 0 AND s.peak_load > 0
+        THEN ROUND(MIN(s.peak_load * 100.0 / s.weekly_capacity, 100), 2)
+        ELSE 0
+    END
+"""
+
+# Per-chef interval trees of project load, shared by every request thread
+load_index = LoadIndex()
+
+# =========================
+# AGGREGATE READS
+# =========================
+def get_stats(cur, chef_id):
+    """Return the chef_charge_stats row for a chef (or None)"""
+    cur.execute("""
+        SELECT weekly_capacity, resource_count, total_hours, project_count,
+               peak_load, load_version
+        FROM chef_charge_stats
+        WHERE chef_id=?
+    """, (chef_id,))
+    return cur.fetchone()
+
+def get_charge(cur, chef_id):
+    """O(1) charge read from the maintained aggregate"""
+    stats = get_stats(cur, chef_id)
+    if not stats:
+        return 0
+    return compute_charge(stats["weekly_capacity"], stats["peak_load"])
+
+def peak_with(cur, chef_id, hours, start_date, end_date, without=None):
+    """
+    Peak weekly load of a chef if a project were added, in O(log n)
+
+    Args:
+        cur: database cursor
+        chef_id: ID of the chef
+        hours, start_date, end_date: the project to add
+        without: ID of a project to leave out (the old version of a
+                 project being updated)
+
+    Returns:
+        tuple: (peak weekly load, load already booked in the project's
+                window, project's weekly rate), or None for invalid dates
+    """
+    with load_index.chef_lock(chef_id):
+        stats = get_stats(cur, chef_id)
+        version = stats["load_version"] if stats else None
+        tree = load_index.load(cur, chef_id, version)
+        return tree.peak_with(hours, start_date, end_date, without)
+
+# =========================
+# DELTA UPDATES
+# =========================
+def add_capacity(cur, chef_id, delta_hours, delta_resources=0):
+    """Apply a change of team weekly capacity (resource added/updated/removed)"""
+    cur.execute("""
+        INSERT INTO chef_charge_stats (chef_id, weekly_capacity, resource_count)
+        VALUES (?, ?, ?)
+        ON CONFLICT(chef_id) DO UPDATE SET
+            weekly_capacity = weekly_capacity + excluded.weekly_capacity,
+            resource_count = resource_count + excluded.resource_count
+    """, (chef_id, delta_hours, delta_resources))
+
+def _change_load(cur, chef_id, apply):
+    """
+    Apply a change to the chef's load tree and store the new peak
+
+    Tree changes are idempotent per project id, so it does not matter
+    whether the tree was rebuilt from projects that already include the
+    change.
+    """
+    with load_index.chef_lock(chef_id):
+        stats = get_stats(cur, chef_id)
+        if not stats:
+            return
+        tree = load_index.load(cur, chef_id, stats["load_version"])
+        apply(tree)
+        version = load_index.new_version()
+        cur.execute("""
+            UPDATE chef_charge_stats
+            SET peak_load=?, load_version=?
+            WHERE chef_id=?
+        """, (tree.peak(), version, chef_id))
+        load_index.store(chef_id, version, tree)
+
+def add_project(cur, chef_id, project_id, hours, start_date, end_date, status):
+    """Account for a project that now exists with the given values"""
+    if status not in COUNTED_STATUSES:
+        return
+    cur.execute("""
+        INSERT INTO chef_charge_stats (chef_id, total_hours, project_count)
+        VALUES (?, ?, 1)
+        ON CONFLICT(chef_id) DO UPDATE SET
+            total_hours = total_hours + excluded.total_hours,
+            project_count = project_count + 1
+    """, (chef_id, hours))
+    _change_load(cur, chef_id,
+                 lambda tree: tree.add(project_id, hours, start_date, end_date))
+
+def remove_project(cur, chef_id, project_id, hours, start_date, end_date, status):
+    """Account for a project that no longer counts (deleted, changed or finished)"""
+    if status not in COUNTED_STATUSES:
+        return
+    cur.execute("""
+        UPDATE chef_charge_stats
+        SET total_hours = total_hours - ?, project_count = project_count - 1
+        WHERE chef_id=?
+    """, (hours, chef_id))
+    _change_load(cur, chef_id, lambda tree: tree.remove(project_id))
+
+def _write_peaks(cur, chef_ids, where, args=()):
+    """
+    Recompute peak_load of chefs from their projects with a sweep line
+
+    Args:
+        chef_ids: chefs to update (those without projects get 0)
+        where: SQL condition selecting the projects of those chefs
+    """
+    intervals = {chef_id: [] for chef_id in chef_ids}
+    cur.execute(f"""
+        SELECT chef_id, estimated_hours, start_date, end_date
+        FROM projects
+        WHERE status IN ('planned','active') AND {where}
+    """, args)
+    for p in cur.fetchall():
+        days = day_range(p["start_date"], p["end_date"])
+        if days and p["chef_id"] in intervals:
+            intervals[p["chef_id"]].append((*days, weekly_rate(p["estimated_hours"], *days)))
+
+    cur.executemany("""
+        UPDATE chef_charge_stats
+        SET peak_load=?, load_version=?
+        WHERE chef_id=?
+    """, [(peak_load(items), load_index.new_version(), chef_id)
+          for chef_id, items in intervals.items()])
+    load_index.forget(chef_ids)
+
+def refresh_projects(cur, chef_ids):
+    """
+    Re-aggregate the project side of several chefs
+
+    Used by the scheduler after a batch of status transitions: one
+    statement for the totals, one query for the peaks.
+    """
+    chef_ids = list(chef_ids)
+    if not chef_ids:
+        return
+    cur.execute("""
+        UPDATE chef_charge_stats
+        SET (total_hours, project_count) = (
+            SELECT COALESCE(SUM(estimated_hours), 0), COUNT(*)
+            FROM projects
+            WHERE projects.chef_id = chef_charge_stats.chef_id
+              AND status IN ('planned','active')
+        )
+        WHERE chef_id IN (SELECT value FROM json_each(?))
+    """, (json.dumps(chef_ids),))
+    _write_peaks(cur, chef_ids, "chef_id IN (SELECT value FROM json_each(?))",
+                 (json.dumps(chef_ids),))
+
+def sync_chef_profiles(cur):
+    """
+    Copy the aggregate charge into chef_profiles.charge_affectee
+
+    One UPDATE driven by the aggregate table; only rows whose charge
+    actually changes are written.
+
+    Returns:
+        int: number of chef profiles updated
+    """
+    cur.execute(f"""
+        UPDATE chef_profiles
+        SET charge_affectee = c.charge
+        FROM (
+            SELECT cp.chef_id, COALESCE({CHARGE_SQL}, 0) AS charge
+            FROM chef_profiles cp
+            LEFT JOIN chef_charge_stats s ON s.chef_id = cp.chef_id
+        ) AS c
+        WHERE chef_profiles.chef_id = c.chef_id
+          AND chef_profiles.charge_affectee IS NOT c.charge
+    """)
+    return cur.rowcount
+
+def forget_chef(cur, chef_id):
+    """Drop the aggregate of a deleted chef"""
+    cur.execute("DELETE FROM chef_charge_stats WHERE chef_id=?", (chef_id,))
+    load_index.forget([chef_id])
+
+# =========================
+# FULL RECOMPUTE (VERIFICATION)
+# =========================
+def recompute_charge(cur, chef_id):
+    """
+    Calculate the charge from scratch, reading every resource and project
+
+    Slow path kept to verify the maintained aggregate.
+    """
+    cur.execute("""
+        SELECT disponibilite_hebdo
+        FROM ressource_profiles
+        WHERE chef_id=?
+    """, (chef_id,))
+    weekly_capacity = sum(r["disponibilite_hebdo"] for r in cur.fetchall())
+
+    cur.execute("""
+        SELECT estimated_hours, start_date, end_date
+        FROM projects
+        WHERE chef_id=? AND status IN ('planned','active')
+    """, (chef_id,))
+    intervals = []
+    for p in cur.fetchall():
+        days = day_range(p["start_date"], p["end_date"])
+        if days:
+            intervals.append((*days, weekly_rate(p["estimated_hours"], *days)))
+
+    return compute_charge(weekly_capacity, peak_load(intervals))
+
+def verify(cur, chef_id):
+    """
+    Compare the aggregate with a full recompute
+
+    Returns:
+        tuple: (ok, aggregate_charge, recomputed_charge)
+    """
+    fast = get_charge(cur, chef_id)
+    slow = recompute_charge(cur, chef_id)
+    return abs(fast - slow) < 0.01, fast, slow
+
+def rebuild_all(cur):
+    """Rebuild every chef's aggregate from the source tables"""
+    cur.execute("DELETE FROM chef_charge_stats")
+    cur.execute("""
+        INSERT INTO chef_charge_stats
+            (chef_id, weekly_capacity, resource_count, total_hours, project_count)
+        SELECT
+            u.id,
+            COALESCE(r.capacity, 0),
+            COALESCE(r.resources, 0),
+            COALESCE(p.hours, 0),
+            COALESCE(p.projects, 0)
+        FROM users u
+        LEFT JOIN (
+            SELECT chef_id, SUM(disponibilite_hebdo) AS capacity,
+                   COUNT(*) AS resources
+            FROM ressource_profiles
+            GROUP BY chef_id
+        ) r ON r.chef_id = u.id
+        LEFT JOIN (
+            SELECT chef_id, SUM(estimated_hours) AS hours, COUNT(*) AS projects
+            FROM projects
+            WHERE status IN ('planned','active')
+            GROUP BY chef_id
+        ) p ON p.chef_id = u.id
+        WHERE u.role = 'CHEF'
+    """)
+    cur.execute("SELECT chef_id FROM chef_charge_stats")
+    chef_ids = [r[0] for r in cur.fetchall()]
+    _write_peaks(cur, chef_ids, "1")
+    load_index.forget()
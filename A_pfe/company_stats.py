@@ -0,0 +1,100 @@
+# =========================
+# COMPANY STATISTICS
+# =========================
+# company_stats is maintained by the triggers declared in BD.create_db, so
+# every insert/delete/status or charge change (routes and scheduler alike)
+# keeps it current. This module reads it, recomputes it, and formats it.
+
+STATS_COLUMNS = "company_id, chefs, resources, planned, active, finished, chef_profiles, charge_sum"
+
+# One-pass recompute for a single company (:company_id)
+FRESH_SQL = """
+    WITH
+    u AS (
+        SELECT SUM(role = 'CHEF') AS chefs, SUM(role = 'RESSOURCE') AS resources
+        FROM users
+        WHERE company_id = :company_id
+    ),
+    p AS (
+        SELECT SUM(status = 'planned') AS planned,
+               SUM(status = 'active') AS active,
+               SUM(status = 'finished') AS finished
+        FROM projects
+        WHERE company_id = :company_id
+    ),
+    ch AS (
+        SELECT COUNT(*) AS chef_profiles, SUM(cp.charge_affectee) AS charge_sum
+        FROM chef_profiles cp
+        JOIN users x ON x.id = cp.chef_id
+        WHERE x.company_id = :company_id
+    )
+    SELECT
+        :company_id AS company_id,
+        COALESCE(u.chefs, 0) AS chefs,
+        COALESCE(u.resources, 0) AS resources,
+        COALESCE(p.planned, 0) AS planned,
+        COALESCE(p.active, 0) AS active,
+        COALESCE(p.finished, 0) AS finished,
+        ch.chef_profiles AS chef_profiles,
+        COALESCE(ch.charge_sum, 0) AS charge_sum
+    FROM u, p, ch
+"""
+
+def get(cur, company_id):
+    """Primary-key lookup of the materialized row (or None)"""
+    cur.execute(f"SELECT {STATS_COLUMNS} FROM company_stats WHERE company_id=?",
+                (company_id,))
+    return cur.fetchone()
+
+def compute(cur, company_id):
+    """Recompute a company's statistics from the source tables"""
+    cur.execute(FRESH_SQL, {"company_id": company_id})
+    return cur.fetchone()
+
+def refresh(cur, company_id):
+    """Recompute one company and store the result"""
+    row = compute(cur, company_id)
+    cur.execute(f"INSERT OR REPLACE INTO company_stats ({STATS_COLUMNS}) VALUES (?,?,?,?,?,?,?,?)",
+                tuple(row))
+    return row
+
+def rebuild_all(cur):
+    """Recompute every company in one grouped statement"""
+    cur.execute(f"""
+        INSERT OR REPLACE INTO company_stats ({STATS_COLUMNS})
+        SELECT
+            c.id,
+            COALESCE(u.chefs, 0), COALESCE(u.resources, 0),
+            COALESCE(p.planned, 0), COALESCE(p.active, 0), COALESCE(p.finished, 0),
+            COALESCE(ch.chef_profiles, 0), COALESCE(ch.charge_sum, 0)
+        FROM companies c
+        LEFT JOIN (
+            SELECT company_id, SUM(role = 'CHEF') AS chefs,
+                   SUM(role = 'RESSOURCE') AS resources
+            FROM users GROUP BY company_id
+        ) u ON u.company_id = c.id
+        LEFT JOIN (
+            SELECT company_id, SUM(status = 'planned') AS planned,
+                   SUM(status = 'active') AS active,
+                   SUM(status = 'finished') AS finished
+            FROM projects GROUP BY company_id
+        ) p ON p.company_id = c.id
+        LEFT JOIN (
+            SELECT x.company_id, COUNT(*) AS chef_profiles,
+                   SUM(cp.charge_affectee) AS charge_sum
+            FROM chef_profiles cp JOIN users x ON x.id = cp.chef_id
+            GROUP BY x.company_id
+        ) ch ON ch.company_id = c.id
+    """)
+
+def to_response(row):
+    """Shape a stats row like the /statistics JSON"""
+    projects = {status: row[status] for status in ("planned", "active", "finished")
+                if row[status]}
+    average = row["charge_sum"] / row["chef_profiles"] if row["chef_profiles"] else 0
+    return {
+        "chefs": row["chefs"],
+        "resources": row["resources"],
+        "projects": projects,
+        "average_charge": round(average, 2)
+    }
@@ -0,0 +1,32 @@
+import base64
+import json
+
+# Opaque keyset cursors of the paginated routes: the sort key of the last
+# row of a page, as a JSON list in URL-safe base64. Each route declares
+# the types of its key (e.g. tasks.TASK_CURSOR), which decode() applies.
+
+def encode(*key):
+    """Cursor for a sort key"""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode(cursor, types):
+    """
+    Inverse of encode
+
+    Args:
+        cursor: string from encode()
+        types: one type per key part, e.g. (int, str, int)
+
+    Returns:
+        tuple: the key, each part converted to its type
+
+    Raises:
+        ValueError: garbage, or not as many parts as types
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(key) != len(types):
+            raise ValueError
+        return tuple(cast(part) for cast, part in zip(types, key))
+    except Exception:
+        raise ValueError("Invalid cursor")
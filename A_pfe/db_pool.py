@@ -0,0 +1,235 @@
+import sqlite3
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available in time"""
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a sqlite3 connection checked out from the pool
+
+    Behaves like the raw connection (execute, cursor, commit, ...) except
+    close(): instead of closing the SQLite handle it rolls back
+    any uncommitted work (same visible effect as a real close) and, when the
+    connection is not owned by a Flask app context, returns it to the pool.
+    """
+
+    def __init__(self, pool, con, owned=False):
+        self._pool = pool
+        self._con = con
+        self._owned = owned
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+    def cursor(self, *args, **kwargs):
+        return self._con.cursor(*args, **kwargs)
+
+    def close(self):
+        if self._released:
+            return
+        if self._con.in_transaction:
+            self._con.rollback()
+        if not self._owned:
+            self.release()
+
+    def release(self):
+        """Give the underlying connection back to the pool"""
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._con)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections with per-thread reuse
+
+    - Each thread gets back the connection it used last when it is idle,
+      which keeps the page cache and prepared statements warm.
+    - At most `max_size` connections exist; extra callers wait up to
+      `timeout` seconds and then get PoolTimeout.
+    - Connections idle for more than `health_check_after` seconds are
+      pinged with SELECT 1 before being handed out, and replaced if broken.
+    - Every connection runs in WAL mode with synchronous=NORMAL and a
+      memory-mapped database file, and keeps `statement_cache` compiled
+      statements (sqlite3 `cached_statements`).
+    """
+
+    def __init__(self, db_name, max_size=8, timeout=10, busy_timeout=10,
+                 mmap_size=256 * 1024 * 1024, statement_cache=256,
+                 health_check_after=30):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.mmap_size = mmap_size
+        self.statement_cache = statement_cache
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = {}  # id(con) -> (con, last_used)
+        self._size = 0   # open connections + slots being connected
+        self._local = threading.local()
+
+        self._stats = {
+            "hits": 0,
+            "thread_hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "health_failures": 0,
+        }
+
+    # =========================
+    # CONNECTION LIFECYCLE
+    # =========================
+    def _connect(self):
+        con = sqlite3.connect(
+            self.db_name,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.statement_cache,
+        )
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        return con
+
+    def _healthy(self, con):
+        try:
+            con.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, con):
+        self._size -= 1
+        try:
+            con.close()
+        except sqlite3.Error:
+            pass
+
+    def _take_idle(self):
+        """Pick an idle connection, preferring this thread's last one"""
+        preferred = getattr(self._local, "con", None)
+        if preferred is not None and id(preferred) in self._idle:
+            self._stats["thread_hits"] += 1
+            return self._idle.pop(id(preferred))
+        key = next(iter(self._idle))
+        return self._idle.pop(key)
+
+    def acquire(self, owned=False, timeout=None):
+        """
+        Check out a connection
+
+        Args:
+            owned: True when the caller (Flask app context) releases it,
+                   in which case close() only rolls back
+            timeout: seconds to wait for a free connection (default: the
+                     pool's timeout); 0 raises PoolTimeout at once, without
+                     counting a wait
+
+        Returns:
+            PooledConnection
+        """
+        deadline = None
+        waited_since = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    con, last_used = self._take_idle()
+                    self._stats["hits"] += 1
+                    break
+                if self._size < self.max_size:
+                    con, last_used = None, None
+                    self._size += 1  # reserve the slot while connecting
+                    self._stats["misses"] += 1
+                    break
+
+                if timeout == 0:
+                    raise PoolTimeout("No database connection available")
+                if deadline is None:
+                    waited_since = time.perf_counter()
+                    deadline = waited_since + (self.timeout if timeout is None else timeout)
+                    self._stats["waits"] += 1
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    self._stats["wait_time"] += time.perf_counter() - waited_since
+                    raise PoolTimeout("No database connection available")
+                self._cond.wait(remaining)
+
+            if waited_since is not None:
+                self._stats["wait_time"] += time.perf_counter() - waited_since
+
+        if con is not None and time.monotonic() - last_used > self.health_check_after \
+                and not self._healthy(con):
+            # Keep the slot reserved, only swap the broken handle
+            with self._cond:
+                self._stats["health_failures"] += 1
+            try:
+                con.close()
+            except sqlite3.Error:
+                pass
+            con = None
+
+        if con is None:
+            try:
+                con = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+        self._local.con = con
+        return PooledConnection(self, con, owned=owned)
+
+    def _release(self, con):
+        if con.in_transaction:
+            con.rollback()
+        with self._cond:
+            self._idle[id(con)] = (con, time.monotonic())
+            self._cond.notify()
+
+    def reset(self):
+        """
+        Forget every pooled connection without closing it
+
+        Used after fork(): the child must not touch SQLite handles that
+        belong to the parent process. The lock is recreated too, since a
+        parent thread may have held it at fork time.
+        """
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = {}
+        self._size = 0
+        self._local = threading.local()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._cond:
+            for con, _ in self._idle.values():
+                self._discard(con)
+            self._idle.clear()
+
+    # =========================
+    # METRICS
+    # =========================
+    def stats(self):
+        """Return a snapshot of the pool counters"""
+        with self._cond:
+            data = dict(self._stats)
+            data["size"] = self._size
+            data["idle"] = len(self._idle)
+            data["in_use"] = self._size - len(self._idle)
+            data["max_size"] = self.max_size
+        data["wait_time"] = round(data["wait_time"], 4)
+        return data
@@ -0,0 +1,44 @@
+"""
+Gunicorn configuration for the ERP API (multi-process production mode)
+
+Started by run_production.py (SERVER=gunicorn) or directly:
+    gunicorn -c gunicorn.conf.py main:app
+
+Environment:
+    HOST, PORT            bind address (0.0.0.0:5000)
+    WEB_CONCURRENCY       worker processes (default: CPU count)
+    THREADS               threads per worker (default: 4)
+    GRACEFUL_TIMEOUT      seconds a worker gets to finish on restart (30)
+    MAX_REQUESTS          recycle a worker after N requests (1000, 0 = never)
+"""
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.getenv("THREADS", 4))
+worker_class = "gthread"
+
+# Load main.py once in the master: models and code are shared
+# copy-on-write, and the scheduler it starts runs in the master only
+# (threads do not survive fork), i.e. a single scheduler for all workers.
+preload_app = True
+os.environ.setdefault("MODEL_WARMUP", "sync")
+
+timeout = 120
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+max_requests = int(os.getenv("MAX_REQUESTS", 1000))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+
+def post_fork(server, worker):
+    """Drop state inherited from the master that must not cross a fork"""
+    import main
+
+    main.db_pool.reset()
+    main.score.registry.after_fork()
+    main.scheduler_lease.after_fork()
+    main.notifier.after_fork()
@@ -0,0 +1,272 @@
+import hashlib
+import io
+import mimetypes
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Response, request, send_file
+from werkzeug.security import safe_join
+from PIL import Image
+
+THUMBNAIL_SIZES = (64, 256)
+THUMBNAIL_FORMAT = "webp"
+
+# File signatures of the accepted formats -> stored extension
+MAGIC_BYTES = {
+    b"\x89PNG\r\n\x1a\n": "png",
+    b"\xff\xd8\xff": "jpg",
+}
+
+# <sha256>.<ext> or <sha256>_<size>.webp
+CONTENT_ADDRESSED = re.compile(r"^([0-9a-f]{64})(?:_(\d+))?\.(png|jpg|webp)$")
+
+# Serving
+SMALL_FILE_LIMIT = 64 * 1024          # files up to this size are kept in memory
+MEMORY_CACHE_BYTES = 16 * 1024 * 1024 # total bytes of the in-memory LRU
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600   # content-addressed names never change
+LEGACY_MAX_AGE = 24 * 3600
+FALLBACK_MAX_AGE = 60                 # original served for a pending thumbnail
+
+def sniff(head):
+    """Return the real image type from the first bytes, or None"""
+    for magic, ext in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return ext
+    return None
+
+def thumbnail_name(filename, size):
+    """
+    Name of a stored image's thumbnail
+
+    Legacy (random UUID) uploads have no thumbnails; their own name is
+    returned so callers can always use the result.
+    """
+    if not filename:
+        return filename
+    match = CONTENT_ADDRESSED.match(filename)
+    if not match or match.group(2):
+        return filename
+    return f"{match.group(1)}_{size}.{THUMBNAIL_FORMAT}"
+
+class BytesLRU:
+    """LRU of small file contents, bounded by total size in bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()  # key -> (data, etag)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key, data, etag):
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = (data, etag)
+            self.size += len(data)
+            while self.size > self.max_bytes and self._items:
+                _, (old, _) = self._items.popitem(last=False)
+                self.size -= len(old)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "items": len(self._items), "bytes": self.size}
+
+class ImageStore:
+    """
+    Content-addressed profile image storage
+
+    - The upload's real type comes from its magic bytes (PNG/JPEG only) and
+      Pillow must be able to parse it.
+    - Files are stored as <sha256>.<ext>, so identical uploads share one file.
+    - Thumbnails (THUMBNAIL_SIZES, WebP) are decoded/resized/re-encoded by a
+      background worker pool; until they exist, get_path() falls back to
+      the original.
+    """
+
+    def __init__(self, folder, max_size, workers=2):
+        self.folder = folder
+        self.max_size = max_size
+        self.memory = BytesLRU(MEMORY_CACHE_BYTES)
+        self._legacy_etags = {}  # (filename, mtime_ns, size) -> sha256
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="thumbnails")
+        os.makedirs(folder, exist_ok=True)
+
+    # =========================
+    # UPLOAD
+    # =========================
+    def save(self, file):
+        """
+        Validate and store an uploaded image
+
+        Args:
+            file: FileStorage object from request.files
+
+        Returns:
+            tuple: (filename, error_message)
+        """
+        if not file or file.filename == "":
+            return None, None
+
+        data = file.stream.read(self.max_size + 1)
+        if len(data) > self.max_size:
+            return None, f"Image too large (max {self.max_size // (1024 * 1024)}MB)"
+
+        ext = sniff(data[:8])
+        if not ext:
+            return None, "Only PNG, JPG, JPEG allowed"
+
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.verify()
+        except Exception:
+            return None, "Invalid image file"
+
+        digest = hashlib.sha256(data).hexdigest()
+        filename = f"{digest}.{ext}"
+        path = os.path.join(self.folder, filename)
+
+        try:
+            if not os.path.exists(path):
+                self._write_atomic(path, data)
+        except Exception as e:
+            return None, f"Failed to save image: {str(e)}"
+
+        self._executor.submit(self._make_thumbnails, path, digest)
+        return filename, None
+
+    def _write_atomic(self, path, data):
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _make_thumbnails(self, path, digest):
+        try:
+            with Image.open(path) as img:
+                img.load()
+                if img.mode not in ("RGB", "RGBA"):
+                    img = img.convert("RGBA")
+                for size in THUMBNAIL_SIZES:
+                    thumb_path = os.path.join(self.folder, f"{digest}_{size}.{THUMBNAIL_FORMAT}")
+                    if os.path.exists(thumb_path):
+                        continue
+                    thumb = img.copy()
+                    thumb.thumbnail((size, size))
+                    buffer = io.BytesIO()
+                    thumb.save(buffer, THUMBNAIL_FORMAT, quality=80, method=4)
+                    self._write_atomic(thumb_path, buffer.getvalue())
+        except Exception as e:
+            print(f"❌ Thumbnail error for {os.path.basename(path)}: {e}")
+
+    # =========================
+    # LOOKUP
+    # =========================
+    def get_path(self, filename):
+        """
+        Name of the file to serve for a requested image
+
+        A thumbnail that is not generated yet resolves to its original.
+
+        Returns:
+            str or None: existing filename inside the folder
+        """
+        path = safe_join(self.folder, filename)
+        if path is None or os.path.basename(filename) != filename:
+            return None
+        if os.path.isfile(path):
+            return filename
+        match = CONTENT_ADDRESSED.match(filename)
+        if match and match.group(2):
+            for ext in set(MAGIC_BYTES.values()):
+                original = f"{match.group(1)}.{ext}"
+                if os.path.exists(os.path.join(self.folder, original)):
+                    return original
+        return None
+
+    # =========================
+    # SERVING
+    # =========================
+    def _etag(self, filename, path, stat):
+        """Strong ETag: the content hash (from the name when content-addressed)"""
+        match = CONTENT_ADDRESSED.match(filename)
+        if match:
+            return filename.rsplit(".", 1)[0]
+        key = (filename, stat.st_mtime_ns, stat.st_size)
+        etag = self._legacy_etags.get(key)
+        if etag is None:
+            sha = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    sha.update(block)
+            etag = self._legacy_etags[key] = sha.hexdigest()
+        return etag
+
+    def response(self, filename):
+        """
+        Build the HTTP response for /images/<filename>
+
+        - Strong ETag from the content hash; If-None-Match → 304 with no body
+        - Content-addressed names: Cache-Control public, max-age=1y, immutable
+        - Small files come from an in-memory LRU, larger ones go through
+          send_file (wsgi.file_wrapper / sendfile where the server has it)
+        - Range requests are answered with 206 in both cases
+
+        Returns:
+            Response, or None when the image does not exist
+        """
+        served = self.get_path(filename)
+        if served is None:
+            return None
+
+        if served != filename:
+            max_age, immutable = FALLBACK_MAX_AGE, False
+        elif CONTENT_ADDRESSED.match(served):
+            max_age, immutable = IMMUTABLE_MAX_AGE, True
+        else:
+            max_age, immutable = LEGACY_MAX_AGE, False
+
+        path = os.path.join(self.folder, served)
+        stat = os.stat(path)
+        mimetype = mimetypes.guess_type(served)[0] or "application/octet-stream"
+        key = (served, stat.st_mtime_ns, stat.st_size)
+
+        cached = self.memory.get(key) if stat.st_size <= SMALL_FILE_LIMIT else None
+        if cached is None and stat.st_size <= SMALL_FILE_LIMIT:
+            with open(path, "rb") as f:
+                data = f.read()
+            cached = (data, self._etag(served, path, stat))
+            self.memory.put(key, *cached)
+
+        if cached is not None:
+            data, etag = cached
+            response = Response(data, mimetype=mimetype)
+            response.set_etag(etag)
+            response.last_modified = stat.st_mtime
+        else:
+            etag = self._etag(served, path, stat)
+            response = send_file(path, mimetype=mimetype, etag=etag,
+                                 conditional=False, max_age=max_age)
+
+        response.accept_ranges = "bytes"
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = immutable
+        return response.make_conditional(request, accept_ranges=True,
+                                         complete_length=stat.st_size)
@@ -0,0 +1,117 @@
+import json
+
+import charge
+
+# =========================
+# PROJECT STATUS TRANSITIONS (EVENT-DRIVEN)
+# =========================
+# Only projects whose next_transition_date (generated column, see
+# BD.NEXT_TRANSITION_SQL) has been reached are touched, found through the
+# partial index idx_projects_next_transition: a tick costs O(due
+# transitions), not O(all projects). With :today (YYYY-MM-DD):
+#   planned  → active   when start_date <= today <= end_date
+#   planned  → finished when today > end_date
+#   active   → finished when today > end_date
+# days_remaining is no longer stored; it is derived from the dates at read
+# time (DAYS_REMAINING_SQL).
+PROJECT_TRANSITIONS_SQL = """
+    UPDATE projects
+    SET status = CASE WHEN :today > end_date THEN 'finished' ELSE 'active' END
+    WHERE next_transition_date <= :today
+    RETURNING id, name, company_id, chef_id, status
+"""
+
+# Days until the next milestone of project `p` (start for planned, end for
+# active), computed at read time against the local date
+DAYS_REMAINING_SQL = """CASE p.status
+        WHEN 'planned' THEN MAX(CAST(julianday(p.start_date) - julianday('now', 'localtime', 'start of day') AS INTEGER), 0)
+        WHEN 'active' THEN MAX(CAST(julianday(p.end_date) - julianday('now', 'localtime', 'start of day') AS INTEGER), 0)
+        ELSE 0
+    END"""
+
+def update_project_statuses(cur, today):
+    """
+    Apply every status transition due on or before `today` in a single
+    UPDATE
+
+    Args:
+        cur: database cursor
+        today: date of the run
+
+    Returns:
+        tuple: (list of changed project dicts, set of chef_ids with newly
+               finished projects)
+    """
+    cur.execute(PROJECT_TRANSITIONS_SQL, {"today": today.isoformat()})
+    rows = [dict(r) for r in cur.fetchall()]
+    finished_chefs = {r["chef_id"] for r in rows if r["status"] == "finished"}
+    return rows, finished_chefs
+
+def update_chef_charges(cur, chef_ids):
+    """
+    Refresh charge aggregates of the given chefs, then push every changed
+    charge into chef_profiles with one grouped UPDATE
+
+    Returns:
+        int: number of chef profiles updated
+    """
+    charge.refresh_projects(cur, chef_ids)
+    return charge.sync_chef_profiles(cur)
+
+def run_status_and_charge_update(cur, today):
+    """
+    Whole scheduler pass: status transitions then chef charges
+
+    Returns:
+        dict: rows changed per step, plus the changed projects
+              ("transitions") for notifications
+    """
+    transitions, finished_chefs = update_project_statuses(cur, today)
+    chefs_changed = update_chef_charges(cur, finished_chefs)
+    return {"projects": len(transitions), "chefs": chefs_changed,
+            "transitions": transitions}
+
+def transition_changes(transitions):
+    """
+    change_feed events for a tick's status transitions: the project, and
+    the chef's charge when the project finished
+
+    Returns:
+        list: (company_id, kind, entity_id, user_id) tuples
+    """
+    changes = []
+    for t in transitions:
+        changes.append((t["company_id"], "project", t["id"], None))
+        if t["status"] == "finished":
+            changes.append((t["company_id"], "charge", t["chef_id"], None))
+    return changes
+
+# =========================
+# STATUS CHANGE NOTIFICATIONS
+# =========================
+def status_change_events(cur, transitions):
+    """
+    Notification events for a tick's status transitions: the project's
+    chef and every RH of its company, found with one query
+
+    Returns:
+        list: (user_id, type, title, message) tuples for Notifier.notify_many
+    """
+    if not transitions:
+        return []
+    company_ids = sorted({t["company_id"] for t in transitions})
+    cur.execute("""
+        SELECT id, company_id FROM users
+        WHERE role='RH' AND company_id IN (SELECT value FROM json_each(?))
+    """, (json.dumps(company_ids),))
+    rh_by_company = {}
+    for r in cur.fetchall():
+        rh_by_company.setdefault(r["company_id"], []).append(r["id"])
+
+    events = []
+    for t in transitions:
+        title = f"Project {t['name']} is now {t['status']}"
+        message = f"Project #{t['id']} moved to {t['status']}"
+        for user_id in [t["chef_id"], *rh_by_company.get(t["company_id"], [])]:
+            events.append((user_id, "status_change", title, message))
+    return events
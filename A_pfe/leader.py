@@ -0,0 +1,130 @@
+import os
+import socket
+import time
+import uuid
+
+LEASE_TTL = int(os.getenv("SCHEDULER_LEASE_TTL", 90))  # seconds
+RUNS_KEPT = 1000  # rows kept in scheduler_runs
+
+# =========================
+# LEASE (single leader)
+# =========================
+# Take the lease when it is free or expired, or renew it when we already
+# hold it; acquired_at only moves on a change of owner. RETURNING yields a
+# row only when the upsert actually wrote, i.e. when we are the leader.
+ACQUIRE_SQL = """
+    INSERT INTO scheduler_lease (name, owner, acquired_at, renewed_at, expires_at)
+    VALUES (:name, :owner, :now, :now, :expires)
+    ON CONFLICT(name) DO UPDATE SET
+        owner = excluded.owner,
+        acquired_at = CASE WHEN scheduler_lease.owner = excluded.owner
+                           THEN scheduler_lease.acquired_at
+                           ELSE excluded.acquired_at END,
+        renewed_at = excluded.renewed_at,
+        expires_at = excluded.expires_at
+    WHERE scheduler_lease.owner = excluded.owner
+       OR scheduler_lease.expires_at < excluded.renewed_at
+    RETURNING acquired_at
+"""
+
+class SchedulerLease:
+    """
+    Leader election through a lease row in SQLite
+
+    Every process that runs the scheduler competes for the same row; only
+    the holder runs the scheduled jobs. The holder renews the lease every
+    `ttl / 3` seconds; when it dies, the lease expires after `ttl` seconds
+    and the next process to try takes over.
+    """
+
+    def __init__(self, name="scheduler", ttl=LEASE_TTL):
+        self.name = name
+        self.ttl = ttl
+        self.owner = self._new_owner()
+        self.is_leader = False
+        self.acquired_at = None
+        self.last_run = None
+
+    @staticmethod
+    def _new_owner():
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def try_acquire(self, cur):
+        """
+        Take or renew the lease (inside the caller's transaction)
+
+        Returns:
+            bool: True when this process is the leader
+        """
+        now = time.time()
+        cur.execute(ACQUIRE_SQL, {"name": self.name, "owner": self.owner,
+                                  "now": now, "expires": now + self.ttl})
+        row = cur.fetchone()
+        was_leader = self.is_leader
+        self.is_leader = row is not None
+        if self.is_leader and not was_leader:
+            self.acquired_at = row[0]
+            print(f"👑 Scheduler leadership acquired by {self.owner}")
+        elif was_leader and not self.is_leader:
+            print(f"⚠️ Scheduler leadership lost by {self.owner}")
+        return self.is_leader
+
+    def release(self, cur):
+        """Give the lease up so another process can take over at once"""
+        cur.execute("DELETE FROM scheduler_lease WHERE name=? AND owner=?",
+                    (self.name, self.owner))
+        self.is_leader = False
+
+    def after_fork(self):
+        """A forked process is a new candidate, never the parent's leader"""
+        self.owner = self._new_owner()
+        self.is_leader = False
+        self.acquired_at = None
+        self.last_run = None
+
+    def status(self):
+        return {
+            "owner": self.owner,
+            "leader": self.is_leader,
+            "acquired_at": self.acquired_at,
+            "ttl": self.ttl,
+            "last_run": self.last_run,
+        }
+
+# =========================
+# RUN METRICS
+# =========================
+def record_run(cur, lease, job, started_at, duration, changed=None, error=None):
+    """
+    Store one scheduler run in scheduler_runs (and keep the last RUNS_KEPT)
+
+    Args:
+        cur: database cursor
+        lease: SchedulerLease of the process that ran the job
+        job: job name
+        started_at: unix time the run started
+        duration: seconds
+        changed: dict of rows changed per step ({"projects": n, "chefs": n})
+        error: error message when the run failed
+    """
+    changed = changed or {}
+    run = {
+        "job": job,
+        "owner": lease.owner,
+        "started_at": started_at,
+        "duration_ms": round(duration * 1000, 2),
+        "projects_changed": changed.get("projects", 0),
+        "chefs_changed": changed.get("chefs", 0),
+        "status": "error" if error else "ok",
+        "error": error,
+    }
+    cur.execute("""
+        INSERT INTO scheduler_runs
+            (job, owner, started_at, duration_ms, projects_changed, chefs_changed,
+             status, error)
+        VALUES (:job, :owner, :started_at, :duration_ms, :projects_changed,
+                :chefs_changed, :status, :error)
+    """, run)
+    cur.execute("DELETE FROM scheduler_runs WHERE id <= ?", (cur.lastrowid - RUNS_KEPT,))
+    lease.last_run = run
+    return run
@@ -1,9 +1,29 @@
-from flask import Flask, request, jsonify, send_from_directory
-import sqlite3, os, uuid, bcrypt, jwt
+from flask import Flask, request, jsonify, g, has_app_context
+from flask import Response, stream_with_context
+import sqlite3, os, jwt, json, atexit, time, math, hmac
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+import threading
 from dotenv import load_dotenv as do
 from datetime import datetime, timedelta
 import score 
+import BD
+import charge
+import company_stats
+import jobs
+import leader
+import bulk_import
+import cursors
+import tasks
+import notifications
+import change_feed
+import activity
+import metrics
+from db_pool import ConnectionPool, PoolTimeout
+from passwords import hasher, HasherBusy
+from token_cache import TokenCache, Revocations
+from images import ImageStore, thumbnail_name
+from response_cache import ResponseCache
 from apscheduler.schedulers.background import BackgroundScheduler
 
 do()
@@ -12,13 +32,26 @@ do()
 # CONFIGURATION
 # =========================
 MAX_IMAGE_SIZE = 3 * 1024 * 1024  # Maximum image size: 3MB
-DB_NAME = "database.db"
+DB_NAME = os.getenv("DB_NAME", "database.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
 SECRET = os.getenv("SECRET")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_LIFETIME = timedelta(hours=24)
 UPLOAD_FOLDER = os.getenv("folder", "images")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+DASHBOARD_THUMB_SIZE = 64
 
 app = Flask(__name__)
 
+db_pool = ConnectionPool(DB_NAME, max_size=DB_POOL_SIZE)
+token_cache = TokenCache(max_size=TOKEN_CACHE_SIZE)
+token_revocations = Revocations(db_pool, int(TOKEN_LIFETIME.total_seconds()))
+image_store = ImageStore(UPLOAD_FOLDER, MAX_IMAGE_SIZE)
+scheduler_lease = leader.SchedulerLease()
+notifier = notifications.Notifier(db_pool)
+change_broker = change_feed.ChangeBroker(db_pool)
+audit_log = activity.ActivityLog(db_pool)
+response_cache = ResponseCache(db_pool)
+
 # =========================
 # DATABASE HELPER
 # =========================
@@ -28,12 +61,103 @@ def home():
     
 def get_db():
     """
-    Create database connection with Row factory for dict-like access
+    Get a pooled database connection with Row factory for dict-like access
+
+    Inside an app context the same connection is shared for the whole
+    request (or scheduler run) and given back to the pool on teardown;
+    con.close() only rolls back uncommitted work.
+    Outside an app context the connection goes back to the pool on close().
+    The cursor charges its statements to the current request's metrics.
+
     Returns: connection and cursor objects
     """
-    con = sqlite3.connect(DB_NAME, timeout=10, check_same_thread=False)
-    con.row_factory = sqlite3.Row
-    return con, con.cursor()
+    if has_app_context():
+        con = g.get("_db")
+        if con is None:
+            con = g._db = db_pool.acquire(owned=True)
+    else:
+        con = db_pool.acquire()
+    return con, con.cursor(factory=metrics.TimedCursor)
+
+@app.teardown_appcontext
+def release_db(exc):
+    """Return the app context connection to the pool"""
+    con = g.pop("_db", None)
+    if con is not None:
+        con.release()
+
+# =========================
+# REQUEST METRICS
+# =========================
+def explain_query(sql, parameters):
+    """
+    EXPLAIN QUERY PLAN of a statement, for the slow-request log
+
+    Runs on the request's own connection. When that one is gone (streamed
+    bodies finish after teardown) only an idle connection is used: a slow
+    request must never wait on the pool here.
+    """
+    con = g.get("_db") if has_app_context() else None
+    if con is not None:
+        return [row["detail"] for row in con.execute("EXPLAIN QUERY PLAN " + sql, parameters)]
+    try:
+        con = db_pool.acquire(timeout=0)
+    except PoolTimeout:
+        return ["skipped: no free database connection"]
+    try:
+        return [row["detail"] for row in con.execute("EXPLAIN QUERY PLAN " + sql, parameters)]
+    finally:
+        con.close()
+
+@app.before_request
+def start_request_metrics():
+    metrics.begin_request()
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Feed the per-route histograms (see metrics.py)
+
+    Streamed bodies (e.g. /dashboard/resources) run their queries while
+    they are sent, so their accounting ends when the server closes them.
+    """
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    method, status = request.method, response.status_code
+
+    if response.direct_passthrough or not response.is_streamed:
+        size = (response.content_length if response.direct_passthrough
+                else response.calculate_content_length())
+        metrics.end_request(route, method, status, size, explain_query)
+        return response
+
+    body = response.response
+    sent = [0]
+
+    def counting():
+        try:
+            for chunk in body:
+                sent[0] += len(chunk.encode() if isinstance(chunk, str) else chunk)
+                yield chunk
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+
+    response.response = counting()
+    response.call_on_close(
+        lambda: metrics.end_request(route, method, status, sent[0], explain_query))
+    return response
+
+@app.errorhandler(PoolTimeout)
+def pool_timeout(error):
+    """Handle database pool exhaustion"""
+    return jsonify({"error": "Server busy, try again"}), 503
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(error):
+    """Back-pressure when the password hashing queue is full"""
+    response = jsonify({"error": "Too many requests, try again later"})
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 429
 
 # =========================
 # JWT VERIFICATION DECORATOR
@@ -42,6 +166,8 @@ def verify_token(f):
     """
     Decorator to verify JWT token in Authorization header
     Extracts user data from token and passes to wrapped function
+    Verified claims are cached until the token expires; tokens of deleted
+    users or from before a password change are refused (see token_cache.py)
     """
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -57,15 +183,73 @@ def verify_token(f):
         
         token = parts[1]
         
-        # Decode and verify token
-        try:
-            data = jwt.decode(token, SECRET, algorithms=["HS256"])
-        except:
+        # Decode and verify token (skipped when already verified)
+        data = token_cache.get(token)
+        if data is None:
+            try:
+                data = jwt.decode(token, SECRET, algorithms=["HS256"])
+            except:
+                return jsonify({"error": "Invalid or expired token"}), 401
+            token_cache.put(token, data)
+
+        if token_revocations.is_revoked(data):
             return jsonify({"error": "Invalid or expired token"}), 401
         
         return f(data, *args, **kwargs)
     return wrapper
 
+# =========================
+# RESPONSE CACHE
+# =========================
+# Query parameters that ask for a fresh or streamed answer skip the cache
+CACHE_BYPASS_PARAMS = ("fresh", "stream")
+
+def cached_response(f):
+    """
+    Decorator (under @verify_token) serving a read route from
+    response_cache
+
+    The key is (route, company, role, user, query string and URL
+    arguments) at the company's current generation, so any committed
+    change of the company is a miss. Only 200 JSON bodies are stored;
+    every answer carries an ETag and If-None-Match gets a 304.
+    """
+    @wraps(f)
+    def wrapper(user, *args, **kwargs):
+        if not response_cache.enabled or any(p in request.args for p in CACHE_BYPASS_PARAMS):
+            return f(user, *args, **kwargs)
+
+        params = sorted(request.args.items(multi=True)) + sorted(kwargs.items())
+        key = response_cache.key(request.url_rule.rule, user["company_id"],
+                                 user["role"], user["id"], params)
+        cached = response_cache.get(key)
+        if cached is not None:
+            data, etag = cached
+            response = app.response_class(data, mimetype="application/json")
+            response.headers["X-Cache"] = "HIT"
+        else:
+            response = app.make_response(f(user, *args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            etag = response_cache.put(key, response.get_data())
+            response.headers["X-Cache"] = "MISS"
+
+        response.set_etag(etag)
+        # Clients may keep the body but must revalidate it every time
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.make_conditional(request)
+        if response.status_code == 304:
+            response_cache.not_modified += 1
+        return response
+    return wrapper
+
+@app.after_request
+def refresh_cache_generations(response):
+    """A committed write of this process is visible to its next lookup"""
+    if request.method in ("POST", "PUT", "DELETE") and response.status_code < 400:
+        response_cache.generations.mark_dirty()
+    return response
+
 # =========================
 # IMAGE UPLOAD HELPER
 # =========================
@@ -73,6 +257,10 @@ def save_profile_img(file):
     """
     Validate and save uploaded profile image
     
+    The real type is checked from the file's magic bytes and the image is
+    stored content-addressed (<sha256>.<ext>); thumbnails are generated in
+    the background (see images.py).
+    
     Args:
         file: FileStorage object from request.files
     
@@ -90,187 +278,124 @@ def save_profile_img(file):
     if ext not in {"png", "jpg", "jpeg"}:
         return None, "Only PNG, JPG, JPEG allowed"
 
-    # Validate file size
-    file.seek(0, os.SEEK_END)
-    size = file.tell()
-    file.seek(0)  # Reset file pointer
-
-    if size > MAX_IMAGE_SIZE:
-        return None, "Image too large (max 3MB)"
-
-    # Save file with unique name
-    filename = f"{uuid.uuid4().hex}.{ext}"
-    path = os.path.join(UPLOAD_FOLDER, filename)
-    
-    try:
-        file.save(path)
-        return filename, None
-    except Exception as e:
-        return None, f"Failed to save image: {str(e)}"
+    return image_store.save(file)
 
 # =========================
-# CHEF CHARGE CALCULATION (FIXED VERSION)
+# CHEF CHARGE CALCULATION (INCREMENTAL)
 # =========================
-def calculate_chef_charge(cur, chef_id):
+CHARGE_VERIFY = os.getenv("CHARGE_VERIFY", "0") == "1"
+
+def calculate_chef_charge(cur, chef_id, verify=None):
     """
     Calculate chef's workload percentage
     
-    Method: Calculate charge based on total estimated hours vs weekly capacity
+    Method: Each planned/active project spreads its estimated hours evenly
+    over its dates; the charge is the peak weekly load over the chef's
+    timeline vs team weekly capacity. The peak comes from the per-chef load
+    interval tree (capacity.py) and is stored in chef_charge_stats on every
+    mutation, so this is an O(1) read; create_project and update_project
+    check overload against the same tree.
     
     Args:
         cur: database cursor
         chef_id: ID of the chef
+        verify: also run the full recompute and report mismatches
+                (defaults to the CHARGE_VERIFY env flag)
     
     Returns:
         float: Charge percentage (0-100)
     """
-    # Step 1: Get team's total weekly capacity
-    cur.execute("""
-        SELECT disponibilite_hebdo
-        FROM ressource_profiles
-        WHERE chef_id=?
-    """, (chef_id,))
-    ressources = cur.fetchall()
-    
-    if not ressources:
-        return 0
-    
-    # Total weekly capacity in hours
-    weekly_capacity = sum(r["disponibilite_hebdo"] for r in ressources)
-    
-    if weekly_capacity == 0:
-        return 0
+    if verify is None:
+        verify = CHARGE_VERIFY
 
-    # Step 2: Get all active and planned projects
-    cur.execute("""
-        SELECT estimated_hours, start_date, end_date
-        FROM projects
-        WHERE chef_id=? AND status IN ('planned','active')
-    """, (chef_id,))
-    projects = cur.fetchall()
-    
-    if not projects:
-        return 0
+    if not verify:
+        return charge.get_charge(cur, chef_id)
+
+    ok, fast, slow = charge.verify(cur, chef_id)
+    if not ok:
+        print(f"⚠️  Charge mismatch for chef {chef_id}: aggregate={fast} recomputed={slow}")
+        return slow
+    return fast
 
-    try:
-        # Step 3: Find the overall project timeline
-        all_starts = []
-        all_ends = []
-        
-        for p in projects:
-            start = datetime.strptime(p["start_date"], "%Y-%m-%d")
-            end = datetime.strptime(p["end_date"], "%Y-%m-%d")
-            all_starts.append(start)
-            all_ends.append(end)
-        
-        # Get earliest start and latest end date
-        earliest_start = min(all_starts)
-        latest_end = max(all_ends)
-        
-        # Calculate number of weeks in this period
-        total_days = (latest_end - earliest_start).days + 1
-        total_weeks = total_days / 7.0
-        
-        if total_weeks == 0:
-            return 0
-        
-        # Step 4: Calculate total capacity for this period
-        total_capacity = weekly_capacity * total_weeks
-        
-        # Step 5: Calculate total hours from all projects
-        total_hours = sum(p["estimated_hours"] for p in projects)
-        
-        # Step 6: Calculate charge percentage
-        charge = (total_hours / total_capacity) * 100
-        
-        # Cap at 100%
-        return round(min(charge, 100), 2)
-        
-    except Exception as e:
-        print(f"Error calculating charge: {e}")
-        return 0
 # =========================
 # AUTOMATIC PROJECT STATUS & CHARGE UPDATE
 # =========================
 def update_projects_and_charge():
     """
-    Background scheduler task that runs every 2 minutes to:
-    1. Update project status based on dates (planned → active → finished)
-    2. Update days_remaining for all projects
-    3. Recalculate charge for all chefs
+    Background scheduler task that runs every 6 minutes to:
+    1. Apply due project status transitions (planned → active → finished)
+    2. Recalculate charge for chefs whose projects finished
+    3. Notify each changed project's chef and company RH (one batch per tick)
+    4. Publish the changes to GET /events and prune the old ones
+    5. Prune activity_log days past the retention window (bounded batch)
+
+    Steps 1 and 2 are set-based (see jobs.py): one UPDATE over the projects
+    whose next_transition_date has passed and one grouped UPDATE for
+    chef_profiles, touching only changed rows. days_remaining is computed
+    at read time, so untouched projects need no write.
+    Runs inside an app context so it shares the request connection pool.
+
+    Only the process holding the scheduler lease does the work: the lease
+    is renewed in the same transaction as the updates, so a process that
+    lost it can never commit a run. Each run is recorded in scheduler_runs.
     """
-    con, cur = get_db()
-    try:
-        today_date = datetime.now().date()
-        
-        # =========================
-        # Step 1: Update project statuses
-        # =========================
-        cur.execute("SELECT * FROM projects")
-        projects = cur.fetchall()
-
-        for proj in projects:
-            proj_id = proj["id"]
-            status = proj["status"]
+    with app.app_context():
+        con, cur = get_db()
+        started_at = datetime.now().timestamp()
+        try:
+            if not scheduler_lease.try_acquire(cur):
+                con.rollback()
+                return
+            changed = jobs.run_status_and_charge_update(cur, datetime.now().date())
+            duration = datetime.now().timestamp() - started_at
+            change_feed.publish_many(cur, jobs.transition_changes(changed["transitions"]))
+            change_feed.prune(cur)
+            pruned = activity.prune(cur)
+            leader.record_run(cur, scheduler_lease, "update_projects_and_charge",
+                              started_at, duration, changed)
+            notices = jobs.status_change_events(cur, changed["transitions"])
+            con.commit()
+            response_cache.generations.mark_dirty()
+            notifier.notify_many(notices)
+            print(f"✅ Scheduler updated at {datetime.now()} "
+                  f"({changed['projects']} projects, {changed['chefs']} chefs changed, "
+                  f"{pruned} activity entries pruned)")
 
-            # Parse project dates
+        except Exception as e:
+            con.rollback()
+            print(f"❌ Scheduler Error: {e}")
             try:
-                start_date = datetime.strptime(proj["start_date"], "%Y-%m-%d").date()
-                end_date = datetime.strptime(proj["end_date"], "%Y-%m-%d").date()
-            except Exception:
-                continue
-
-            new_status = status
-
-            # Status transition logic
-            if status == "planned":
-                if today_date < start_date:
-                    new_status = "planned"
-                elif start_date <= today_date <= end_date:
-                    new_status = "active"
-                else:
-                    new_status = "finished"
-
-            elif status == "active":
-                if today_date > end_date:
-                    new_status = "finished"
-
-            # Calculate days remaining
-            if new_status == "planned":
-                days_remaining = max((start_date - today_date).days, 0)
-            elif new_status == "active":
-                days_remaining = max((end_date - today_date).days, 0)
-            else:  # finished
-                days_remaining = 0
-
-            # Update project
-            cur.execute("""
-                UPDATE projects
-                SET status=?, days_remaining=?
-                WHERE id=?
-            """, (new_status, days_remaining, proj_id))
-
-        # =========================
-        # Step 2: Recalculate charge for all chefs
-        # =========================
-        cur.execute("SELECT id FROM users WHERE role='CHEF'")
-        chefs = cur.fetchall()
-
-        for chef in chefs:
-            chef_id = chef["id"]
-            new_charge = calculate_chef_charge(cur, chef_id)
-
-            cur.execute("""
-                UPDATE chef_profiles
-                SET charge_affectee=?
-                WHERE chef_id=?
-            """, (new_charge, chef_id))
-
+                duration = datetime.now().timestamp() - started_at
+                leader.record_run(cur, scheduler_lease, "update_projects_and_charge",
+                                  started_at, duration, error=str(e))
+                con.commit()
+            except sqlite3.Error:
+                con.rollback()
+        finally:
+            con.close()
+
+def renew_scheduler_lease():
+    """Heartbeat job: keep (or take over) the scheduler lease"""
+    with app.app_context():
+        con, cur = get_db()
+        try:
+            scheduler_lease.try_acquire(cur)
+            con.commit()
+        except Exception as e:
+            print(f"❌ Scheduler lease error: {e}")
+        finally:
+            con.close()
+
+def release_scheduler_lease():
+    """Hand leadership over immediately on a clean shutdown"""
+    if not scheduler_lease.is_leader:
+        return
+    con = db_pool.acquire()
+    try:
+        scheduler_lease.release(con.cursor())
         con.commit()
-        print(f"✅ Scheduler updated at {datetime.now()}")
-
     except Exception as e:
-        print(f"❌ Scheduler Error: {e}")
+        print(f"❌ Scheduler lease release error: {e}")
     finally:
         con.close()
 
@@ -310,7 +435,7 @@ def register_company():
         return jsonify({"error": error}), 400
 
     # Hash password
-    hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hashed_pw = hasher.hash(password)
 
     con, cur = get_db()
     try:
@@ -363,15 +488,29 @@ def login():
     if not user:
         return jsonify({"error": "User not found"}), 404
     
-    if not bcrypt.checkpw(password.encode(), user["password"]):
+    if not hasher.check(password, user["password"]):
         return jsonify({"error": "Invalid password"}), 401
 
+    # Transparently upgrade hashes made with an older cost factor
+    if hasher.needs_rehash(user["password"]):
+        try:
+            new_hash = hasher.hash(password)
+        except HasherBusy:
+            new_hash = None  # try again on a later login
+        if new_hash:
+            con, cur = get_db()
+            cur.execute("UPDATE users SET password=? WHERE id=?", (new_hash, user["id"]))
+            con.commit()
+            con.close()
+
     # Generate JWT token (valid for 24 hours)
+    now = datetime.utcnow()
     token = jwt.encode({
         "id": user["id"],
         "role": user["role"],
         "company_id": user["company_id"],
-        "exp": datetime.utcnow() + timedelta(hours=24)
+        "iat": time.time(),  # sub-second, see Revocations.is_revoked
+        "exp": now + TOKEN_LIFETIME
     }, SECRET, algorithm="HS256")
 
     return jsonify({"token": token}), 200
@@ -420,7 +559,7 @@ def add_chef(user):
         return jsonify({"error": error}), 400
 
     # Hash password
-    hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hashed_pw = hasher.hash(password)
 
     con, cur = get_db()
     try:
@@ -436,8 +575,10 @@ def add_chef(user):
             INSERT INTO chef_profiles (chef_id, charge_affectee, score, disponibilite_hebdo)
             VALUES (?,?,?,?)
         """, (chef_id, 0, 50, int(dispo)))
+        change_feed.publish(cur, user["company_id"], "chef", chef_id)
         
         con.commit()
+        audit_log.record(user, "create", "user", chef_id, {"role": "CHEF"})
         return jsonify({"msg": "Chef created"}), 201
     except sqlite3.IntegrityError as e:
         return jsonify({"error": str(e)}), 400
@@ -461,11 +602,13 @@ def add_ressource(user):
         - experience: Years of experience
         - cost_hour: Hourly cost
         - disponibilite_hebdo: Weekly availability hours
-        - charge_affectee: Current workload percentage
         - competence_moyenne: Average skill level
         - chef_id: Required if called by RH
         - profile_img: Optional profile image
-    
+
+    charge_affectee is not accepted: it follows from task hours, so a new
+    resource starts at 0.
+
     Returns:
         201: Resource created, chef charge updated
         400: Missing data or validation error
@@ -480,7 +623,6 @@ def add_ressource(user):
     experience = int(request.form.get("experience", 5))
     cost_hour = float(request.form.get("cost_hour", 5))
     dispo = int(request.form.get("disponibilite_hebdo", 40))
-    charge_affectee = int(request.form.get("charge_affectee", 0))
     competence_moyenne = float(request.form.get("competence_moyenne", 50))
     profile_img = request.files.get("profile_img")
 
@@ -513,9 +655,9 @@ def add_ressource(user):
     else:
         return jsonify({"error": "Permission denied"}), 403
 
-    # Calculate resource score
+    # Calculate resource score (no tasks yet: charge 0)
     new_score = score.ressource_score(
-        experience, cost_hour, dispo, charge_affectee, competence_moyenne
+        experience, cost_hour, dispo, 0, competence_moyenne
     )
 
     # Save profile image
@@ -524,7 +666,7 @@ def add_ressource(user):
         return jsonify({"error": error}), 400
 
     # Hash password
-    hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hashed_pw = hasher.hash(password)
 
     con, cur = get_db()
     try:
@@ -543,19 +685,23 @@ def add_ressource(user):
                 ressource_id, chef_id, niveau_experience, disponibilite_hebdo,
                 cout_horaire, charge_affectee, competence_moyenne, score
             )
-            VALUES (?,?,?,?,?,?,?,?)
-        """, (res_id, chef_id, experience, dispo, cost_hour, charge_affectee, 
+            VALUES (?,?,?,?,?,0,?,?)
+        """, (res_id, chef_id, experience, dispo, cost_hour,
               competence_moyenne, round(new_score)))
 
         # 🔥 Recalculate chef's charge after adding new resource
+        charge.add_capacity(cur, chef_id, dispo, 1)
         new_charge = calculate_chef_charge(cur, chef_id)
         cur.execute("""
             UPDATE chef_profiles
             SET charge_affectee=?
             WHERE chef_id=?
         """, (new_charge, chef_id))
+        change_feed.publish_many(cur, [(user["company_id"], "ressource", res_id, None),
+                                       (user["company_id"], "charge", chef_id, None)])
 
         con.commit()
+        audit_log.record(user, "create", "user", res_id, {"role": "RESSOURCE", "chef_id": chef_id})
 
         return jsonify({
             "msg": "Ressource created",
@@ -568,6 +714,366 @@ def add_ressource(user):
     finally:
         con.close()
 
+# =========================
+# BATCH RESSOURCE SCORING
+# =========================
+MAX_SCORE_BATCH = int(os.getenv("MAX_SCORE_BATCH", 1000))
+
+# JSON field -> (score feature, default), same names/defaults as /ressource
+SCORE_FIELDS = [
+    ("experience", 5),
+    ("disponibilite_hebdo", 40),
+    ("cost_hour", 5),
+    ("charge_affectee", 0),
+    ("competence_moyenne", 50),
+]
+
+@app.route("/ressource/score/batch", methods=["POST"])
+@verify_token
+def score_ressources_batch(user):
+    """
+    Score many resources with a single model invocation
+    
+    Allowed roles: RH, CHEF
+    
+    JSON body:
+        - resources: list of objects with experience, cost_hour,
+          disponibilite_hebdo, charge_affectee, competence_moyenne
+          (missing fields use the /ressource defaults)
+    
+    Returns:
+        200: Scores in the same order as the input
+        400: Invalid body or batch too large
+        403: Permission denied
+    """
+    if user["role"] not in ("RH", "CHEF"):
+        return jsonify({"error": "Permission denied"}), 403
+
+    body = request.get_json(silent=True) or {}
+    resources = body.get("resources")
+
+    if not isinstance(resources, list) or not resources:
+        return jsonify({"error": "resources list required"}), 400
+
+    if len(resources) > MAX_SCORE_BATCH:
+        return jsonify({"error": f"Too many resources (max {MAX_SCORE_BATCH})"}), 400
+
+    matrix = []
+    for i, r in enumerate(resources):
+        if not isinstance(r, dict):
+            return jsonify({"error": f"Invalid resource at index {i}"}), 400
+        row = []
+        for field, default in SCORE_FIELDS:
+            try:
+                value = float(r.get(field, default))
+            except (TypeError, ValueError, OverflowError):
+                value = None
+            # json accepts NaN/Infinity, which the model would score anyway
+            if value is None or not math.isfinite(value):
+                return jsonify({"error": f"Invalid {field} at index {i}"}), 400
+            row.append(value)
+        matrix.append(row)
+
+    scores = score.ressource_scores(matrix)
+
+    return jsonify({
+        "count": len(matrix),
+        "scores": [round(float(s), 2) for s in scores]
+    }), 200
+
+# =========================
+# BULK RESSOURCE IMPORT
+# =========================
+# Hashing a large upload takes minutes at the production bcrypt cost, so
+# imports run in the background, one at a time per process; a second
+# upload while one is queued or running gets a 429.
+BULK_RETRY_AFTER = int(os.getenv("BULK_RETRY_AFTER", 30))
+import_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-import")
+import_slot = threading.BoundedSemaphore(1)
+
+@app.route("/ressource/bulk", methods=["POST"])
+@verify_token
+def bulk_import_ressources(user):
+    """
+    Import many resources from a CSV or JSONL upload
+    
+    Allowed roles: RH (chef_id per row, or ?chef_id= as default),
+    CHEF (all rows go to their own team)
+    
+    Upload: multipart field "file", or the raw request body
+    (Content-Type text/csv or application/x-ndjson). Columns/keys are the
+    /ressource form fields; profile images are not supported.
+    
+    Query params (optional):
+        - format: csv or jsonl (default: from file name / content type)
+        - chef_id: default chef for rows without one (RH)
+    
+    The upload is parsed and validated row by row while it streams in
+    (at most MAX_BULK_ROWS rows); invalid rows are skipped and reported.
+    The valid rows are then imported in the background (run_bulk_import);
+    GET the returned status_url for the outcome.
+    
+    Returns:
+        202: job_id, status_url, rows queued, per-row errors
+        400: Unreadable upload, too many rows or no valid row
+        403: Permission denied
+        429: Another import is queued or running (Retry-After)
+    """
+    if user["role"] not in ("RH", "CHEF"):
+        return jsonify({"error": "Permission denied"}), 403
+
+    upload = request.files.get("file")
+    if upload:
+        stream, filename, content_type = upload.stream, upload.filename, upload.mimetype
+    else:
+        stream, filename, content_type = request.stream, None, request.mimetype
+
+    default_chef = request.args.get("chef_id")
+    try:
+        fmt = bulk_import.detect_format(filename, content_type, request.args.get("format"))
+        default_chef = int(default_chef) if default_chef else None
+    except bulk_import.BulkFormatError as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError:
+        return jsonify({"error": "Invalid chef_id"}), 400
+
+    con, cur = get_db()
+    try:
+        if user["role"] == "RH":
+            cur.execute("SELECT id FROM users WHERE role='CHEF' AND company_id=?",
+                        (user["company_id"],))
+            company_chefs = {r["id"] for r in cur.fetchall()}
+
+        # Step 1: Stream and validate rows
+        rows, errors, seen = [], [], set()
+        try:
+            for number, raw, error in bulk_import.iter_rows(stream, fmt):
+                if number > bulk_import.MAX_BULK_ROWS:
+                    return jsonify({
+                        "error": f"Too many rows (max {bulk_import.MAX_BULK_ROWS})"
+                    }), 400
+
+                values = None
+                if not error:
+                    values, error = bulk_import.parse_row(raw)
+                if not error:
+                    if user["role"] == "CHEF":
+                        if values["chef_id"] not in (None, user["id"]):
+                            error = "Permission denied for chef_id"
+                        values["chef_id"] = user["id"]
+                    else:
+                        values["chef_id"] = values["chef_id"] or default_chef
+                        if values["chef_id"] is None:
+                            error = "chef_id required"
+                        elif values["chef_id"] not in company_chefs:
+                            error = "Chef not found"
+                if not error and values["email"] in seen:
+                    error = "Duplicate email in upload"
+
+                if error:
+                    errors.append({"row": number,
+                                   "email": raw.get("email") if raw else None,
+                                   "error": error})
+                    continue
+                seen.add(values["email"])
+                values["row"] = number
+                rows.append(values)
+        except bulk_import.BulkFormatError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Step 2: Emails already registered (one query)
+        if rows:
+            cur.execute("SELECT email FROM users WHERE email IN (SELECT value FROM json_each(?))",
+                        (json.dumps([r["email"] for r in rows]),))
+            taken = {r["email"] for r in cur.fetchall()}
+            if taken:
+                errors += [{"row": r["row"], "email": r["email"], "error": "Email already exists"}
+                           for r in rows if r["email"] in taken]
+                rows = [r for r in rows if r["email"] not in taken]
+
+        errors.sort(key=lambda e: e["row"])
+        if not rows:
+            return jsonify({"error": "No valid rows", "created": 0,
+                            "failed": len(errors), "errors": errors}), 400
+
+        # Step 3: Hand the rows to the import job
+        if not import_slot.acquire(blocking=False):
+            response = jsonify({"error": "Another import is in progress, try again later"})
+            response.headers["Retry-After"] = str(BULK_RETRY_AFTER)
+            return response, 429
+        try:
+            cur.execute("""
+                INSERT INTO import_jobs (company_id, user_id, status, rows, created_at)
+                VALUES (?, ?, 'queued', ?, ?)
+                RETURNING id
+            """, (user["company_id"], user["id"], len(rows), time.time()))
+            job_id = cur.fetchone()["id"]
+            con.commit()
+            import_executor.submit(run_bulk_import, job_id, dict(user), rows, errors)
+        except BaseException:
+            import_slot.release()
+            raise
+
+        status_url = f"/ressource/bulk/{job_id}"
+        response = jsonify({
+            "msg": "Import queued",
+            "job_id": job_id,
+            "status_url": status_url,
+            "rows": len(rows),
+            "failed": len(errors),
+            "errors": errors
+        })
+        response.headers["Location"] = status_url
+        return response, 202
+
+    finally:
+        con.close()
+
+def run_bulk_import(job_id, user, rows, errors):
+    """
+    Background part of POST /ressource/bulk
+
+    Valid rows are hashed on the hasher's bulk pool, scored with one model
+    call and inserted with executemany in a single transaction, which also
+    marks the job done; each affected chef's charge is updated once. On
+    failure nothing is inserted and the job is marked failed.
+
+    Args:
+        job_id: import_jobs row
+        user: token payload of the uploader
+        rows: validated rows (bulk_import.parse_row values)
+        errors: per-row errors found while validating, kept in the result
+    """
+    started = time.perf_counter()
+    try:
+        with app.app_context():
+            con, cur = get_db()
+            try:
+                cur.execute("UPDATE import_jobs SET status='running' WHERE id=?", (job_id,))
+                con.commit()
+
+                # New resources have no task hours yet: charge_affectee is 0
+                scores = score.ressource_scores([[r.get(field, 0) for field, _ in SCORE_FIELDS]
+                                                 for r in rows])
+                hashed = hasher.hash_many([r["password"] for r in rows])
+
+                cur.executemany("""
+                    INSERT INTO users
+                    (first_name, last_name, email, password, role, company_id)
+                    VALUES (?,?,?,?,'RESSOURCE',?)
+                """, [(r["first_name"], r["last_name"], r["email"], pw, user["company_id"])
+                      for r, pw in zip(rows, hashed)])
+
+                cur.execute("SELECT id, email FROM users WHERE email IN (SELECT value FROM json_each(?))",
+                            (json.dumps([r["email"] for r in rows]),))
+                ids = {r["email"]: r["id"] for r in cur.fetchall()}
+
+                cur.executemany("""
+                    INSERT INTO ressource_profiles (
+                        ressource_id, chef_id, niveau_experience, disponibilite_hebdo,
+                        cout_horaire, charge_affectee, competence_moyenne, score
+                    )
+                    VALUES (?,?,?,?,?,0,?,?)
+                """, [(ids[r["email"]], r["chef_id"], r["experience"], r["disponibilite_hebdo"],
+                       r["cost_hour"], r["competence_moyenne"], round(float(s)))
+                      for r, s in zip(rows, scores)])
+
+                # 🔥 Recalculate each affected chef's charge once
+                capacity = {}
+                for r in rows:
+                    hours, count = capacity.get(r["chef_id"], (0, 0))
+                    capacity[r["chef_id"]] = (hours + r["disponibilite_hebdo"], count + 1)
+
+                chef_charges = {}
+                for chef_id, (hours, count) in capacity.items():
+                    charge.add_capacity(cur, chef_id, hours, count)
+                    chef_charges[chef_id] = calculate_chef_charge(cur, chef_id)
+                cur.executemany("""
+                    UPDATE chef_profiles
+                    SET charge_affectee=?
+                    WHERE chef_id=?
+                """, [(c, chef_id) for chef_id, c in chef_charges.items()])
+                # One event for the whole import (no entity_id: refetch the list)
+                change_feed.publish_many(cur, [(user["company_id"], "ressource", None, None)] +
+                                         [(user["company_id"], "charge", chef_id, None)
+                                          for chef_id in chef_charges])
+
+                result = {
+                    "msg": "Ressources imported",
+                    "created": len(rows),
+                    "failed": len(errors),
+                    "errors": errors,
+                    "chefs": {str(chef_id): c for chef_id, c in chef_charges.items()}
+                }
+                cur.execute("""
+                    UPDATE import_jobs SET status='done', finished_at=?, result=?
+                    WHERE id=?
+                """, (time.time(), json.dumps(result), job_id))
+                con.commit()
+                response_cache.generations.mark_dirty()
+                audit_log.record_many(user, [("import", "user", ids[r["email"]],
+                                              {"role": "RESSOURCE", "chef_id": r["chef_id"]})
+                                             for r in rows])
+                print(f"📥 Bulk import {job_id}: {len(rows)} created, {len(errors)} failed "
+                      f"in {time.perf_counter() - started:.2f}s")
+
+            except Exception as e:
+                con.rollback()
+                print(f"❌ Bulk import {job_id} failed: {e}")
+                try:
+                    cur.execute("""
+                        UPDATE import_jobs SET status='failed', finished_at=?, result=?
+                        WHERE id=?
+                    """, (time.time(), json.dumps({"error": str(e), "created": 0,
+                                                   "failed": len(errors), "errors": errors}),
+                          job_id))
+                    con.commit()
+                except sqlite3.Error:
+                    con.rollback()
+            finally:
+                con.close()
+    finally:
+        import_slot.release()
+
+@app.route("/ressource/bulk/<int:job_id>", methods=["GET"])
+@verify_token
+def bulk_import_status(user, job_id):
+    """
+    Progress and outcome of a bulk import
+    
+    Allowed roles: RH (imports of the company), CHEF (their own imports)
+    
+    Returns:
+        200: status (queued, running, done or failed), rows, timestamps;
+             once finished, the result (created/failed counts, per-row
+             errors, new chef charges, or the error that failed the job)
+        403: Permission denied
+        404: Import not found
+    """
+    if user["role"] not in ("RH", "CHEF"):
+        return jsonify({"error": "Permission denied"}), 403
+
+    con, cur = get_db()
+    try:
+        cur.execute("SELECT * FROM import_jobs WHERE id=? AND company_id=?",
+                    (job_id, user["company_id"]))
+        job = cur.fetchone()
+        if not job or (user["role"] == "CHEF" and job["user_id"] != user["id"]):
+            return jsonify({"error": "Import not found"}), 404
+
+        data = {
+            "job_id": job["id"],
+            "status": job["status"],
+            "rows": job["rows"],
+            "created_at": job["created_at"],
+            "finished_at": job["finished_at"]
+        }
+        if job["result"]:
+            data.update(json.loads(job["result"]))
+        return jsonify(data), 200
+    finally:
+        con.close()
+
 # =========================
 # UPDATE USER (WITH AUTOMATIC CHARGE UPDATE)
 # =========================
@@ -581,7 +1087,8 @@ def update_user(user, user_id):
         - RH: Can update anyone
         - CHEF: Can only update their own resources
     
-    Form fields depend on user role being updated
+    Form fields depend on user role being updated. A new password
+    revokes the user's current tokens.
     
     Returns:
         200: User updated successfully
@@ -631,9 +1138,10 @@ def update_user(user, user_id):
         else:
             filename = target_user["profile_img"]
 
-        # Handle password
+        # Handle password (a new one ends the user's current sessions)
         if password:
-            hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+            hashed_pw = hasher.hash(password)
+            token_revocations.revoke(cur, user_id)
         else:
             hashed_pw = target_user["password"]
 
@@ -655,7 +1163,7 @@ def update_user(user, user_id):
         # Update resource profile
         if target_user["role"] == "RESSOURCE":
             cur.execute("""
-                SELECT chef_id FROM ressource_profiles 
+                SELECT chef_id, disponibilite_hebdo, open_task_hours FROM ressource_profiles 
                 WHERE ressource_id=?
             """, (user_id,))
             profile = cur.fetchone()
@@ -664,29 +1172,36 @@ def update_user(user, user_id):
             experience = int(request.form.get("experience", 0))
             cost_hour = float(request.form.get("cost_hour", 0))
             dispo = int(request.form.get("disponibilite_hebdo", 40))
-            charge_affectee = int(request.form.get("charge_affectee", 0))
             competence_moyenne = float(request.form.get("competence_moyenne", 50))
 
+            # charge_affectee follows from open task hours (not editable)
+            charge_affectee = tasks.charge_from_hours(
+                profile["open_task_hours"] if profile else 0, dispo)
             new_score = score.ressource_score(
                 experience, cost_hour, dispo, charge_affectee, competence_moyenne
             )
 
-            cur.execute("""
+            cur.execute(f"""
                 UPDATE ressource_profiles
                 SET niveau_experience=?, disponibilite_hebdo=?, cout_horaire=?,
-                    charge_affectee=?, competence_moyenne=?, score=?
+                    charge_affectee={tasks.RESSOURCE_CHARGE_SQL.format(dispo="?")},
+                    competence_moyenne=?, score=?
                 WHERE ressource_id=?
-            """, (experience, dispo, cost_hour, charge_affectee, 
+            """, (experience, dispo, cost_hour, dispo, dispo,
                   competence_moyenne, round(new_score), user_id))
 
+            change_feed.publish(cur, target_user["company_id"], "ressource", user_id)
+
             # 🔥 Recalculate chef's charge after updating resource
             if chef_id:
+                charge.add_capacity(cur, chef_id, dispo - profile["disponibilite_hebdo"])
                 new_charge = calculate_chef_charge(cur, chef_id)
                 cur.execute("""
                     UPDATE chef_profiles
                     SET charge_affectee=?
                     WHERE chef_id=?
                 """, (new_charge, chef_id))
+                change_feed.publish(cur, target_user["company_id"], "charge", chef_id)
 
         # Update chef profile
         elif target_user["role"] == "CHEF":
@@ -696,8 +1211,17 @@ def update_user(user, user_id):
                 SET disponibilite_hebdo=?
                 WHERE chef_id=?
             """, (dispo, user_id))
+            change_feed.publish(cur, target_user["company_id"], "chef", user_id)
+
+        # RH profile and company name (shown by /me)
+        else:
+            change_feed.publish(cur, target_user["company_id"], "user", user_id)
 
         con.commit()
+        if password:
+            token_cache.invalidate_user(user_id)
+        audit_log.record(user, "update", "user", user_id,
+                         {"fields": sorted(set(request.form) | set(request.files))})
         return jsonify({"msg": "User updated"}), 200
 
     except sqlite3.IntegrityError as e:
@@ -747,7 +1271,7 @@ def delete_user(user, user_id):
                 return jsonify({"error": "Permission denied"}), 403
             
             cur.execute("""
-                SELECT chef_id FROM ressource_profiles 
+                SELECT chef_id, disponibilite_hebdo FROM ressource_profiles 
                 WHERE ressource_id=? AND chef_id=?
             """, (user_id, user["id"]))
             profile = cur.fetchone()
@@ -762,22 +1286,35 @@ def delete_user(user, user_id):
         # Delete related profiles
         if target_user["role"] == "CHEF":
             cur.execute("DELETE FROM chef_profiles WHERE chef_id=?", (user_id,))
+            charge.forget_chef(cur, user_id)
+            change_feed.publish(cur, target_user["company_id"], "chef", user_id)
             
         elif target_user["role"] == "RESSOURCE":
-            # Get chef_id before deletion
+            # Get chef_id and capacity before deletion
             if not chef_id_to_update:
                 cur.execute("""
-                    SELECT chef_id FROM ressource_profiles 
+                    SELECT chef_id, disponibilite_hebdo FROM ressource_profiles 
                     WHERE ressource_id=?
                 """, (user_id,))
                 profile = cur.fetchone()
                 if profile:
                     chef_id_to_update = profile["chef_id"]
             
+            # Their tasks go back to the board unassigned
+            cur.execute("UPDATE tasks SET ressource_id=NULL WHERE ressource_id=?", (user_id,))
             cur.execute("DELETE FROM ressource_profiles WHERE ressource_id=?", (user_id,))
+            if chef_id_to_update:
+                charge.add_capacity(cur, chef_id_to_update, -profile["disponibilite_hebdo"], -1)
+            change_feed.publish(cur, target_user["company_id"], "ressource", user_id)
 
-        # Delete user
+        # Delete user (and their notifications: foreign keys are not
+        # enforced on pooled connections)
+        cur.execute("DELETE FROM notifications WHERE user_id=?", (user_id,))
         cur.execute("DELETE FROM users WHERE id=?", (user_id,))
+        # Whatever the role (an RH has no other event): moves the company's
+        # cached user lists to a new generation
+        change_feed.publish(cur, target_user["company_id"], "user", user_id)
+        token_revocations.revoke(cur, user_id)
 
         # 🔥 Recalculate chef's charge after deleting resource
         if chef_id_to_update:
@@ -787,8 +1324,12 @@ def delete_user(user, user_id):
                 SET charge_affectee=?
                 WHERE chef_id=?
             """, (new_charge, chef_id_to_update))
+            change_feed.publish(cur, target_user["company_id"], "charge", chef_id_to_update)
 
         con.commit()
+        token_cache.invalidate_user(user_id)
+        notifier.unread.forget(user_id)
+        audit_log.record(user, "delete", "user", user_id, {"role": target_user["role"]})
         return jsonify({"msg": "User deleted"}), 200
 
     finally:
@@ -797,93 +1338,155 @@ def delete_user(user, user_id):
 # =========================
 # DASHBOARD RESOURCES
 # =========================
+DASHBOARD_BATCH = int(os.getenv("DASHBOARD_BATCH", 500))
+
+DASHBOARD_RH_SQL = """
+    SELECT
+        c.id AS chef_id,
+        c.first_name AS chef_first_name,
+        c.last_name AS chef_last_name,
+        c.email AS chef_email,
+        c.profile_img AS chef_profile_img,
+        cp.charge_affectee AS chef_charge,
+        cp.disponibilite_hebdo AS chef_disponibilite,
+        cp.score AS chef_score,
+
+        u.id AS ressource_id,
+        u.first_name AS ressource_first_name,
+        u.last_name AS ressource_last_name,
+        u.email AS ressource_email,
+        u.profile_img AS ressource_profile_img,
+
+        rp.niveau_experience,
+        rp.disponibilite_hebdo,
+        rp.cout_horaire,
+        rp.charge_affectee,
+        rp.competence_moyenne,
+        rp.score AS ressource_score
+
+    FROM users c
+    LEFT JOIN chef_profiles cp ON cp.chef_id = c.id
+    LEFT JOIN ressource_profiles rp ON rp.chef_id = c.id
+    LEFT JOIN users u ON u.id = rp.ressource_id
+    WHERE c.role = 'CHEF' AND c.company_id = ?
+    ORDER BY c.id
+"""
+
+def dashboard_chef(r):
+    """Chef part of a DASHBOARD_RH_SQL row"""
+    return {
+        "id": r["chef_id"],
+        "first_name": r["chef_first_name"],
+        "last_name": r["chef_last_name"],
+        "email": r["chef_email"],
+        "profile_img": r["chef_profile_img"],
+        "profile_thumb": thumbnail_name(r["chef_profile_img"], DASHBOARD_THUMB_SIZE),
+        "charge_affectee": r["chef_charge"],
+        "disponibilite_hebdo": r["chef_disponibilite"],
+        "score": r["chef_score"]
+    }
+
+def dashboard_resource(r):
+    """Resource part of a DASHBOARD_RH_SQL row"""
+    return {
+        "id": r["ressource_id"],
+        "first_name": r["ressource_first_name"],
+        "last_name": r["ressource_last_name"],
+        "email": r["ressource_email"],
+        "profile_img": r["ressource_profile_img"],
+        "profile_thumb": thumbnail_name(r["ressource_profile_img"], DASHBOARD_THUMB_SIZE),
+        "niveau_experience": r["niveau_experience"],
+        "disponibilite_hebdo": r["disponibilite_hebdo"],
+        "cout_horaire": r["cout_horaire"],
+        "charge_affectee": r["charge_affectee"],
+        "competence_moyenne": r["competence_moyenne"],
+        "score": r["ressource_score"]
+    }
+
+def group_dashboard_rows(rows):
+    """Group DASHBOARD_RH_SQL rows into [{"chef": ..., "resources": [...]}]"""
+    chefs = {}
+    for r in rows:
+        chef_id = r["chef_id"]
+
+        if chef_id not in chefs:
+            chefs[chef_id] = {"chef": dashboard_chef(r), "resources": []}
+
+        if r["ressource_id"]:
+            chefs[chef_id]["resources"].append(dashboard_resource(r))
+
+    return list(chefs.values())
+
+def stream_dashboard_rows(cur):
+    """
+    Yield the same JSON as group_dashboard_rows, chef by chef
+
+    Reads the cursor in fetchmany batches (rows are ordered by chef) and
+    emits one chunk per batch, so memory stays flat whatever the size
+    of the company.
+    """
+    dumps = app.json.dumps
+    current_chef = None
+    yield "["
+    while True:
+        rows = cur.fetchmany(DASHBOARD_BATCH)
+        if not rows:
+            break
+
+        chunk = []
+        for r in rows:
+            if r["chef_id"] != current_chef:
+                if current_chef is not None:
+                    chunk.append("]},")
+                chunk.append('{"chef":' + dumps(dashboard_chef(r)) + ',"resources":[')
+                current_chef = r["chef_id"]
+                first_resource = True
+
+            if r["ressource_id"]:
+                if not first_resource:
+                    chunk.append(",")
+                chunk.append(dumps(dashboard_resource(r)))
+                first_resource = False
+        yield "".join(chunk)
+
+    if current_chef is not None:
+        yield "]}"
+    yield "]"
+
 @app.route("/dashboard/resources", methods=["GET"])
 @verify_token
+@cached_response
 def dashboard_resources(user):
     """
     Get resources dashboard
     
     For RH: Returns all chefs with their resources
+            (?stream=1 streams the JSON chef by chef)
     For CHEF: Returns only their own resources
     
     Returns:
         200: Resources data
         403: Permission denied
     """
+    if user["role"] == "RH" and request.args.get("stream") == "1":
+        # RH sees all chefs with their resources, streamed
+        @stream_with_context
+        def generate():
+            con, cur = get_db()
+            try:
+                cur.execute(DASHBOARD_RH_SQL, (user["company_id"],))
+                yield from stream_dashboard_rows(cur)
+            finally:
+                con.close()
+
+        return Response(generate(), mimetype="application/json"), 200
+
     con, cur = get_db()
     try:
         if user["role"] == "RH":
             # RH sees all chefs with their resources
-            cur.execute("""
-                SELECT
-                    c.id AS chef_id,
-                    c.first_name AS chef_first_name,
-                    c.last_name AS chef_last_name,
-                    c.email AS chef_email,
-                    c.profile_img AS chef_profile_img,
-                    cp.charge_affectee AS chef_charge,
-                    cp.disponibilite_hebdo AS chef_disponibilite,
-                    cp.score AS chef_score,
-
-                    u.id AS ressource_id,
-                    u.first_name AS ressource_first_name,
-                    u.last_name AS ressource_last_name,
-                    u.email AS ressource_email,
-                    u.profile_img AS ressource_profile_img,
-
-                    rp.niveau_experience,
-                    rp.disponibilite_hebdo,
-                    rp.cout_horaire,
-                    rp.charge_affectee,
-                    rp.competence_moyenne,
-                    rp.score AS ressource_score
-
-                FROM users c
-                LEFT JOIN chef_profiles cp ON cp.chef_id = c.id
-                LEFT JOIN ressource_profiles rp ON rp.chef_id = c.id
-                LEFT JOIN users u ON u.id = rp.ressource_id
-                WHERE c.role = 'CHEF' AND c.company_id = ?
-                ORDER BY c.id
-            """, (user["company_id"],))
-
-            rows = cur.fetchall()
-            chefs = {}
-
-            # Group resources by chef
-            for r in rows:
-                chef_id = r["chef_id"]
-
-                if chef_id not in chefs:
-                    chefs[chef_id] = {
-                        "chef": {
-                            "id": chef_id,
-                            "first_name": r["chef_first_name"],
-                            "last_name": r["chef_last_name"],
-                            "email": r["chef_email"],
-                            "profile_img": r["chef_profile_img"],
-                            "charge_affectee": r["chef_charge"],
-                            "disponibilite_hebdo": r["chef_disponibilite"],
-                            "score": r["chef_score"]
-                        },
-                        "resources": []
-                    }
-
-                if r["ressource_id"]:
-                    chefs[chef_id]["resources"].append({
-                        "id": r["ressource_id"],
-                        "first_name": r["ressource_first_name"],
-                        "last_name": r["ressource_last_name"],
-                        "email": r["ressource_email"],
-                        "profile_img": r["ressource_profile_img"],
-                        "niveau_experience": r["niveau_experience"],
-                        "disponibilite_hebdo": r["disponibilite_hebdo"],
-                        "cout_horaire": r["cout_horaire"],
-                        "charge_affectee": r["charge_affectee"],
-                        "competence_moyenne": r["competence_moyenne"],
-                        "score": r["ressource_score"]
-                    })
-
-            return jsonify(list(chefs.values())), 200
+            cur.execute(DASHBOARD_RH_SQL, (user["company_id"],))
+            return jsonify(group_dashboard_rows(cur.fetchall())), 200
 
         elif user["role"] == "CHEF":
             # Chef sees only their resources
@@ -897,7 +1500,11 @@ def dashboard_resources(user):
                 WHERE rp.chef_id = ?
             """, (user["id"],))
 
-            resources = [dict(row) for row in cur.fetchall()]
+            resources = []
+            for row in cur.fetchall():
+                resource = dict(row)
+                resource["profile_thumb"] = thumbnail_name(row["profile_img"], DASHBOARD_THUMB_SIZE)
+                resources.append(resource)
             return jsonify(resources), 200
 
         else:
@@ -952,6 +1559,10 @@ def create_project(user):
     if d2 <= d1:
         return jsonify({"error": "End date must be after start date"}), 400
 
+    # Dates the load index cannot hold (see capacity.DAY_LIMIT)
+    if charge.day_range(start_date, end_date) is None:
+        return jsonify({"error": "Invalid dates"}), 400
+
     today = datetime.now().date()
 
     con, cur = get_db()
@@ -966,109 +1577,73 @@ def create_project(user):
         if not cur.fetchone():
             return jsonify({"error": "Chef not found"}), 404
 
-        # Step 2: Get chef's team capacity
-        cur.execute("""
-            SELECT disponibilite_hebdo
-            FROM ressource_profiles
-            WHERE chef_id=?
-        """, (chef_id,))
-
-        ressources = cur.fetchall()
+        # Step 2: Get chef's team capacity and current load (O(1) aggregate)
+        stats = charge.get_stats(cur, chef_id)
         
-        if not ressources:
+        if not stats or not stats["resource_count"]:
             return jsonify({
                 "error": "Chef has no resources",
                 "suggestion": "Add resources first"
             }), 400
 
-        # Calculate weekly capacity
-        weekly_capacity = sum(r["disponibilite_hebdo"] for r in ressources)
+        weekly_capacity = stats["weekly_capacity"]
         
         if weekly_capacity == 0:
             return jsonify({"error": "Team has no capacity"}), 400
 
-        # Step 3: Get all existing active/planned projects
-        cur.execute("""
-            SELECT estimated_hours, start_date, end_date
-            FROM projects
-            WHERE chef_id=? AND status IN ('active','planned')
-        """, (chef_id,))
-        
-        existing_projects = cur.fetchall()
+        # Step 3: Determine initial project status
+        if today < d1:
+            status = "planned"
+        elif d1 <= today <= d2:
+            status = "active"
+        else:
+            status = "finished"
 
         # Step 4: Calculate FUTURE charge (if we add this project)
-        # Simulate adding the new project temporarily
-        try:
-            all_starts = [datetime.strptime(start_date, "%Y-%m-%d")]
-            all_ends = [datetime.strptime(end_date, "%Y-%m-%d")]
-            total_hours = estimated_hours
-            
-            # Add existing projects
-            for p in existing_projects:
-                start = datetime.strptime(p["start_date"], "%Y-%m-%d")
-                end = datetime.strptime(p["end_date"], "%Y-%m-%d")
-                all_starts.append(start)
-                all_ends.append(end)
-                total_hours += p["estimated_hours"]
-            
-            # Calculate overall timeline
-            earliest_start = min(all_starts)
-            latest_end = max(all_ends)
-            
-            total_days = (latest_end - earliest_start).days + 1
-            total_weeks = total_days / 7.0
-            
-            # Calculate future capacity and charge
-            future_capacity = weekly_capacity * total_weeks
-            future_charge = (total_hours / future_capacity) * 100
-            
-            print(f"""
+        # Peak weekly load with the project added, from the chef's load
+        # interval tree (see capacity.py); finished projects add no load
+        if status in charge.COUNTED_STATUSES:
+            try:
+                peak, booked, rate = charge.peak_with(cur, chef_id, estimated_hours,
+                                                      start_date, end_date)
+                future_charge = peak * 100.0 / weekly_capacity
+                project_weeks = ((d2 - d1).days + 1) / 7.0
+
+                print(f"""
             ===== PROJECT CREATION VALIDATION =====
             Chef ID: {chef_id}
             Weekly Capacity: {weekly_capacity} hours
             New Project: {estimated_hours} hours ({start_date} to {end_date})
-            Existing Projects: {len(existing_projects)}
-            Future Timeline: {earliest_start.date()} to {latest_end.date()}
-            Total Weeks: {total_weeks:.2f}
-            Future Capacity: {future_capacity:.2f} hours
-            Total Hours (if added): {total_hours}
+            Project Load: {rate:.2f} hours/week
+            Existing Projects: {stats["project_count"]}
+            Booked In Window: {booked:.2f} hours/week
+            Peak Load (if added): {peak:.2f} hours/week
             Future Charge: {future_charge:.2f}%
             =======================================
             """)
-            
-            # Validate: prevent overload
-            if future_charge > 100:
-                return jsonify({
-                    "error": "Chef will be overloaded",
-                    "current_charge": calculate_chef_charge(cur, chef_id),
-                    "future_charge": round(future_charge, 2),
-                    "available_hours": round(future_capacity - (total_hours - estimated_hours), 2),
-                    "weekly_capacity": weekly_capacity
-                }), 400
-            
-        except Exception as e:
-            print(f"❌ Validation error: {e}")
-            return jsonify({"error": f"Validation failed: {str(e)}"}), 500
 
-        # Step 5: Determine initial project status
-        if today < d1:
-            status = "planned"
-            days_remaining = (d1 - today).days
-        elif d1 <= today <= d2:
-            status = "active"
-            days_remaining = (d2 - today).days
-        else:
-            status = "finished"
-            days_remaining = 0
+                # Validate: prevent overload
+                if future_charge > 100:
+                    return jsonify({
+                        "error": "Chef will be overloaded",
+                        "current_charge": calculate_chef_charge(cur, chef_id),
+                        "future_charge": round(future_charge, 2),
+                        "available_hours": round(max(weekly_capacity - booked, 0) * project_weeks, 2),
+                        "weekly_capacity": weekly_capacity
+                    }), 400
+
+            except sqlite3.Error as e:
+                print(f"❌ Validation error: {e}")
+                return jsonify({"error": f"Validation failed: {str(e)}"}), 500
 
         duration = (d2 - d1).days
 
-        # Step 6: Create the project
+        # Step 5: Create the project
         cur.execute("""
             INSERT INTO projects
             (name, description, estimated_hours, chef_id, company_id,
-             start_date, end_date, duration_days, days_remaining, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             start_date, end_date, duration_days, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             name,
             description,
@@ -1078,13 +1653,14 @@ def create_project(user):
             start_date,
             end_date,
             duration,
-            days_remaining,
             status
         ))
 
         project_id = cur.lastrowid
 
-        # Step 7: Recalculate chef's actual charge
+        # Step 6: Recalculate chef's actual charge
+        charge.add_project(cur, chef_id, project_id, estimated_hours,
+                           start_date, end_date, status)
         new_charge = calculate_chef_charge(cur, chef_id)
 
         cur.execute("""
@@ -1092,8 +1668,14 @@ def create_project(user):
             SET charge_affectee=?
             WHERE chef_id=?
         """, (new_charge, chef_id))
+        change_feed.publish_many(cur, [(user["company_id"], "project", project_id, None),
+                                       (user["company_id"], "charge", chef_id, None)])
 
         con.commit()
+        audit_log.record(user, "create", "project", project_id,
+                         {"name": name, "chef_id": chef_id, "status": status})
+        notifier.notify(chef_id, "project_created", f"New project: {name}",
+                        f"Project #{project_id} starts on {start_date}")
 
         return jsonify({
             "msg": "Project created successfully",
@@ -1113,8 +1695,42 @@ def create_project(user):
 # =========================
 # GET ALL PROJECTS
 # =========================
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 500))
+
+# Sort rank of a status; must match the expression indexed in BD.create_db
+STATUS_RANK_SQL = """CASE p.status
+                        WHEN 'active' THEN 1
+                        WHEN 'planned' THEN 2
+                        WHEN 'finished' THEN 3
+                    END"""
+
+PROJECT_COLUMNS = [
+    "id", "name", "description", "difficulty", "estimated_hours",
+    "start_date", "end_date", "duration_days", "days_remaining", "status",
+    "company_id", "chef_id", "created_at"
+]
+
+def project_column_sql(name):
+    """SQL for a project column; days_remaining is derived from the dates"""
+    if name == "days_remaining":
+        return f"{jobs.DAYS_REMAINING_SQL} AS days_remaining"
+    return f"p.{name}"
+
+PROJECT_SELECT_SQL = ", ".join(project_column_sql(c) for c in PROJECT_COLUMNS)
+
+# Extra columns returned to RH (joined from the chef's user row)
+CHEF_COLUMNS = {
+    "chef_first_name": "u.first_name",
+    "chef_last_name": "u.last_name",
+    "chef_profile_img": "u.profile_img"
+}
+
+# Project list cursor: (status rank, start_date, id)
+PROJECT_CURSOR = (int, str, int)
+
 @app.route("/projects", methods=["GET"])
 @verify_token
+@cached_response
 def get_projects(user):
     """
     Get all projects
@@ -1122,62 +1738,118 @@ def get_projects(user):
     For RH: Returns all company projects
     For CHEF: Returns only their assigned projects
     
+    Query params (all optional):
+        - limit: Page size (max MAX_PAGE_SIZE); without it every project is returned
+        - cursor: next_cursor of the previous page
+        - fields: Comma-separated list of columns to return
+    
+    Projects are ordered by status (active, planned, finished), then
+    start_date DESC, then id DESC; pages use keyset pagination on that key.
+    
     Returns:
-        200: Projects list with statistics
+        200: Projects page with statistics and next_cursor
+        400: Invalid limit, cursor or fields
         403: Permission denied
     """
-    con, cur = get_db()
+    if user["role"] == "RH":
+        scope, scope_arg = "p.company_id=?", user["company_id"]
+        join = "JOIN users u ON u.id = p.chef_id"
+        extra_columns = CHEF_COLUMNS
+    elif user["role"] == "CHEF":
+        scope, scope_arg = "p.chef_id=?", user["id"]
+        join = ""
+        extra_columns = {}
+    else:
+        return jsonify({"error": "Permission denied"}), 403
+
+    # Parse pagination parameters
+    limit = request.args.get("limit")
+    cursor = request.args.get("cursor")
     try:
-        if user["role"] == "RH":
-            # RH sees all company projects
-            cur.execute("""
-                SELECT 
-                    p.*,
-                    u.first_name AS chef_first_name,
-                    u.last_name AS chef_last_name,
-                    u.profile_img AS chef_profile_img
-                FROM projects p
-                JOIN users u ON u.id = p.chef_id
-                WHERE p.company_id=?
-                ORDER BY 
-                    CASE p.status
-                        WHEN 'active' THEN 1
-                        WHEN 'planned' THEN 2
-                        WHEN 'finished' THEN 3
-                    END,
-                    p.start_date DESC
-            """, (user["company_id"],))
+        limit = min(int(limit), MAX_PAGE_SIZE) if limit else None
+        after = cursors.decode(cursor, PROJECT_CURSOR) if cursor else None
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    if limit is not None and limit <= 0:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    # Field projection
+    fields = request.args.get("fields")
+    if fields:
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in PROJECT_COLUMNS and f not in extra_columns]
+        if unknown:
+            return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+        columns = [f"{extra_columns[f]} AS {f}" if f in extra_columns else project_column_sql(f)
+                   for f in fields]
+    else:
+        columns = [PROJECT_SELECT_SQL] + [f"{sql} AS {name}" for name, sql in extra_columns.items()]
+
+    sql = f"""
+        SELECT {", ".join(columns)},
+               {STATUS_RANK_SQL} AS _rank, p.start_date AS _start_date, p.id AS _id
+        FROM projects p
+        {join}
+        WHERE {scope}
+    """
+    args = [scope_arg]
+
+    if after:
+        # The >= bound is redundant but lets SQLite seek the order index
+        # to the cursor instead of walking every earlier row
+        sql += f"""
+          AND {STATUS_RANK_SQL} >= ?
+          AND ({STATUS_RANK_SQL} > ?
+               OR ({STATUS_RANK_SQL} = ? AND (p.start_date < ?
+                   OR (p.start_date = ? AND p.id < ?))))
+        """
+        rank, start_date, project_id = after
+        args += [rank, rank, rank, start_date, start_date, project_id]
+
+    sql += f"""
+        ORDER BY {STATUS_RANK_SQL}, p.start_date DESC, p.id DESC
+    """
+    if limit:
+        sql += " LIMIT ?"
+        args.append(limit + 1)
 
-        elif user["role"] == "CHEF":
-            # Chef sees only their projects
-            cur.execute("""
-                SELECT * FROM projects
-                WHERE chef_id=?
-                ORDER BY 
-                    CASE status
-                        WHEN 'active' THEN 1
-                        WHEN 'planned' THEN 2
-                        WHEN 'finished' THEN 3
-                    END,
-                    start_date DESC
-            """, (user["id"],))
+    con, cur = get_db()
+    try:
+        cur.execute(sql, args)
+        rows = cur.fetchall()
+
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = cursors.encode(last["_rank"], last["_start_date"], last["_id"])
+
+        projects = []
+        for row in rows:
+            project = dict(row)
+            del project["_rank"], project["_start_date"], project["_id"]
+            projects.append(project)
+
+        # Statistics over the whole scope (not just this page)
+        cur.execute(f"""
+            SELECT p.status, COUNT(*) AS count
+            FROM projects p
+            WHERE {scope}
+            GROUP BY p.status
+        """, (scope_arg,))
+        counts = {row["status"]: row["count"] for row in cur.fetchall()}
 
-        else:
-            return jsonify({"error": "Permission denied"}), 403
-
-        projects = [dict(row) for row in cur.fetchall()]
-        
-        # Calculate statistics
         stats = {
-            "total": len(projects),
-            "active": sum(1 for p in projects if p["status"] == "active"),
-            "planned": sum(1 for p in projects if p["status"] == "planned"),
-            "finished": sum(1 for p in projects if p["status"] == "finished")
+            "total": sum(counts.values()),
+            "active": counts.get("active", 0),
+            "planned": counts.get("planned", 0),
+            "finished": counts.get("finished", 0)
         }
 
         return jsonify({
             "stats": stats,
-            "projects": projects
+            "projects": projects,
+            "next_cursor": next_cursor
         }), 200
 
     finally:
@@ -1188,6 +1860,7 @@ def get_projects(user):
 # =========================
 @app.route("/project/<int:project_id>", methods=["GET"])
 @verify_token
+@cached_response
 def get_project(user, project_id):
     """
     Get single project details
@@ -1199,9 +1872,9 @@ def get_project(user, project_id):
     """
     con, cur = get_db()
     try:
-        cur.execute("""
+        cur.execute(f"""
             SELECT 
-                p.*,
+                {PROJECT_SELECT_SQL},
                 u.first_name AS chef_first_name,
                 u.last_name AS chef_last_name,
                 u.email AS chef_email,
@@ -1271,38 +1944,34 @@ def update_project(user, project_id):
             return jsonify({"error": "Invalid estimated_hours"}), 400
 
         # Calculate new duration
-        d1 = datetime.strptime(start_date, "%Y-%m-%d")
-        d2 = datetime.strptime(end_date, "%Y-%m-%d")
+        try:
+            d1 = datetime.strptime(start_date, "%Y-%m-%d")
+            d2 = datetime.strptime(end_date, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid date format"}), 400
         duration = (d2 - d1).days
 
         if duration < 0:
             return jsonify({"error": "End date must be after start date"}), 400
 
-        # Verify workload if hours changed
-        if estimated_hours != project["estimated_hours"]:
-            chef_id = project["chef_id"]
-
-            cur.execute("""
-                SELECT disponibilite_hebdo
-                FROM ressource_profiles
-                WHERE chef_id=?
-            """, (chef_id,))
-            ressources = cur.fetchall()
-
-            total_capacity = sum(r["disponibilite_hebdo"] * 4 for r in ressources)
+        # Dates the load index cannot hold (see capacity.DAY_LIMIT)
+        if charge.day_range(start_date, end_date) is None:
+            return jsonify({"error": "Invalid dates"}), 400
 
-            if total_capacity > 0:
-                # Calculate hours from other active projects
-                cur.execute("""
-                    SELECT estimated_hours
-                    FROM projects
-                    WHERE chef_id=? AND status='active' AND id!=?
-                """, (chef_id, project_id))
-                
-                other_projects = cur.fetchall()
-                total_other = sum(p["estimated_hours"] for p in other_projects)
+        # Verify workload if the project's load changes (same peak-load
+        # model as create_project and calculate_chef_charge)
+        load_changed = (estimated_hours, start_date, end_date, status) != (
+            project["estimated_hours"], project["start_date"], project["end_date"],
+            project["status"])
+        if load_changed and status in charge.COUNTED_STATUSES:
+            chef_id = project["chef_id"]
+            stats = charge.get_stats(cur, chef_id)
+            weekly_capacity = stats["weekly_capacity"] if stats else 0
 
-                future_charge = ((total_other + estimated_hours) / total_capacity) * 100
+            if weekly_capacity > 0:
+                peak, _, _ = charge.peak_with(cur, chef_id, estimated_hours,
+                                              start_date, end_date, without=project_id)
+                future_charge = peak * 100.0 / weekly_capacity
 
                 if future_charge > 100:
                     return jsonify({
@@ -1320,14 +1989,22 @@ def update_project(user, project_id):
               duration, status, project_id))
 
         # 🔥 Recalculate chef's charge
+        charge.remove_project(cur, project["chef_id"], project_id, project["estimated_hours"],
+                              project["start_date"], project["end_date"], project["status"])
+        charge.add_project(cur, project["chef_id"], project_id, estimated_hours,
+                           start_date, end_date, status)
         new_charge = calculate_chef_charge(cur, project["chef_id"])
         cur.execute("""
             UPDATE chef_profiles
             SET charge_affectee=?
             WHERE chef_id=?
         """, (new_charge, project["chef_id"]))
+        change_feed.publish_many(cur, [(user["company_id"], "project", project_id, None),
+                                       (user["company_id"], "charge", project["chef_id"], None)])
 
         con.commit()
+        audit_log.record(user, "update", "project", project_id,
+                         {"fields": sorted(request.form), "status": status})
 
         return jsonify({
             "msg": "Project updated",
@@ -1360,7 +2037,8 @@ def delete_project(user, project_id):
     try:
         # Get project
         cur.execute("""
-            SELECT chef_id FROM projects 
+            SELECT chef_id, estimated_hours, start_date, end_date, status
+            FROM projects 
             WHERE id=? AND company_id=?
         """, (project_id, user["company_id"]))
 
@@ -1370,18 +2048,24 @@ def delete_project(user, project_id):
 
         chef_id = project["chef_id"]
 
-        # Delete project
+        # Delete project and its tasks (task triggers release resource hours)
+        cur.execute("DELETE FROM tasks WHERE project_id=?", (project_id,))
         cur.execute("DELETE FROM projects WHERE id=?", (project_id,))
 
         # 🔥 Recalculate chef's charge after deletion
+        charge.remove_project(cur, chef_id, project_id, project["estimated_hours"],
+                              project["start_date"], project["end_date"], project["status"])
         new_charge = calculate_chef_charge(cur, chef_id)
         cur.execute("""
             UPDATE chef_profiles
             SET charge_affectee=?
             WHERE chef_id=?
         """, (new_charge, chef_id))
+        change_feed.publish_many(cur, [(user["company_id"], "project", project_id, None),
+                                       (user["company_id"], "charge", chef_id, None)])
 
         con.commit()
+        audit_log.record(user, "delete", "project", project_id, {"chef_id": chef_id})
 
         return jsonify({
             "msg": "Project deleted",
@@ -1391,11 +2075,602 @@ def delete_project(user, project_id):
     finally:
         con.close()
 
+# =========================
+# TASKS (KANBAN BOARD)
+# =========================
+def get_task_project(cur, user, project_id, manage=True):
+    """
+    Load a project for a task operation and check the caller's rights
+
+    RH: any project of the company. CHEF: own projects. RESSOURCE: read
+    access to the projects of their chef (manage=False only).
+
+    Returns:
+        tuple: (project row, None) or (None, error response)
+    """
+    cur.execute("""
+        SELECT id, name, chef_id FROM projects WHERE id=? AND company_id=?
+    """, (project_id, user["company_id"]))
+    project = cur.fetchone()
+    if not project:
+        return None, (jsonify({"error": "Project not found"}), 404)
+
+    if user["role"] == "CHEF" and project["chef_id"] == user["id"]:
+        return project, None
+    if user["role"] == "RH":
+        return project, None
+    if user["role"] == "RESSOURCE" and not manage:
+        cur.execute("SELECT chef_id FROM ressource_profiles WHERE ressource_id=?", (user["id"],))
+        profile = cur.fetchone()
+        if profile and profile["chef_id"] == project["chef_id"]:
+            return project, None
+    return None, (jsonify({"error": "Permission denied"}), 403)
+
+def check_task_ressource(cur, project, ressource_id):
+    """A task can only go to a resource of the project's chef"""
+    cur.execute("""
+        SELECT 1 FROM ressource_profiles WHERE ressource_id=? AND chef_id=?
+    """, (ressource_id, project["chef_id"]))
+    return cur.fetchone() is not None
+
+def publish_task_change(cur, user, project_id, *ressource_ids):
+    """Change events for a board and the assignees whose charge moved"""
+    change_feed.publish_many(cur, [(user["company_id"], "task", project_id, None)] +
+                             [(user["company_id"], "ressource", r, None)
+                              for r in ressource_ids if r is not None])
+
+def parse_task_date(value):
+    """Optional YYYY-MM-DD form value; raises ValueError when malformed"""
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+
+@app.route("/task/create", methods=["POST"])
+@verify_token
+def create_task(user):
+    """
+    Create a task on a project board
+    
+    Allowed roles: RH, CHEF (own projects)
+    
+    Form fields:
+        - project_id, title: Required
+        - description, start_date, end_date: Optional
+        - priority: low, medium (default), high, urgent
+        - status: todo (default), in_progress, review, done
+        - estimated_hours: Hours of work (default 0)
+        - ressource_id: Optional assignee (a resource of the project's chef)
+    
+    The assignee's charge_affectee follows from their open task hours
+    (maintained by triggers, see BD.create_db).
+    
+    Returns:
+        201: Task created
+        400: Missing or invalid data
+        403: Permission denied
+        404: Project not found
+    """
+    title = request.form.get("title")
+    project_id = request.form.get("project_id")
+    description = request.form.get("description", "")
+    priority = request.form.get("priority", "medium")
+    status = request.form.get("status", "todo")
+    ressource_id = request.form.get("ressource_id")
+
+    if not title or not project_id:
+        return jsonify({"error": "Missing data"}), 400
+    if priority not in tasks.TASK_PRIORITIES or status not in tasks.TASK_STATUSES:
+        return jsonify({"error": "Invalid priority or status"}), 400
+
+    try:
+        project_id = int(project_id)
+        ressource_id = int(ressource_id) if ressource_id else None
+        estimated_hours = float(request.form.get("estimated_hours", 0))
+        start_date = parse_task_date(request.form.get("start_date"))
+        end_date = parse_task_date(request.form.get("end_date"))
+    except ValueError:
+        return jsonify({"error": "Invalid data types"}), 400
+    # nan/inf would reach the open_task_hours triggers
+    if not math.isfinite(estimated_hours) or estimated_hours < 0:
+        return jsonify({"error": "estimated_hours must be positive"}), 400
+
+    con, cur = get_db()
+    try:
+        project, error = get_task_project(cur, user, project_id)
+        if error:
+            return error
+
+        if ressource_id is not None and not check_task_ressource(cur, project, ressource_id):
+            return jsonify({"error": "Ressource not found in the chef's team"}), 404
+
+        cur.execute("""
+            INSERT INTO tasks
+            (project_id, ressource_id, title, description, priority, status,
+             estimated_hours, start_date, end_date, completed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?,
+                    CASE WHEN ? = 'done' THEN datetime('now') END)
+        """, (project_id, ressource_id, title, description, priority, status,
+              estimated_hours, start_date, end_date, status))
+        task_id = cur.lastrowid
+        publish_task_change(cur, user, project_id, ressource_id)
+
+        con.commit()
+        audit_log.record(user, "create", "task", task_id,
+                         {"project_id": project_id, "ressource_id": ressource_id})
+        if ressource_id is not None:
+            notifier.notify(ressource_id, "task_assigned", f"New task: {title}",
+                            f"Task #{task_id} on project {project['name']}")
+
+        return jsonify({
+            "msg": "Task created",
+            "task_id": task_id,
+            "ressource_charge": tasks.ressource_charge(cur, ressource_id) if ressource_id else None
+        }), 201
+
+    finally:
+        con.close()
+
+@app.route("/task/assign/<int:task_id>", methods=["PUT"])
+@verify_token
+def assign_task(user, task_id):
+    """
+    Assign a task to a resource (empty ressource_id unassigns it)
+    
+    Allowed roles: RH, CHEF (own projects)
+    
+    Returns:
+        200: Task assigned, charges of the old and new assignee
+        400: Invalid ressource_id
+        403: Permission denied
+        404: Task or resource not found
+    """
+    ressource_id = request.form.get("ressource_id")
+    try:
+        ressource_id = int(ressource_id) if ressource_id else None
+    except ValueError:
+        return jsonify({"error": "Invalid ressource_id"}), 400
+
+    con, cur = get_db()
+    try:
+        cur.execute("SELECT project_id, ressource_id, title FROM tasks WHERE id=?", (task_id,))
+        task = cur.fetchone()
+        if not task:
+            return jsonify({"error": "Task not found"}), 404
+
+        project, error = get_task_project(cur, user, task["project_id"])
+        if error:
+            return error
+
+        if ressource_id is not None and not check_task_ressource(cur, project, ressource_id):
+            return jsonify({"error": "Ressource not found in the chef's team"}), 404
+
+        cur.execute("UPDATE tasks SET ressource_id=? WHERE id=?", (ressource_id, task_id))
+        publish_task_change(cur, user, task["project_id"], task["ressource_id"], ressource_id)
+        con.commit()
+        audit_log.record(user, "assign", "task", task_id,
+                         {"from": task["ressource_id"], "to": ressource_id})
+        if ressource_id is not None and ressource_id != task["ressource_id"]:
+            notifier.notify(ressource_id, "task_assigned", f"New task: {task['title']}",
+                            f"Task #{task_id} on project {project['name']}")
+
+        charges = {str(r): tasks.ressource_charge(cur, r)
+                   for r in {task["ressource_id"], ressource_id} if r is not None}
+
+        return jsonify({
+            "msg": "Task assigned",
+            "ressource_id": ressource_id,
+            "ressource_charges": charges
+        }), 200
+
+    finally:
+        con.close()
+
+@app.route("/task/move/<int:task_id>", methods=["PUT"])
+@verify_token
+def move_task(user, task_id):
+    """
+    Move a task to another board column (and optionally change priority)
+    
+    Allowed roles: RH, CHEF (own projects), RESSOURCE (own tasks)
+    
+    Form fields:
+        - status: todo, in_progress, review, done
+        - priority: Optional new priority
+        - actual_hours: Optional hours spent
+    
+    Returns:
+        200: Task moved
+        400: Invalid status or priority
+        403: Permission denied
+        404: Task not found
+    """
+    status = request.form.get("status")
+    priority = request.form.get("priority")
+    actual_hours = request.form.get("actual_hours")
+
+    if status not in tasks.TASK_STATUSES:
+        return jsonify({"error": "Invalid status"}), 400
+    if priority is not None and priority not in tasks.TASK_PRIORITIES:
+        return jsonify({"error": "Invalid priority"}), 400
+    try:
+        actual_hours = float(actual_hours) if actual_hours else None
+    except ValueError:
+        return jsonify({"error": "Invalid actual_hours"}), 400
+    if actual_hours is not None and (not math.isfinite(actual_hours) or actual_hours < 0):
+        return jsonify({"error": "Invalid actual_hours"}), 400
+
+    con, cur = get_db()
+    try:
+        cur.execute("SELECT project_id, ressource_id FROM tasks WHERE id=?", (task_id,))
+        task = cur.fetchone()
+        if not task:
+            return jsonify({"error": "Task not found"}), 404
+
+        if not (user["role"] == "RESSOURCE" and task["ressource_id"] == user["id"]):
+            _, error = get_task_project(cur, user, task["project_id"])
+            if error:
+                return error
+
+        cur.execute("""
+            UPDATE tasks
+            SET status = ?,
+                priority = COALESCE(?, priority),
+                actual_hours = COALESCE(?, actual_hours),
+                completed_at = CASE
+                    WHEN ? != 'done' THEN NULL
+                    ELSE COALESCE(completed_at, datetime('now'))
+                END
+            WHERE id=?
+        """, (status, priority, actual_hours, status, task_id))
+        publish_task_change(cur, user, task["project_id"], task["ressource_id"])
+        con.commit()
+        audit_log.record(user, "move", "task", task_id, {"status": status})
+
+        return jsonify({
+            "msg": "Task moved",
+            "status": status,
+            "ressource_charge": tasks.ressource_charge(cur, task["ressource_id"])
+                                if task["ressource_id"] else None
+        }), 200
+
+    finally:
+        con.close()
+
+@app.route("/task/delete/<int:task_id>", methods=["DELETE"])
+@verify_token
+def delete_task(user, task_id):
+    """
+    Delete a task
+    
+    Allowed roles: RH, CHEF (own projects)
+    
+    Returns:
+        200: Task deleted
+        403: Permission denied
+        404: Task not found
+    """
+    con, cur = get_db()
+    try:
+        cur.execute("SELECT project_id, ressource_id FROM tasks WHERE id=?", (task_id,))
+        task = cur.fetchone()
+        if not task:
+            return jsonify({"error": "Task not found"}), 404
+
+        _, error = get_task_project(cur, user, task["project_id"])
+        if error:
+            return error
+
+        cur.execute("DELETE FROM tasks WHERE id=?", (task_id,))
+        publish_task_change(cur, user, task["project_id"], task["ressource_id"])
+        con.commit()
+        audit_log.record(user, "delete", "task", task_id, {"project_id": task["project_id"]})
+
+        return jsonify({"msg": "Task deleted"}), 200
+
+    finally:
+        con.close()
+
+@app.route("/project/<int:project_id>/board", methods=["GET"])
+@verify_token
+def get_board(user, project_id):
+    """
+    Kanban board of a project
+    
+    Allowed roles: RH, CHEF (own projects), RESSOURCE (their chef's projects)
+    
+    Query params (all optional):
+        - status: Only this column (use with cursor to page through it)
+        - limit: Tasks per column (default 50, max 500)
+        - cursor: next_cursor of the previous page of that column
+    
+    Each column is ordered by priority (urgent first), then creation
+    order, and is read with a range scan of idx_tasks_board.
+    
+    Returns:
+        200: Columns with total counts, tasks and next_cursor
+        400: Invalid status, limit or cursor
+        403: Permission denied
+        404: Project not found
+    """
+    status = request.args.get("status")
+    cursor = request.args.get("cursor")
+    try:
+        limit = int(request.args.get("limit", tasks.DEFAULT_BOARD_LIMIT))
+        after = cursors.decode(cursor, tasks.TASK_CURSOR) if cursor else None
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    if limit <= 0:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    limit = min(limit, tasks.MAX_BOARD_LIMIT)
+
+    if status is not None and status not in tasks.TASK_STATUSES:
+        return jsonify({"error": "Invalid status"}), 400
+    if after and status is None:
+        return jsonify({"error": "cursor requires status"}), 400
+
+    con, cur = get_db()
+    try:
+        _, error = get_task_project(cur, user, project_id, manage=False)
+        if error:
+            return error
+
+        counts = tasks.column_counts(cur, project_id)
+        columns = {}
+        for column in ([status] if status else tasks.TASK_STATUSES):
+            page, next_cursor = tasks.column_page(cur, project_id, column, limit, after)
+            columns[column] = {
+                "count": counts[column],
+                "tasks": page,
+                "next_cursor": next_cursor
+            }
+
+        return jsonify({
+            "project_id": project_id,
+            "columns": columns
+        }), 200
+
+    finally:
+        con.close()
+
+# =========================
+# NOTIFICATIONS
+# =========================
+@app.route("/notifications", methods=["GET"])
+@verify_token
+def get_notifications(user):
+    """
+    Current user's notifications, newest first
+
+    Query params (all optional):
+        - unread: 1 to list unread notifications only
+        - limit: Page size (default 20, max 100)
+        - cursor: next_cursor of the previous page
+
+    Notifications are written in batches by a background writer, so an
+    event shows up here within NOTIFY_FLUSH_INTERVAL seconds.
+
+    Returns:
+        200: unread_count, notifications and next_cursor
+        400: Invalid limit or cursor
+    """
+    cursor = request.args.get("cursor")
+    unread_only = request.args.get("unread") in ("1", "true")
+    try:
+        limit = int(request.args.get("limit", notifications.DEFAULT_PAGE_LIMIT))
+        after = cursors.decode(cursor, notifications.NOTIFICATION_CURSOR) if cursor else None
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    if limit <= 0:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    limit = min(limit, notifications.MAX_PAGE_LIMIT)
+
+    con, cur = get_db()
+    try:
+        page, next_cursor = notifier.page(cur, user["id"], limit, after, unread_only)
+        return jsonify({
+            "unread_count": notifier.unread_count(cur, user["id"]),
+            "notifications": page,
+            "next_cursor": next_cursor
+        }), 200
+
+    finally:
+        con.close()
+
+@app.route("/notifications/unread_count", methods=["GET"])
+@verify_token
+def get_unread_count(user):
+    """
+    Unread badge of the current user, served from a short-lived
+    per-process cache
+
+    Returns:
+        200: unread_count
+    """
+    con, cur = get_db()
+    try:
+        return jsonify({"unread_count": notifier.unread_count(cur, user["id"])}), 200
+    finally:
+        con.close()
+
+@app.route("/notifications/read", methods=["PUT"])
+@verify_token
+def mark_notifications_read(user):
+    """
+    Mark notifications of the current user as read
+
+    Form fields:
+        - ids: Comma-separated notification ids; omit to mark all as read
+
+    Returns:
+        200: Number of notifications marked and the new unread_count
+        400: Invalid ids
+    """
+    ids = request.form.get("ids")
+    try:
+        ids = [int(i) for i in ids.split(",") if i.strip()] if ids else None
+    except ValueError:
+        return jsonify({"error": "Invalid ids"}), 400
+
+    con, cur = get_db()
+    try:
+        updated = notifier.mark_read(cur, user["id"], ids)
+        con.commit()
+        return jsonify({
+            "msg": "Notifications marked as read",
+            "updated": updated,
+            "unread_count": notifier.unread_count(cur, user["id"])
+        }), 200
+
+    except Exception as e:
+        con.rollback()
+        notifier.unread.forget(user["id"])
+        print(f"❌ Error marking notifications: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    finally:
+        con.close()
+
+# =========================
+# CHANGE EVENTS (LONG-POLL)
+# =========================
+@app.route("/events", methods=["GET"])
+@verify_token
+def get_events(user):
+    """
+    Long-poll for changes in the caller's company
+
+    Instead of re-running /projects, /dashboard/resources or /statistics
+    on a timer, clients wait here and refetch only what an event names.
+
+    Query params:
+        - cursor: cursor of the previous response; omit it on the first
+          call to get the current position
+        - timeout: Seconds to wait for an event (default and max
+          EVENTS_MAX_WAIT, 0 answers immediately)
+
+    Event kinds (entity_id): project (project id), charge (chef id),
+    chef (chef id), ressource (ressource id, none after a bulk import),
+    task (project id of the board), notification (caller only).
+
+    A waiting request holds a server thread but no database connection.
+    At most EVENTS_MAX_WAITERS requests wait per process; the others get
+    an immediate answer with a Retry-After header.
+
+    Returns:
+        200: events, cursor for the next call, reset (true when events
+             were pruned: refetch everything)
+        400: Invalid cursor or timeout
+    """
+    cursor = request.args.get("cursor")
+    try:
+        since = int(cursor) if cursor else None
+        timeout = float(request.args.get("timeout", change_feed.MAX_WAIT))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or timeout"}), 400
+    if timeout < 0:
+        return jsonify({"error": "Invalid cursor or timeout"}), 400
+    timeout = min(timeout, change_feed.MAX_WAIT)
+
+    def poll(after):
+        con = db_pool.acquire()
+        try:
+            cur = con.cursor()
+            if after is None:
+                last_id, _ = change_feed.head(cur)
+                return {"events": [], "cursor": last_id, "reset": False}
+            return change_feed.fetch(cur, user["company_id"], user["id"], after)
+        finally:
+            con.close()
+
+    result = poll(since)
+    if result["events"] or result["reset"] or since is None or timeout == 0:
+        return jsonify(result), 200
+
+    if not change_broker.enter():
+        response = jsonify(result)
+        response.headers["Retry-After"] = str(max(int(change_feed.POLL_INTERVAL * 4), 1))
+        return response, 200
+
+    deadline = time.monotonic() + timeout
+    try:
+        while not result["events"] and not result["reset"]:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if change_broker.wait(user["company_id"], result["cursor"], remaining):
+                result = poll(result["cursor"])
+    finally:
+        change_broker.leave()
+
+    return jsonify(result), 200
+
+# =========================
+# ACTIVITY LOG
+# =========================
+@app.route("/activity", methods=["GET"])
+@verify_token
+def get_activity(user):
+    """
+    Audit trail of the company, newest first
+
+    Required role: RH
+
+    Query params (all optional):
+        - entity_type: task, project, user or comment
+        - entity_id: With entity_type, the history of one row
+        - user_id: Only actions made by this user
+        - limit: Page size (default 50, max 500)
+        - cursor: next_cursor of the previous page
+
+    Entries are written in batches by a background writer, so an action
+    shows up here within ACTIVITY_FLUSH_INTERVAL seconds.
+
+    Returns:
+        200: Entries and next_cursor
+        400: Invalid filter, limit or cursor
+        403: Permission denied
+    """
+    if user["role"] != "RH":
+        return jsonify({"error": "Permission denied"}), 403
+
+    entity_type = request.args.get("entity_type")
+    entity_id = request.args.get("entity_id")
+    user_id = request.args.get("user_id")
+    cursor = request.args.get("cursor")
+    try:
+        entity_id = int(entity_id) if entity_id is not None else None
+        user_id = int(user_id) if user_id is not None else None
+        limit = int(request.args.get("limit", activity.DEFAULT_PAGE_LIMIT))
+        after = cursors.decode(cursor, activity.ACTIVITY_CURSOR) if cursor else None
+    except ValueError:
+        return jsonify({"error": "Invalid filter, limit or cursor"}), 400
+    if limit <= 0:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    limit = min(limit, activity.MAX_PAGE_LIMIT)
+
+    if entity_type is not None and entity_type not in activity.ENTITY_TYPES:
+        return jsonify({"error": "Invalid entity_type"}), 400
+    if entity_id is not None and entity_type is None:
+        return jsonify({"error": "entity_id requires entity_type"}), 400
+
+    con, cur = get_db()
+    try:
+        entries, next_cursor = activity.page(cur, user["company_id"], limit, after,
+                                             entity_type, entity_id, user_id)
+        return jsonify({
+            "activity": entries,
+            "next_cursor": next_cursor
+        }), 200
+
+    finally:
+        con.close()
+
 # =========================
 # GET USER PROFILE
 # =========================
 @app.route("/me", methods=["GET"])
 @verify_token
+@cached_response
 def get_my_profile(user):
     """
     Get current user's profile information
@@ -1453,15 +2728,23 @@ def get_my_profile(user):
 @app.route("/images/<filename>")
 def get_image(filename):
     """
-    Serve uploaded profile images
+    Serve uploaded profile images and their thumbnails
+    
+    Cache-aware: strong ETag + 304, immutable caching for content-addressed
+    names, Range support, in-memory LRU for small files (see images.py).
+    A thumbnail that is still being generated falls back to the original.
     
     Args:
         filename: Image filename
     
     Returns:
-        Image file
+        200/206/304: Image file
+        404: Image not found
     """
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    response = image_store.response(filename)
+    if response is None:
+        return jsonify({"error": "Image not found"}), 404
+    return response
 
 # =========================
 # HEALTH CHECK
@@ -1472,11 +2755,154 @@ def health_check():
     API health check endpoint
     
     Returns:
-        200: API is healthy with current timestamp
+        200: API is healthy with current timestamp, connection pool
+             counters, scoring model status, password hasher, token
+             cache, image cache and load index counters, scheduler leadership,
+             notification writer, change broker, activity writer
+             and response cache counters
     """
     return jsonify({
         "status": "healthy",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "db_pool": db_pool.stats(),
+        "model": score.registry.status(),
+        "password_hasher": hasher.stats(),
+        "token_cache": token_cache.stats(),
+        "token_revocations": token_revocations.stats(),
+        "image_cache": image_store.memory.stats(),
+        "load_index": charge.load_index.stats(),
+        "scheduler": scheduler_lease.status(),
+        "notifications": notifier.stats(),
+        "events": change_broker.stats(),
+        "activity": audit_log.stats(),
+        "response_cache": response_cache.stats()
+    }), 200
+
+# =========================
+# MODEL HOT-SWAP
+# =========================
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def is_admin_request():
+    """X-Admin-Token matches ADMIN_TOKEN (constant-time comparison)"""
+    token = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+@app.route("/model/reload", methods=["POST"])
+def reload_model():
+    """
+    Load a new scoring model version without restarting
+    
+    Requires the X-Admin-Token header to match the ADMIN_TOKEN env var
+    (the route is disabled when ADMIN_TOKEN is not set).
+    
+    Form fields:
+        - model_dir: Optional directory holding the new .pkl files; must
+          be MODEL_DIR or inside it (pickles can run code when loaded)
+        - version: Optional version label
+    
+    Returns:
+        200: New model version is live
+        400: model_dir outside MODEL_DIR
+        403: Invalid admin token
+        404: Route disabled
+        500: Loading failed (previous model keeps serving)
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Endpoint not found"}), 404
+    if not is_admin_request():
+        return jsonify({"error": "Permission denied"}), 403
+
+    model_dir = request.form.get("model_dir")
+    if model_dir:
+        try:
+            model_dir = score.registry.resolve_dir(model_dir)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    try:
+        version = score.registry.swap(model_dir, request.form.get("version"))
+    except Exception as e:
+        return jsonify({"error": f"Model reload failed: {str(e)}"}), 500
+
+    return jsonify({"msg": "Model reloaded", "model": score.registry.status(),
+                    "version": version}), 200
+
+# =========================
+# METRICS (PROMETHEUS)
+# =========================
+metrics.registry.add(metrics.Gauge(
+    "process_info", "Worker answering this scrape", ("pid",),
+    lambda: {(os.getpid(),): 1}))
+metrics.registry.add(metrics.Gauge(
+    "db_pool_connections", "Pooled SQLite connections by state", ("state",),
+    lambda: {("in_use",): db_pool.stats()["in_use"], ("idle",): db_pool.stats()["idle"]}))
+metrics.registry.add(metrics.Gauge(
+    "db_pool_waits_total", "Acquisitions that had to wait, and timeouts", ("outcome",),
+    lambda: {("waited",): db_pool.stats()["waits"], ("timeout",): db_pool.stats()["timeouts"]},
+    kind="counter"))
+metrics.registry.add(metrics.Gauge(
+    "password_hasher_rejected_total", "Hashing calls rejected with 429", (),
+    lambda: {(): hasher.stats()["rejected"]}, kind="counter"))
+metrics.registry.add(metrics.Gauge(
+    "batch_writer_queued", "Items waiting in a background writer", ("writer",),
+    lambda: {("notifications",): notifier.stats()["queued"],
+             ("activity",): audit_log.stats()["queued"]}))
+metrics.registry.add(metrics.Gauge(
+    "batch_writer_dropped_total", "Items dropped because a writer queue was full", ("writer",),
+    lambda: {("notifications",): notifier.stats()["dropped"],
+             ("activity",): audit_log.stats()["dropped"]}, kind="counter"))
+metrics.registry.add(metrics.Gauge(
+    "batch_writer_lost_total", "Items whose write failed even on their own", ("writer",),
+    lambda: {("notifications",): notifier.stats()["lost"],
+             ("activity",): audit_log.stats()["lost"]}, kind="counter"))
+metrics.registry.add(metrics.Gauge(
+    "scheduler_leader", "1 when this process holds the scheduler lease", (),
+    lambda: {(): int(scheduler_lease.is_leader)}))
+metrics.registry.add(metrics.Gauge(
+    "response_cache_lookups_total", "Response cache lookups by outcome (memory level)", ("outcome",),
+    lambda: {("hit",): response_cache.memory.stats()["hits"],
+             ("miss",): response_cache.memory.stats()["misses"],
+             ("not_modified",): response_cache.not_modified}, kind="counter"))
+metrics.registry.add(metrics.Gauge(
+    "response_cache_bytes", "Bytes held by the in-memory response cache", (),
+    lambda: {(): response_cache.memory.stats()["bytes"]}))
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Prometheus scrape endpoint
+
+    Per-route latency, status, response size and SQL statement/time
+    histograms, bcrypt and model-scoring time, pool and writer gauges.
+    Counters are per process.
+
+    Returns:
+        200: Prometheus text exposition format
+    """
+    return Response(metrics.registry.render(),
+                    mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/metrics/slow", methods=["GET"])
+def get_slow_requests():
+    """
+    Recent requests slower than SLOW_REQUEST_MS with the query plan of
+    their slowest statement
+
+    Requires the X-Admin-Token header (disabled without ADMIN_TOKEN).
+
+    Returns:
+        200: Slow request log, oldest first
+        403: Invalid admin token
+        404: Route disabled
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Endpoint not found"}), 404
+    if not is_admin_request():
+        return jsonify({"error": "Permission denied"}), 403
+    return jsonify({
+        "threshold_ms": metrics.SLOW_REQUEST_SECONDS * 1000,
+        "requests": metrics.slow_log.entries()
     }), 200
 
 # =========================
@@ -1484,61 +2910,33 @@ def health_check():
 # =========================
 @app.route("/statistics", methods=["GET"])
 @verify_token
+@cached_response
 def get_statistics(user):
     """
     Get company statistics
     
     Required role: RH only
     
+    Reads the company_stats row maintained by database triggers
+    (one primary-key lookup). ?fresh=1 recomputes it from the source
+    tables with a single CTE query instead.
+    
     Returns:
         200: Statistics about chefs, resources, projects, and average charge
         403: Permission denied
     """
+    if user["role"] != "RH":
+        return jsonify({"error": "Permission denied"}), 403
+
     con, cur = get_db()
     try:
-        if user["role"] != "RH":
-            return jsonify({"error": "Permission denied"}), 403
-        
-        # Count chefs
-        cur.execute("""
-            SELECT COUNT(*) as count 
-            FROM users 
-            WHERE role='CHEF' AND company_id=?
-        """, (user["company_id"],))
-        chefs_count = cur.fetchone()["count"]
-        
-        # Count resources
-        cur.execute("""
-            SELECT COUNT(*) as count 
-            FROM users 
-            WHERE role='RESSOURCE' AND company_id=?
-        """, (user["company_id"],))
-        resources_count = cur.fetchone()["count"]
-        
-        # Projects by status
-        cur.execute("""
-            SELECT status, COUNT(*) as count
-            FROM projects
-            WHERE company_id=?
-            GROUP BY status
-        """, (user["company_id"],))
-        projects_stats = {row["status"]: row["count"] for row in cur.fetchall()}
-        
-        # Average chef charge
-        cur.execute("""
-            SELECT AVG(charge_affectee) as avg_charge
-            FROM chef_profiles cp
-            JOIN users u ON u.id = cp.chef_id
-            WHERE u.company_id=?
-        """, (user["company_id"],))
-        avg_charge = cur.fetchone()["avg_charge"] or 0
-        
-        return jsonify({
-            "chefs": chefs_count,
-            "resources": resources_count,
-            "projects": projects_stats,
-            "average_charge": round(avg_charge, 2)
-        }), 200
+        row = None
+        if request.args.get("fresh") != "1":
+            row = company_stats.get(cur, user["company_id"])
+        if row is None:
+            row = company_stats.compute(cur, user["company_id"])
+
+        return jsonify(company_stats.to_response(row)), 200
         
     finally:
         con.close()
@@ -1568,10 +2966,60 @@ def internal_error(error):
 #     # Run Flask app
 #     app.run(debug=True, host="0.0.0.0", port=5000)
 
-# Initialize scheduler globally (runs once)
+# =========================
+# STARTUP
+# =========================
+def init_db():
+    """
+    Create missing tables/indexes and rebuild the maintained
+    aggregates (chef charges, resource task hours, company statistics)
+    from the source tables
+    """
+    BD.create_db(DB_NAME)
+    con, cur = get_db()
+    try:
+        charge.rebuild_all(cur)
+        tasks.rebuild_task_hours(cur)
+        activity.rebuild_partitions(cur)
+        company_stats.rebuild_all(cur)
+        con.commit()
+    finally:
+        con.close()
+
+init_db()
+
+# Load scoring models: "background" (default) so /health answers
+# immediately, "sync" to load before serving (gunicorn preload shares
+# them copy-on-write with every worker), "off" for on first use
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "background")
+if MODEL_WARMUP == "sync":
+    try:
+        score.registry.get()
+    except Exception as e:
+        print(f"❌ Model loading failed: {e}")
+elif MODEL_WARMUP == "background":
+    score.registry.warm_up()
+
+# Initialize scheduler globally: every process that imports main runs it
+# (RUN_SCHEDULER=0 disables it), but the scheduler lease lets only one of
+# them do the work; the others keep trying and take over on failover
 scheduler = BackgroundScheduler()
 scheduler.add_job(update_projects_and_charge, "interval", minutes=6)
-scheduler.start()
+scheduler.add_job(renew_scheduler_lease, "interval",
+                  seconds=max(scheduler_lease.ttl // 3, 1),
+                  next_run_time=datetime.now())
+
+def start_scheduler():
+    """Start the background scheduler unless disabled or already running"""
+    if os.getenv("RUN_SCHEDULER", "1") != "0" and not scheduler.running:
+        scheduler.start()
+        atexit.register(release_scheduler_lease)
+
+# Write queued notifications and activity before the process exits
+atexit.register(notifier.flush)
+atexit.register(audit_log.flush)
+
+start_scheduler()
 
 if __name__ == "__main__":
     import os
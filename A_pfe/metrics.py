@@ -0,0 +1,328 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Request instrumentation exposed at GET /metrics (Prometheus text format).
+# Counters live in the process: with several gunicorn workers each scrape
+# reads the worker that answered it (see the process_info pid label).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_MS", 500)) / 1000
+SLOW_LOG_SIZE = int(os.getenv("SLOW_LOG_SIZE", 50))
+SQL_TEXT_LIMIT = 500
+INF_LABEL = 'le="+Inf"'
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# =========================
+# METRIC TYPES
+# =========================
+class Counter:
+    """Monotonic counter per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in values]
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, labels, value):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = sorted((labels, (list(e[0]), e[1], e[2]))
+                            for labels, e in self._values.items())
+        lines = []
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, INF_LABEL)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+class Gauge:
+    """
+    Value read from a callback at scrape time: fn() -> {labels: value}
+
+    kind="counter" exposes a cumulative value kept elsewhere (e.g. the
+    connection pool's own counters).
+    """
+
+    def __init__(self, name, help, labelnames, fn, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.fn = fn
+        self.kind = kind
+
+    def render(self):
+        try:
+            values = sorted(self.fn().items())
+        except Exception as e:
+            print(f"❌ Metrics gauge {self.name} failed: {e}")
+            return []
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in values]
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+REQUESTS = registry.add(Counter(
+    "http_requests_total", "Requests by route, method and status",
+    ("route", "method", "status")))
+LATENCY = registry.add(Histogram(
+    "http_request_duration_seconds", "Request latency by route",
+    ("route", "method")))
+RESPONSE_SIZE = registry.add(Histogram(
+    "http_response_size_bytes", "Response body size by route",
+    ("route",), SIZE_BUCKETS))
+SQL_STATEMENTS = registry.add(Histogram(
+    "http_request_sql_statements", "SQL statements executed per request",
+    ("route",), COUNT_BUCKETS))
+SQL_TIME = registry.add(Histogram(
+    "http_request_sql_seconds", "Time spent in SQLite per request",
+    ("route",)))
+BCRYPT_TIME = registry.add(Histogram(
+    "bcrypt_seconds", "Wall time of password hashing calls (queueing included)",
+    ("operation",)))
+SCORE_TIME = registry.add(Histogram(
+    "model_score_seconds", "Wall time of resource scoring model calls",
+    ("batch",), LATENCY_BUCKETS))
+SLOW_REQUESTS = registry.add(Counter(
+    "http_slow_requests_total", "Requests slower than SLOW_REQUEST_MS",
+    ("route",)))
+
+# =========================
+# PER-REQUEST ACCOUNTING
+# =========================
+_local = threading.local()
+
+class RequestStats:
+    __slots__ = ("started", "sql_count", "sql_time", "bcrypt_time", "score_time", "slowest")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.bcrypt_time = 0.0
+        self.score_time = 0.0
+        # (seconds, sql, parameters) of the slowest statement
+        self.slowest = None
+
+def begin_request():
+    _local.request = RequestStats()
+
+def current():
+    return getattr(_local, "request", None)
+
+def observe_bcrypt(operation, seconds):
+    BCRYPT_TIME.observe((operation,), seconds)
+    stats = current()
+    if stats is not None:
+        stats.bcrypt_time += seconds
+
+def observe_score(rows, seconds):
+    SCORE_TIME.observe(("single" if rows == 1 else "batch",), seconds)
+    stats = current()
+    if stats is not None:
+        stats.score_time += seconds
+
+def _record_sql(sql, parameters, seconds, statement=True):
+    stats = current()
+    if stats is None:
+        return
+    stats.sql_time += seconds
+    if statement:
+        stats.sql_count += 1
+        if stats.slowest is None or seconds > stats.slowest[0]:
+            stats.slowest = (seconds, sql, parameters)
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Cursor that charges statement count and time to the current request
+
+    Stepping through results happens partly in fetch*(), so that time is
+    added to the SQL total too (without counting a statement).
+    """
+
+    def execute(self, sql, parameters=()):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_sql(sql, parameters, time.perf_counter() - t0)
+
+    def executemany(self, sql, seq_of_parameters):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_sql(sql, None, time.perf_counter() - t0)
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            _record_sql(None, None, time.perf_counter() - t0, statement=False)
+
+    def fetchmany(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchmany(*args, **kwargs)
+        finally:
+            _record_sql(None, None, time.perf_counter() - t0, statement=False)
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _record_sql(None, None, time.perf_counter() - t0, statement=False)
+
+def end_request(route, method, status, size, explain=None):
+    """
+    Close the current request's accounting and update the metrics
+
+    Args:
+        route: URL rule of the request (bounded label set)
+        size: response body size in bytes, None when unknown
+        explain: callable(sql, parameters) -> list of plan lines, used
+                 for the slowest statement of a slow request
+    """
+    stats = current()
+    _local.request = None
+    if stats is None:
+        return
+    duration = time.perf_counter() - stats.started
+
+    REQUESTS.inc((route, method, str(status)))
+    LATENCY.observe((route, method), duration)
+    SQL_STATEMENTS.observe((route,), stats.sql_count)
+    SQL_TIME.observe((route,), stats.sql_time)
+    if size is not None:
+        RESPONSE_SIZE.observe((route,), size)
+
+    if duration >= SLOW_REQUEST_SECONDS:
+        SLOW_REQUESTS.inc((route,))
+        slow_log.record(route, method, status, duration, stats, explain)
+
+# =========================
+# SLOW REQUEST LOG
+# =========================
+class SlowLog:
+    """
+    Last SLOW_LOG_SIZE slow requests with the plan of their slowest
+    statement (SQL text only: bound parameters are never logged)
+    """
+
+    def __init__(self, size=SLOW_LOG_SIZE):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=size)
+
+    def record(self, route, method, status, duration, stats, explain=None):
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "route": route,
+            "method": method,
+            "status": status,
+            "duration_ms": round(duration * 1000, 2),
+            "sql_count": stats.sql_count,
+            "sql_ms": round(stats.sql_time * 1000, 2),
+            "bcrypt_ms": round(stats.bcrypt_time * 1000, 2),
+            "score_ms": round(stats.score_time * 1000, 2),
+            "slowest_sql": None,
+            "slowest_sql_ms": None,
+            "plan": None,
+        }
+        if stats.slowest is not None:
+            seconds, sql, parameters = stats.slowest
+            entry["slowest_sql"] = " ".join(sql.split())[:SQL_TEXT_LIMIT]
+            entry["slowest_sql_ms"] = round(seconds * 1000, 2)
+            if explain is not None and parameters is not None:
+                try:
+                    entry["plan"] = explain(sql, parameters)
+                except Exception as e:
+                    entry["plan"] = [f"unavailable: {e}"]
+
+        with self._lock:
+            self._entries.append(entry)
+        print(f"🐢 Slow request {method} {route} {entry['duration_ms']}ms "
+              f"(sql {entry['sql_count']} / {entry['sql_ms']}ms, bcrypt {entry['bcrypt_ms']}ms, "
+              f"score {entry['score_ms']}ms) slowest: {entry['slowest_sql']} plan: {entry['plan']}")
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+slow_log = SlowLog()
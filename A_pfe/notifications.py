@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import change_feed
+import cursors
+from batch_writer import BatchWriter
+
+NOTIFICATION_TYPES = ("task_assigned", "deadline_near", "project_created", "status_change")
+
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+
+# More events than this of one type for one user in a single batch are
+# merged into one summary notification
+COALESCE_LIMIT = int(os.getenv("NOTIFY_COALESCE_LIMIT", 5))
+# Other workers also write notifications, so a cached badge count is only
+# trusted for this long
+UNREAD_CACHE_TTL = float(os.getenv("NOTIFY_UNREAD_TTL", 10))
+UNREAD_CACHE_SIZE = 10000
+
+SUMMARY_TITLES = {
+    "task_assigned": "{count} new tasks assigned",
+    "deadline_near": "{count} deadlines are near",
+    "project_created": "{count} new projects",
+    "status_change": "{count} projects changed status",
+}
+
+NOTIFICATION_COLUMNS = ["id", "title", "message", "type", "is_read", "created_at"]
+
+# Page cursor: (created_at, id)
+NOTIFICATION_CURSOR = (str, int)
+
+# =========================
+# COALESCING
+# =========================
+def coalesce(events):
+    """
+    Collapse a batch of (user_id, type, title, message) events
+
+    - exact duplicates are written once
+    - when one user gets more than COALESCE_LIMIT events of the same type,
+      they become a single summary whose message lists the titles
+
+    Order of first appearance is kept.
+    """
+    groups = OrderedDict()
+    for event in events:
+        user_id, type_, _, _ = event
+        group = groups.setdefault((user_id, type_), OrderedDict())
+        group[event] = None
+
+    rows = []
+    for (user_id, type_), group in groups.items():
+        unique = list(group)
+        if len(unique) <= COALESCE_LIMIT:
+            rows.extend(unique)
+            continue
+        titles = [title for _, _, title, _ in unique]
+        message = ", ".join(titles[:COALESCE_LIMIT])
+        if len(titles) > COALESCE_LIMIT:
+            message += f" and {len(titles) - COALESCE_LIMIT} more"
+        rows.append((user_id, type_, SUMMARY_TITLES[type_].format(count=len(unique)), message))
+    return rows
+
+# =========================
+# UNREAD COUNT CACHE
+# =========================
+class UnreadCache:
+    """
+    Per-process LRU of user_id -> (unread count, expiry)
+
+    Writes from this process adjust cached counts in place; anything
+    written by another worker shows up once the entry expires.
+    """
+
+    def __init__(self, ttl=UNREAD_CACHE_TTL, size=UNREAD_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, user_id, count):
+        with self._lock:
+            self._data[user_id] = (count, time.monotonic() + self.ttl)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def adjust(self, deltas):
+        """Apply {user_id: delta} to the users that are cached"""
+        with self._lock:
+            for user_id, delta in deltas.items():
+                entry = self._data.get(user_id)
+                if entry is not None:
+                    self._data[user_id] = (max(entry[0] + delta, 0), entry[1])
+
+    def forget(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"cached": len(self._data), "hits": self.hits, "misses": self.misses}
+
+# =========================
+# NOTIFIER
+# =========================
+class Notifier:
+    """
+    Entry point for everything that notifies users
+
+    notify()/notify_many() only queue events; the batch writer inserts
+    them with one executemany per flush.
+    """
+
+    def __init__(self, pool, interval=None, max_batch=None):
+        self.unread = UnreadCache()
+        self.writer = BatchWriter(
+            "notifications", pool, self._write,
+            max_batch=max_batch or int(os.getenv("NOTIFY_BATCH_SIZE", 500)),
+            interval=interval if interval is not None else float(os.getenv("NOTIFY_FLUSH_INTERVAL", 0.5)),
+        )
+
+    def notify(self, user_id, type_, title, message=""):
+        return self.notify_many([(user_id, type_, title, message)])
+
+    def notify_many(self, events):
+        """
+        Queue events written together in one batch
+
+        Args:
+            events (iterable): (user_id, type, title, message) tuples
+
+        Returns:
+            bool: False when the queue was full and the events were dropped
+        """
+        events = [(int(user_id), type_, title, message or "")
+                  for user_id, type_, title, message in events if user_id]
+        for _, type_, _, _ in events:
+            if type_ not in NOTIFICATION_TYPES:
+                raise ValueError(f"Unknown notification type: {type_}")
+        return self.writer.submit_many(events)
+
+    def _write(self, cur, events):
+        rows = coalesce(events)
+        cur.executemany("""
+            INSERT INTO notifications (user_id, type, title, message)
+            VALUES (?, ?, ?, ?)
+        """, rows)
+        # Tell the users' open /events long-polls
+        change_feed.publish_for_users(cur, "notification", [r[0] for r in rows])
+        deltas = {}
+        for user_id, _, _, _ in rows:
+            deltas[user_id] = deltas.get(user_id, 0) + 1
+        # Applied before commit: a reader may see the badge a few ms early,
+        # never late
+        self.unread.adjust(deltas)
+
+    def flush(self, timeout=5):
+        return self.writer.flush(timeout)
+
+    def after_fork(self):
+        """Cached counts in a new worker start empty"""
+        self.unread.clear()
+
+    # =========================
+    # READ SIDE
+    # =========================
+    def unread_count(self, cur, user_id):
+        """Badge count, from the cache or idx_notifications_user_read"""
+        count = self.unread.get(user_id)
+        if count is None:
+            cur.execute("""
+                SELECT COUNT(*) FROM notifications WHERE user_id=? AND is_read=0
+            """, (user_id,))
+            count = cur.fetchone()[0]
+            self.unread.set(user_id, count)
+        return count
+
+    def page(self, cur, user_id, limit, after=None, unread_only=False):
+        """
+        Newest-first page of a user's notifications
+
+        Returns:
+            tuple: (list of notification dicts, next_cursor or None)
+        """
+        sql = f"""
+            SELECT {", ".join(NOTIFICATION_COLUMNS)}
+            FROM notifications
+            WHERE user_id=?
+        """
+        args = [user_id]
+        if unread_only:
+            sql += " AND is_read=0"
+        if after:
+            created_at, notification_id = after
+            sql += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+            args += [created_at, created_at, notification_id]
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        args.append(limit + 1)
+
+        cur.execute(sql, args)
+        rows = [dict(r) for r in cur.fetchall()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = cursors.encode(rows[-1]["created_at"], rows[-1]["id"])
+        for row in rows:
+            row["is_read"] = bool(row["is_read"])
+        return rows, next_cursor
+
+    def mark_read(self, cur, user_id, ids=None):
+        """
+        Mark some (ids) or all of a user's notifications as read
+
+        Returns:
+            int: number of notifications that were unread
+        """
+        sql = "UPDATE notifications SET is_read=1 WHERE user_id=? AND is_read=0"
+        args = [user_id]
+        if ids is not None:
+            sql += " AND id IN (SELECT value FROM json_each(?))"
+            args.append(json.dumps(list(ids)))
+        cur.execute(sql, args)
+        changed = cur.rowcount
+        if ids is None:
+            self.unread.set(user_id, 0)
+        else:
+            self.unread.adjust({user_id: -changed})
+        return changed
+
+    def stats(self):
+        data = self.writer.stats()
+        data["unread_cache"] = self.unread.stats()
+        return data
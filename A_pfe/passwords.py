@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+import bcrypt
+import metrics
+from concurrent.futures import ThreadPoolExecutor
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", 2))
+# Request threads per worker (same variable as run_production.py and
+# gunicorn.conf.py). Logins waiting on a hash hold one, so at most
+# THREADS - 1 may do so: one thread always stays free for cheap endpoints.
+THREADS = int(os.getenv("THREADS", 4))
+HASH_QUEUE_LIMIT = max(min(int(os.getenv("HASH_QUEUE_LIMIT", THREADS - 1)), THREADS - 1), 1)
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", 2))
+# Separate pool for bulk imports, so a batch never queues ahead of logins
+BULK_HASH_WORKERS = int(os.getenv("BULK_HASH_WORKERS",
+                                  max((os.cpu_count() or 2) - HASH_WORKERS, 1)))
+
+
+class HasherBusy(Exception):
+    """Raised when too many hashing jobs are already queued"""
+
+    def __init__(self, retry_after):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+def _to_bytes(value):
+    return value if isinstance(value, bytes) else value.encode()
+
+
+class PasswordHasher:
+    """
+    Bounded worker pool for bcrypt hashing and verification
+
+    bcrypt releases the GIL while it works, so a small thread pool runs
+    hashes truly in parallel without the pickling cost of a process pool.
+    At most `queue_limit` jobs may be pending or running; beyond that
+    callers get HasherBusy immediately instead of tying up a request
+    thread, which keeps cheap endpoints responsive during login storms.
+    Bulk hashing (hash_many) runs on its own pool.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, queue_limit=HASH_QUEUE_LIMIT,
+                 rounds=BCRYPT_ROUNDS, retry_after=HASH_RETRY_AFTER,
+                 bulk_workers=BULK_HASH_WORKERS):
+        self.rounds = rounds
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="bcrypt")
+        self._bulk_executor = ThreadPoolExecutor(max_workers=bulk_workers,
+                                                 thread_name_prefix="bcrypt-bulk")
+        self._slots = threading.BoundedSemaphore(queue_limit)
+        self._lock = threading.Lock()
+        self._stats = {"hashed": 0, "checked": 0, "rejected": 0, "busy_time": 0.0}
+
+    def _run(self, kind, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise HasherBusy(self.retry_after)
+
+        def job():
+            t0 = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._stats[kind] += 1
+                    self._stats["busy_time"] += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        try:
+            future = self._executor.submit(job)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result()
+        finally:
+            metrics.observe_bcrypt(kind, time.perf_counter() - t0)
+
+    # =========================
+    # PUBLIC API
+    # =========================
+    def hash(self, password):
+        """Hash a password with the configured cost factor"""
+        return self._run("hashed", bcrypt.hashpw, _to_bytes(password),
+                         bcrypt.gensalt(self.rounds))
+
+    def check(self, password, hashed):
+        """Verify a password against a stored bcrypt hash"""
+        return self._run("checked", bcrypt.checkpw, _to_bytes(password), _to_bytes(hashed))
+
+    def needs_rehash(self, hashed):
+        """True when a stored hash uses a different cost factor"""
+        try:
+            return int(_to_bytes(hashed).split(b"$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def hash_many(self, passwords):
+        """
+        Hash a batch of passwords on the bulk pool
+
+        Not subject to the queue limit and never delays hash()/check():
+        the bulk pool is separate from the one serving logins. Callers run
+        it off the request threads (see the bulk import job).
+        """
+        t0 = time.perf_counter()
+        salts = [bcrypt.gensalt(self.rounds) for _ in passwords]
+        args = ([_to_bytes(p) for p in passwords], salts)
+        hashed = list(self._bulk_executor.map(bcrypt.hashpw, *args))
+        with self._lock:
+            self._stats["hashed"] += len(hashed)
+        metrics.observe_bcrypt("hashed_bulk", time.perf_counter() - t0)
+        return hashed
+
+    def stats(self):
+        """Return a snapshot of the hasher counters"""
+        with self._lock:
+            data = dict(self._stats)
+        data["busy_time"] = round(data["busy_time"], 4)
+        data["rounds"] = self.rounds
+        return data
+
+hasher = PasswordHasher()
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import date
+
+from images import BytesLRU
+
+# Rendered JSON of the read-heavy routes, per (route, company, role, user,
+# params). Entries are never invalidated one by one: the key includes the
+# company's generation, which trg_cache_generation sets to the id of the
+# company's last change_events row, so every committed change (mutation
+# routes and the scheduler all publish to the journal in their own
+# transaction) moves the company to new keys and the old entries age out
+# of the LRU. The day is part of the key too (days_remaining is computed
+# at read time).
+ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
+MEMORY_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", 32 * 1024 * 1024))
+# Larger bodies are served but not cached
+MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY", 2 * 1024 * 1024))
+# Optional on-disk second level, shared by the workers of one host
+DISK_DIR = os.getenv("RESPONSE_CACHE_DIR")
+DISK_BYTES = int(os.getenv("RESPONSE_CACHE_DISK_BYTES", 256 * 1024 * 1024))
+# Changes committed by other workers are picked up this often; this
+# process's own writes are seen by the next lookup
+SYNC_INTERVAL = float(os.getenv("RESPONSE_CACHE_SYNC_INTERVAL", 0.5))
+
+def etag_for(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+# =========================
+# GENERATIONS
+# =========================
+class Generations:
+    """
+    Per-process view of cache_generations
+
+    Loaded once per process, then kept current by reading the journal
+    past the last seen id (one primary-key range scan), at most every
+    SYNC_INTERVAL seconds or right after this process committed a change
+    (mark_dirty). Lookups in between are a dict read.
+    """
+
+    def __init__(self, pool, interval=SYNC_INTERVAL):
+        self.pool = pool
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._generations = {}
+        self._last_id = 0
+        self._synced_at = 0.0
+        self._dirty = False
+        self.syncs = 0
+
+    def mark_dirty(self):
+        """This process committed a change: sync before the next lookup"""
+        self._dirty = True
+
+    def get(self, company_id):
+        if (self._pid != os.getpid() or self._dirty
+                or time.monotonic() - self._synced_at >= self.interval):
+            with self._lock:
+                self._refresh()
+        return self._generations.get(company_id, 0)
+
+    def _refresh(self):
+        # Called with self._lock held
+        load = self._pid != os.getpid()
+        if not load and not self._dirty and time.monotonic() - self._synced_at < self.interval:
+            return  # another thread just did it
+        self._dirty = False
+        con = self.pool.acquire()
+        try:
+            cur = con.cursor()
+            if load:
+                self._load(cur)
+            else:
+                self._sync(cur)
+        finally:
+            con.close()
+        self._synced_at = time.monotonic()
+        self.syncs += 1
+
+    def _load(self, cur):
+        # Journal position first: anything committed after it is read
+        # again by the next sync, which is harmless
+        cur.execute("SELECT seq FROM sqlite_sequence WHERE name='change_events'")
+        row = cur.fetchone()
+        last_id = row[0] if row else 0
+        cur.execute("SELECT company_id, generation FROM cache_generations")
+        self._generations = {r[0]: r[1] for r in cur.fetchall()}
+        self._last_id = last_id
+        self._pid = os.getpid()
+
+    def _sync(self, cur):
+        cur.execute("""
+            SELECT company_id,
+                   MAX(CASE WHEN kind != 'notification' THEN id END),
+                   MAX(id)
+            FROM change_events
+            WHERE id > ?
+            GROUP BY company_id
+        """, (self._last_id,))
+        generations = dict(self._generations)
+        for company_id, generation, last_id in cur.fetchall():
+            if generation is not None:
+                generations[company_id] = max(generations.get(company_id, 0), generation)
+            self._last_id = max(self._last_id, last_id)
+        self._generations = generations
+
+    def stats(self):
+        return {"companies": len(self._generations), "last_event_id": self._last_id,
+                "syncs": self.syncs}
+
+# =========================
+# DISK STORE
+# =========================
+class DiskStore:
+    """
+    Entries as <digest>.json files (ETag on the first line, body after)
+
+    Written atomically, so workers of the same host can share the folder.
+    When the total size passes max_bytes the least recently used files
+    are removed down to 80% of it.
+    """
+
+    def __init__(self, folder, max_bytes=DISK_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.size = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.folder, f"{digest}.json")
+
+    def get(self, digest):
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f:
+                etag = f.readline().rstrip(b"\n").decode()
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data, etag
+
+    def put(self, digest, data, etag):
+        path = self._path(digest)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(etag.encode() + b"\n" + data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"❌ Response cache disk write failed: {e}")
+            return
+        with self._lock:
+            if self.size is None:
+                self.size = self._scan_size()
+            else:
+                self.size += len(data)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self):
+        return sum(e.stat().st_size for e in os.scandir(self.folder) if e.name.endswith(".json"))
+
+    def _evict(self):
+        # Called with self._lock held
+        entries = []
+        for e in os.scandir(self.folder):
+            if e.name.endswith(".json"):
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+        entries.sort()
+        size = sum(s for _, s, _ in entries)
+        target = self.max_bytes * 0.8
+        for _, file_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+                size -= file_size
+            except OSError:
+                pass
+        self.size = size
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bytes": self.size}
+
+# =========================
+# CACHE
+# =========================
+class ResponseCache:
+    """In-memory LRU bounded in bytes, in front of an optional DiskStore"""
+
+    def __init__(self, pool, max_bytes=MEMORY_BYTES, disk_dir=DISK_DIR, enabled=ENABLED):
+        self.enabled = enabled
+        self.generations = Generations(pool)
+        self.memory = BytesLRU(max_bytes)
+        self.disk = DiskStore(disk_dir) if disk_dir else None
+        self.not_modified = 0
+        self.uncacheable = 0
+
+    def key(self, route, company_id, role, user_id, params):
+        """
+        Digest of the entry key at the company's current generation
+
+        Args:
+            params: sorted (name, value) pairs: query string and URL
+                    arguments
+        """
+        generation = self.generations.get(company_id)
+        raw = json.dumps([route, company_id, role, user_id, params,
+                          generation, date.today().isoformat()], default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        """(body, etag) or None"""
+        item = self.memory.get(key)
+        if item is None and self.disk is not None:
+            item = self.disk.get(key)
+            if item is not None:
+                self.memory.put(key, *item)
+        return item
+
+    def put(self, key, data):
+        """Store a body; returns its ETag"""
+        etag = etag_for(data)
+        if len(data) > MAX_ENTRY_BYTES:
+            self.uncacheable += 1
+            return etag
+        self.memory.put(key, data, etag)
+        if self.disk is not None:
+            self.disk.put(key, data, etag)
+        return etag
+
+    def stats(self):
+        data = {"enabled": self.enabled, "memory": self.memory.stats(),
+                "generations": self.generations.stats(),
+                "not_modified": self.not_modified, "uncacheable": self.uncacheable}
+        if self.disk is not None:
+            data["disk"] = self.disk.stats()
+        return data
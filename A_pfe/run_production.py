@@ -1,46 +1,61 @@
-from waitress import serve
-from main1 import app
+import multiprocessing
 import os
 import sys
 from datetime import datetime
 
-def run_production_server():
-    """
-    Start production WSGI server
-    """
-    # Set production environment
-    os.environ['FLASK_ENV'] = 'production'
-    
-    # Configuration
-    HOST = '0.0.0.0'
-    PORT = 5000
-    THREADS = 4
-    
-    # Print startup info
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def print_banner(server, host, port, workers, threads):
     print("=" * 60)
     print("🚀 ERP API - Production Server")
     print("=" * 60)
     print(f"📅 Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"🌐 Host: {HOST}")
-    print(f"🔌 Port: {PORT}")
-    print(f"🧵 Threads: {THREADS}")
+    print(f"🖥️  Server: {server}")
+    print(f"🌐 Host: {host}")
+    print(f"🔌 Port: {port}")
+    print(f"⚙️  Workers: {workers}")
+    print(f"🧵 Threads: {threads} per worker")
     print("-" * 60)
     print("📍 Access URLs:")
-    print(f"   • Local:   http://127.0.0.1:{PORT}")
-    print(f"   • Network: http://192.168.8.6:{PORT}")
-    print(f"   • Health:  http://127.0.0.1:{PORT}/health")
+    print(f"   • Local:   http://127.0.0.1:{port}")
+    print(f"   • Health:  http://127.0.0.1:{port}/health")
     print("-" * 60)
-    print("⚙️  Scheduler: Running (updates every 2 minutes)")
+    print("⚙️  Scheduler: Running in a single process")
+    if server == "gunicorn":
+        print("🔁 kill -HUP <master pid>: graceful reload of the workers")
+        print("🛑 kill -TERM <master pid>: graceful shutdown")
     print("⚠️  Press CTRL+C to stop server")
     print("=" * 60)
-    
+
+def run_gunicorn(host, port):
+    """
+    Replace this process with a gunicorn master (gunicorn.conf.py)
+
+    Several worker processes serve requests in parallel, so bcrypt and
+    scoring are no longer limited to one GIL.
+    """
+    workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+    threads = int(os.getenv("THREADS", 4))
+    print_banner("gunicorn", host, port, workers, threads)
+
+    os.chdir(BASE_DIR)
+    os.execv(sys.executable, [sys.executable, "-m", "gunicorn",
+                              "-c", "gunicorn.conf.py", "main:app"])
+
+def run_waitress(host, port):
+    """Single process, multi-threaded Waitress server (Windows fallback)"""
+    from waitress import serve
+    from main import app
+
+    threads = int(os.getenv("THREADS", 4))
+    print_banner("waitress", host, port, 1, threads)
+
     try:
-        # Start Waitress server
         serve(
             app,
-            host=HOST,
-            port=PORT,
-            threads=THREADS,
+            host=host,
+            port=port,
+            threads=threads,
             url_scheme='http',
             channel_timeout=120,
             cleanup_interval=30,
@@ -54,5 +69,25 @@ def run_production_server():
         print(f"\n\n❌ Server error: {e}")
         sys.exit(1)
 
+def run_production_server():
+    """
+    Start production WSGI server
+
+    SERVER=gunicorn (default on Linux/macOS) runs several pre-forked worker
+    processes; SERVER=waitress (default on Windows, where gunicorn does not
+    run) keeps the single-process threaded server.
+    """
+    # Set production environment
+    os.environ['FLASK_ENV'] = 'production'
+
+    HOST = os.getenv("HOST", "0.0.0.0")
+    PORT = int(os.getenv("PORT", 5000))
+    SERVER = os.getenv("SERVER", "waitress" if os.name == "nt" else "gunicorn")
+
+    if SERVER == "gunicorn":
+        run_gunicorn(HOST, PORT)
+    else:
+        run_waitress(HOST, PORT)
+
 if __name__ == '__main__':
-    run_production_server()
\ No newline at end of file
+    run_production_server()
@@ -1,13 +1,20 @@
-from flask import Flask, request, jsonify
-import pandas as pd
+import os
+import threading
+import time
+import warnings
 import numpy as np
-import joblib
+import metrics
 
-app = Flask(__name__)
+MODEL_DIR = os.getenv("MODEL_DIR", ".")
+MODEL_FILES = {
+    "model": "model_score.pkl",
+    "kmeans": "kmeans_cluster.pkl",
+    "scaler": "scaler_cluster.pkl",
+}
 
-model = joblib.load("model_score.pkl")
-kmeans = joblib.load("kmeans_cluster.pkl")
-scaler = joblib.load("scaler_cluster.pkl")
+# The models were fitted on DataFrames; we feed plain NumPy matrices with
+# the same column order, so the feature-name check is just noise.
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
 
 features = [
     'niveau_experience',
@@ -17,24 +24,177 @@ features = [
     'competence_moyenne'
 ]
 
+# =========================
+# MODEL REGISTRY
+# =========================
+class ModelBundle:
+    """The three fitted objects used for scoring, loaded together"""
+
+    def __init__(self, model, kmeans, scaler, version, load_time):
+        self.model = model
+        self.kmeans = kmeans
+        self.scaler = scaler
+        self.version = version
+        self.load_time = load_time
+        self.loaded_at = time.time()
+
+class ModelRegistry:
+    """
+    Lazily loaded, hot-swappable scoring models
+
+    - Nothing is loaded at import: joblib/sklearn and the pickles are pulled
+      in on first use, or ahead of time by warm_up() in a background thread.
+    - Large NumPy arrays inside the pickles are memory-mapped (mmap_mode).
+    - swap() loads a new version completely, then replaces the current
+      bundle with a single reference assignment, so concurrent scoring
+      calls always see one consistent bundle.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, mmap_mode="r"):
+        self.model_dir = model_dir
+        self.mmap_mode = mmap_mode
+        self._bundle = None
+        self._lock = threading.Lock()
+        self._warm_thread = None
+        self.error = None
+
+    def _load(self, model_dir, version=None):
+        import joblib
+
+        t0 = time.perf_counter()
+        objects = {
+            name: joblib.load(os.path.join(model_dir, filename), mmap_mode=self.mmap_mode)
+            for name, filename in MODEL_FILES.items()
+        }
+        load_time = time.perf_counter() - t0
+
+        if version is None:
+            mtime = os.path.getmtime(os.path.join(model_dir, MODEL_FILES["model"]))
+            version = f"{os.path.basename(os.path.abspath(model_dir))}@{int(mtime)}"
+
+        print(f"🧠 Scoring models {version} loaded in {load_time:.2f}s")
+        return ModelBundle(objects["model"], objects["kmeans"], objects["scaler"],
+                           version, load_time)
+
+    def get(self):
+        """Return the current bundle, loading it on first use"""
+        bundle = self._bundle
+        if bundle is None:
+            with self._lock:
+                if self._bundle is None:
+                    try:
+                        self._bundle = self._load(self.model_dir)
+                        self.error = None
+                    except Exception as e:
+                        self.error = str(e)
+                        raise
+                bundle = self._bundle
+        return bundle
+
+    def warm_up(self):
+        """Load the models in a background thread (no-op if already loaded)"""
+        if self._bundle is not None or self._warm_thread is not None:
+            return
+
+        def run():
+            try:
+                self.get()
+            except Exception as e:
+                print(f"❌ Model warm-up failed: {e}")
+
+        self._warm_thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        self._warm_thread.start()
+
+    def after_fork(self):
+        """
+        Reset thread state in a forked worker
+
+        An already loaded bundle is kept (shared copy-on-write with the
+        parent); an unfinished warm-up is restarted in this process.
+        """
+        self._lock = threading.Lock()
+        self._warm_thread = None
+        if self._bundle is None:
+            self.warm_up()
+
+    @staticmethod
+    def resolve_dir(model_dir):
+        """
+        Absolute path of a requested model folder, which must be MODEL_DIR
+        or a folder inside it (relative paths are taken from MODEL_DIR)
+
+        Raises:
+            ValueError: the folder is outside MODEL_DIR
+        """
+        root = os.path.realpath(MODEL_DIR)
+        path = os.path.realpath(os.path.join(root, model_dir))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError("model_dir must be inside MODEL_DIR")
+        return path
+
+    def swap(self, model_dir=None, version=None):
+        """
+        Load a new model version and atomically make it current
+
+        The old bundle keeps serving until the new one is fully loaded;
+        on failure the old bundle stays in place and the error is raised.
+        """
+        model_dir = model_dir or self.model_dir
+        bundle = self._load(model_dir, version)
+        with self._lock:
+            self._bundle = bundle
+            self.model_dir = model_dir
+            self.error = None
+        return bundle.version
+
+    def status(self):
+        """Loading state and startup metrics"""
+        bundle = self._bundle
+        if bundle is None:
+            return {"loaded": False, "error": self.error}
+        return {
+            "loaded": True,
+            "version": bundle.version,
+            "load_time": round(bundle.load_time, 4),
+            "loaded_at": bundle.loaded_at,
+        }
+
+registry = ModelRegistry()
+
+# =========================
+# SCORING
+# =========================
+def ressource_scores(matrix):
+    """
+    Score many resources with one scaler/kmeans/model call each
+
+    Args:
+        matrix: N x 5 array-like, columns in `features` order
+
+    Returns:
+        np.ndarray: N scores clipped to 0-100
+    """
+    X = np.asarray(matrix, dtype=float).reshape(-1, len(features))
+    if len(X) == 0:
+        return np.empty(0)
+
+    bundle = registry.get()
+    t0 = time.perf_counter()
+    clusters = bundle.kmeans.predict(bundle.scaler.transform(X))
+    pred_scores = bundle.model.predict(np.column_stack([X, clusters]))
+    metrics.observe_score(len(X), time.perf_counter() - t0)
+
+    return np.clip(pred_scores, 0, 100)
+
 def ressource_score(niveau_experience, cout_horaire, disponibilite_hebdo,
                     charge_affectee, competence_moyenne):
 
-    new_resource = pd.DataFrame([[
+    new_resource = [[
         niveau_experience,
         disponibilite_hebdo,
         cout_horaire,
         charge_affectee,
         competence_moyenne
-    ]], columns=features)
-
-    new_scaled = scaler.transform(new_resource)
-    new_cluster = kmeans.predict(new_scaled)[0]
-
-    new_resource["cluster"] = new_cluster
-    pred_score = model.predict(new_resource)[0]
-
-    return float(np.clip(pred_score, 0, 100))
+    ]]
 
-if __name__ == "__main__":
-    app.run(debug=True)
+    return float(ressource_scores(new_resource)[0])
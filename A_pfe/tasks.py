@@ -0,0 +1,132 @@
+import math
+
+import cursors
+
+TASK_STATUSES = ("todo", "in_progress", "review", "done")
+TASK_PRIORITIES = ("low", "medium", "high", "urgent")
+
+DEFAULT_BOARD_LIMIT = 50
+MAX_BOARD_LIMIT = 500
+
+# Order inside a board column; must match the expression indexed in
+# BD.create_db (idx_tasks_board)
+PRIORITY_RANK_SQL = """CASE priority
+                        WHEN 'urgent' THEN 1
+                        WHEN 'high' THEN 2
+                        WHEN 'medium' THEN 3
+                        WHEN 'low' THEN 4
+                    END"""
+
+TASK_COLUMNS = [
+    "id", "project_id", "ressource_id", "title", "description", "priority",
+    "status", "estimated_hours", "actual_hours", "start_date", "end_date",
+    "completed_at", "created_at"
+]
+
+# Board column cursor: (priority rank, id)
+TASK_CURSOR = (int, int)
+
+# =========================
+# BOARD QUERIES
+# =========================
+def column_counts(cur, project_id):
+    """Number of tasks per status, answered from idx_tasks_board alone"""
+    cur.execute("""
+        SELECT status, COUNT(*) AS count
+        FROM tasks
+        WHERE project_id=?
+        GROUP BY status
+    """, (project_id,))
+    counts = {status: 0 for status in TASK_STATUSES}
+    counts.update({r["status"]: r["count"] for r in cur.fetchall()})
+    return counts
+
+def column_page(cur, project_id, status, limit, after=None):
+    """
+    One page of a board column, most urgent first then oldest first
+
+    A range scan of idx_tasks_board: the cost depends on the page size,
+    not on the number of tasks in the project.
+
+    Returns:
+        tuple: (list of task dicts, next_cursor or None)
+    """
+    sql = f"""
+        SELECT {", ".join(TASK_COLUMNS)}, {PRIORITY_RANK_SQL} AS _rank
+        FROM tasks
+        WHERE project_id=? AND status=?
+    """
+    args = [project_id, status]
+    if after:
+        rank, task_id = after
+        # The >= bound is redundant but lets SQLite seek idx_tasks_board
+        # to the cursor instead of walking the column from its start
+        sql += (f" AND {PRIORITY_RANK_SQL} >= ?"
+                f" AND ({PRIORITY_RANK_SQL} > ? OR ({PRIORITY_RANK_SQL} = ? AND id > ?))")
+        args += [rank, rank, rank, task_id]
+    sql += f" ORDER BY {PRIORITY_RANK_SQL}, id LIMIT ?"
+    args.append(limit + 1)
+
+    cur.execute(sql, args)
+    rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = cursors.encode(rows[-1]["_rank"], rows[-1]["id"])
+
+    tasks = []
+    for row in rows:
+        task = dict(row)
+        del task["_rank"]
+        tasks.append(task)
+    return tasks, next_cursor
+
+# =========================
+# RESSOURCE CHARGE
+# =========================
+# charge_affectee is derived from open task hours vs weekly availability,
+# never entered by hand; must match trg_ressource_task_charge in
+# BD.create_db. {dispo} is the availability expression (a column or "?")
+RESSOURCE_CHARGE_SQL = """CASE
+            WHEN {dispo} > 0
+            THEN MIN(CAST(ROUND(open_task_hours * 100.0 / {dispo}) AS INTEGER), 100)
+            ELSE 100 * (open_task_hours > 0)
+        END"""
+
+def charge_from_hours(open_task_hours, disponibilite_hebdo):
+    """Same value as RESSOURCE_CHARGE_SQL, for scoring before the write"""
+    open_task_hours = open_task_hours or 0
+    if disponibilite_hebdo > 0:
+        # SQLite's ROUND rounds halves away from zero
+        return min(math.floor(open_task_hours * 100.0 / disponibilite_hebdo + 0.5), 100)
+    return 100 if open_task_hours > 0 else 0
+
+def ressource_charge(cur, ressource_id):
+    """Current (trigger-maintained) charge of a resource, or None"""
+    cur.execute("""
+        SELECT charge_affectee FROM ressource_profiles WHERE ressource_id=?
+    """, (ressource_id,))
+    row = cur.fetchone()
+    return row["charge_affectee"] if row else None
+
+def rebuild_task_hours(cur):
+    """
+    Recompute every resource's open_task_hours from the tasks table
+
+    Only rows whose total actually changes are written; the
+    trg_ressource_task_charge trigger then refreshes their charge.
+    """
+    cur.execute("""
+        UPDATE ressource_profiles
+        SET open_task_hours = t.hours
+        FROM (
+            SELECT rp.ressource_id, COALESCE(SUM(tk.estimated_hours), 0) AS hours
+            FROM ressource_profiles rp
+            LEFT JOIN tasks tk ON tk.ressource_id = rp.ressource_id AND tk.status != 'done'
+            GROUP BY rp.ressource_id
+        ) AS t
+        WHERE ressource_profiles.ressource_id = t.ressource_id
+          AND ressource_profiles.open_task_hours IS NOT t.hours
+    """)
+    return cur.rowcount
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Revocations committed by other workers are seen after at most this long
+REVOCATION_SYNC_INTERVAL = float(os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", 1))
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified JWT claims
+
+    Keyed by the SHA-256 digest of the raw token (the token itself is never
+    stored). An entry lives until the token's `exp` claim, or `default_ttl`
+    seconds when the token has no expiry. Caching only skips the signature
+    check: revoked tokens are refused by Revocations, hit or miss.
+    """
+
+    def __init__(self, max_size=10000, default_ttl=300):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # digest -> (claims, expires_at)
+        self._by_user = {}             # user_id -> set of digests
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0,
+                       "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def _drop(self, digest):
+        claims, _ = self._entries.pop(digest)
+        digests = self._by_user.get(claims.get("id"))
+        if digests:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[claims.get("id")]
+
+    def get(self, token):
+        """Return cached claims for a token, or None"""
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                self._drop(digest)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(digest)
+            self._stats["hits"] += 1
+            return claims
+
+    def put(self, token, claims):
+        """Cache the claims of a token that was just verified"""
+        expires_at = claims.get("exp") or time.time() + self.default_ttl
+        digest = self._digest(token)
+        with self._lock:
+            if digest in self._entries:
+                self._drop(digest)
+            self._entries[digest] = (claims, expires_at)
+            self._by_user.setdefault(claims.get("id"), set()).add(digest)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate_user(self, user_id):
+        """Forget every cached token of a user (frees the entries of revoked tokens)"""
+        with self._lock:
+            for digest in list(self._by_user.get(user_id, ())):
+                self._drop(digest)
+                self._stats["invalidations"] += 1
+
+    def stats(self):
+        """Return a snapshot of the cache counters"""
+        with self._lock:
+            data = dict(self._stats)
+            data["size"] = len(self._entries)
+            data["max_size"] = self.max_size
+        return data
+
+
+class Revocations:
+    """
+    Users whose tokens issued up to a given second are no longer accepted
+    (account deleted, password changed)
+
+    Rows of token_revocations are written in the caller's transaction, so
+    every worker sees them; each process keeps a copy of the table (only
+    users revoked within the last token lifetime, a small set), reloaded
+    at most every `interval` seconds. A row is kept until every token it
+    covers has expired.
+    """
+
+    def __init__(self, pool, lifetime, interval=REVOCATION_SYNC_INTERVAL):
+        self.pool = pool
+        self.lifetime = lifetime
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._revoked = {}  # user_id -> revoked_at (epoch, sub-second)
+        self._synced_at = None
+        self._pid = None
+        self.syncs = 0
+
+    def revoke(self, cur, user_id):
+        """Refuse the user's current tokens once the caller commits"""
+        now = time.time()
+        cur.execute("DELETE FROM token_revocations WHERE expires_at < ?", (int(now),))
+        cur.execute("""
+            INSERT INTO token_revocations (user_id, revoked_at, expires_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                revoked_at = excluded.revoked_at,
+                expires_at = excluded.expires_at
+        """, (user_id, now, int(now) + self.lifetime + 1))
+        # Seen here right away; a rollback is undone by the next reload
+        with self._lock:
+            self._revoked[user_id] = now
+
+    def is_revoked(self, claims):
+        """
+        True when the token was issued at or before its user's revocation
+
+        `iat` is a float, so a login right after a password change is
+        accepted. Tokens without `iat` (issued before it was added) count
+        as issued `lifetime` seconds before their expiry.
+        """
+        if (self._pid != os.getpid() or self._synced_at is None
+                or time.monotonic() - self._synced_at >= self.interval):
+            self._refresh()
+        revoked_at = self._revoked.get(claims.get("id"))
+        if revoked_at is None:
+            return False
+        issued_at = claims.get("iat")
+        if issued_at is None:
+            issued_at = claims.get("exp", 0) - self.lifetime
+        return issued_at <= revoked_at
+
+    def _refresh(self):
+        with self._lock:
+            if (self._pid == os.getpid() and self._synced_at is not None
+                    and time.monotonic() - self._synced_at < self.interval):
+                return  # another thread just did it
+            con = self.pool.acquire()
+            try:
+                rows = con.execute("""
+                    SELECT user_id, revoked_at FROM token_revocations
+                    WHERE expires_at >= ?
+                """, (int(time.time()),)).fetchall()
+            finally:
+                con.close()
+            self._revoked = {r[0]: r[1] for r in rows}
+            self._pid = os.getpid()
+            self._synced_at = time.monotonic()
+            self.syncs += 1
+
+    def stats(self):
+        return {"users": len(self._revoked), "syncs": self.syncs}